@@ -60,10 +60,18 @@ export default function Dashboard() {
   useEffect(() => {
     const fetchChatSessions = async () => {
       try {
-        const response = await axios.get(
-          `http://localhost:8000/tutor/sessions/${user.userId}`
-        );
-        setChatHistory(response.data);
+        // Sessions come in pages, newest first; X-Next-Cursor is set while older ones remain
+        const sessions = [];
+        let cursor = null;
+        do {
+          const response = await axios.get(
+            `http://localhost:8000/tutor/sessions/${user.userId}`,
+            { params: cursor ? { cursor } : {} }
+          );
+          sessions.push(...response.data);
+          cursor = response.headers["x-next-cursor"];
+        } while (cursor);
+        setChatHistory(sessions);
       } catch (error) {
         console.error("Error fetching chat sessions:", error);
       }
@@ -87,12 +95,20 @@ export default function Dashboard() {
   const handleChatSelect = async (chatId) => {
     setCurrentChatId(chatId);
     try {
-      const response = await axios.get(
-        `http://localhost:8000/tutor/history/${user.userId}/${chatId}`
-      );
+      // Each page holds the latest chats before the cursor, oldest first
+      let chats = [];
+      let cursor = null;
+      do {
+        const response = await axios.get(
+          `http://localhost:8000/tutor/history/${user.userId}/${chatId}`,
+          { params: cursor ? { cursor } : {} }
+        );
+        chats = [...response.data.chats, ...chats];
+        cursor = response.data.next_cursor;
+      } while (cursor);
 
       // Transform the chat history into our message format
-      const formattedMessages = response.data.chats
+      const formattedMessages = chats
         .map((chat) => [
           { sender: "user", text: chat.query },
           { sender: "bot", text: chat.answer },
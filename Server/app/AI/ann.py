@@ -0,0 +1,132 @@
+import json
+import math
+import os
+import logging
+import faiss
+from app.AI.manifest import atomic_path
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+METRICS = {"ip": faiss.METRIC_INNER_PRODUCT, "l2": faiss.METRIC_L2}
+
+
+def default_nlist(num_vectors):
+    """~4*sqrt(n) lists, capped so each list gets enough training points."""
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def create_faiss_index(dim, num_vectors, index_type="flat", metric="ip", nlist=None, pq_m=8, pq_bits=8, hnsw_m=32, ef_construction=200):
+    """Create an empty (possibly untrained) FAISS index of the requested type.
+
+    Use metric="ip" with unit-length embeddings so scores are cosine similarities.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}. Expected one of {tuple(METRICS)}")
+    faiss_metric = METRICS[metric]
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dim) if metric == "ip" else faiss.IndexFlatL2(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss_metric)
+        index.hnsw.efConstruction = ef_construction
+        return index
+
+    nlist = nlist or default_nlist(num_vectors)
+    quantizer = faiss.IndexFlatIP(dim) if metric == "ip" else faiss.IndexFlatL2(dim)
+    if index_type == "ivf":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist, faiss_metric)
+    if index_type == "ivfpq":
+        if dim % pq_m != 0:
+            raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dim}")
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits, faiss_metric)
+    raise ValueError(f"Unknown index type: {index_type}. Expected one of {INDEX_TYPES}")
+
+
+def with_id_map(index):
+    """Wrap index types that cannot store external ids, so chunks can be added and removed by id."""
+    if faiss.try_extract_index_ivf(index) is not None:
+        return index
+    return faiss.IndexIDMap2(index)
+
+
+def supports_removal(index):
+    return not isinstance(_unwrap(index), faiss.IndexHNSW)
+
+
+def _unwrap(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def make_search_params(index, nprobe=None, ef_search=None):
+    """Per-call search parameters, so tuning never mutates the shared index."""
+    if nprobe and faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe)
+    if ef_search and isinstance(_unwrap(index), faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search)
+    return None
+
+
+def describe_index(index):
+    inner = _unwrap(index)
+    ivf = faiss.try_extract_index_ivf(index)
+    details = {"type": type(inner).__name__, "ntotal": index.ntotal, "dim": index.d}
+    if ivf is not None:
+        details["nlist"] = ivf.nlist
+    return details
+
+
+def metadata_path(index_path):
+    return os.path.splitext(index_path)[0] + ".meta.json"
+
+
+def build_index_metadata(index, model_name, metric, normalized, index_type, version=1):
+    return {
+        "version": version,
+        "model": model_name,
+        "dim": index.d,
+        "metric": metric,
+        "normalized": normalized,
+        "index_type": index_type,
+        "ntotal": index.ntotal,
+    }
+
+
+def write_index_metadata(index_path, meta):
+    with atomic_path(metadata_path(index_path)) as tmp_path:
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, indent=2)
+
+
+def read_index_metadata(index_path):
+    """Return the index metadata, or a legacy description for indexes built before it existed."""
+    path = metadata_path(index_path)
+    if not os.path.exists(path):
+        logger.warning(f"{path} not found; assuming a legacy unnormalized L2 index. Rebuild with rag.py.")
+        return {"model": None, "dim": None, "metric": "l2", "normalized": False, "index_type": "flat", "legacy": True}
+    with open(path) as f:
+        return json.load(f)
+
+
+def validate_index_metadata(meta, index, model_name, model_dim):
+    """Fail fast when the index was built with a different model, dimension or metric."""
+    errors = []
+    if meta.get("model") and meta["model"] != model_name:
+        errors.append(f"index built with model {meta['model']!r}, serving with {model_name!r}")
+    if meta.get("dim") and meta["dim"] != index.d:
+        errors.append(f"metadata dim {meta['dim']} != index dim {index.d}")
+    if index.d != model_dim:
+        errors.append(f"index dim {index.d} != embedding model dim {model_dim}")
+    if METRICS.get(meta["metric"]) != index.metric_type:
+        errors.append(f"metadata metric {meta['metric']!r} does not match the index")
+    if errors:
+        raise ValueError("Incompatible FAISS index: " + "; ".join(errors))
+
+
+def similarity_from_score(score, metric):
+    """Convert a FAISS score to cosine similarity (exact for unit-length vectors)."""
+    if metric == "ip":
+        return float(score)
+    return 1 - float(score) / 2.0
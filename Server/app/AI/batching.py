@@ -0,0 +1,97 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item calls into batched calls of `fn`.
+
+    Callers `await submit(item)`; items queued within `max_wait` seconds of the first
+    one (up to `max_batch`) are passed together to `fn(items)` on `executor`, which must
+    return one result per item. One batch runs at a time and the next is formed while
+    it does, so the batch size grows with load instead of adding latency when idle.
+    """
+
+    def __init__(self, fn, executor, max_batch=32, max_wait=0.005, name="batch"):
+        self.fn = fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._loop = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # Queues are bound to an event loop; start over when a new one is running
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(), name=f"{self.name}-batcher")
+
+    async def submit(self, item):
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _drain(self, limit):
+        items = []
+        while len(items) < limit and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _run(self):
+        running = None
+        while True:
+            batch = await self._collect()
+            if running is not None:
+                # One batch in flight: this one keeps filling until it finishes
+                await running
+                batch += self._drain(self.max_batch - len(batch))
+            # Skip callers that gave up (e.g. client disconnected) while queued
+            batch = [(item, future) for item, future in batch if not future.done()]
+            running = self._loop.create_task(self._dispatch(batch)) if batch else None
+
+    async def _dispatch(self, batch):
+        items = [item for item, _ in batch]
+        try:
+            results = await self._loop.run_in_executor(self.executor, self.fn, items)
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(items)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.items += len(items)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,121 @@
+import re
+import time
+import logging
+from array import array
+from collections import Counter
+import numpy as np
+from app.AI.manifest import atomic_path
+
+logger = logging.getLogger(__name__)
+
+# Identifiers are kept whole (`__init__`, `zerodivisionerror`) since students type them verbatim
+TOKEN_RE = re.compile(r"[a-z_][a-z0-9_]*|\d+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it of on or that the this to what when "
+    "where which why with you your".split()
+)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over chunks with CSR postings: term -> (row, tf) slices of two flat arrays.
+
+    Rows index the chunk arrays; row_ids maps them back to vector ids so hits can be
+    fused with FAISS results directly.
+    """
+
+    def __init__(self, vocab, term_offsets, postings_rows, postings_tfs, row_ids, doc_lens, k1=1.2, b=0.75):
+        self.vocab = vocab if isinstance(vocab, dict) else {term: i for i, term in enumerate(vocab)}
+        self.term_offsets = term_offsets
+        self.postings_rows = postings_rows
+        self.postings_tfs = postings_tfs
+        self.row_ids = row_ids
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+        self.avg_len = float(doc_lens.mean()) if len(doc_lens) else 0.0
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    @classmethod
+    def build(cls, chunks):
+        """Index an iterable of chunk dicts ({"id", "text"}) in a single pass."""
+        postings = {}
+        row_ids = array("q")
+        doc_lens = array("i")
+        for row, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk["text"]))
+            row_ids.append(chunk["id"])
+            doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                rows, tfs = postings.setdefault(term, (array("i"), array("H")))
+                rows.append(row)
+                tfs.append(min(tf, 65535))
+        vocab = sorted(postings)
+        term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(postings[term][0]) for term in vocab])
+        postings_rows = np.empty(term_offsets[-1], dtype=np.int32)
+        postings_tfs = np.empty(term_offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(vocab):
+            rows, tfs = postings.pop(term)
+            postings_rows[term_offsets[i]:term_offsets[i + 1]] = rows
+            postings_tfs[term_offsets[i]:term_offsets[i + 1]] = tfs
+        return cls(vocab, term_offsets, postings_rows, postings_tfs,
+                   np.frombuffer(row_ids, dtype=np.int64), np.frombuffer(doc_lens, dtype=np.int32))
+
+    def search(self, query, top_k, budget_ms=None):
+        """Return [(vector id, score)] best first.
+
+        Terms are scored rarest first; once budget_ms is spent the remaining
+        (most common, least informative) terms are skipped.
+        """
+        n = len(self.row_ids)
+        terms = {self.vocab[token] for token in tokenize(query) if token in self.vocab}
+        if not terms or n == 0:
+            return []
+        start = time.perf_counter()
+        df = {term: int(self.term_offsets[term + 1] - self.term_offsets[term]) for term in terms}
+        scores = np.zeros(n, dtype=np.float32)
+        for term in sorted(terms, key=df.get):
+            if budget_ms is not None and (time.perf_counter() - start) * 1000 > budget_ms:
+                logger.info(f"BM25 budget of {budget_ms}ms spent; skipped common terms")
+                break
+            lo, hi = self.term_offsets[term], self.term_offsets[term + 1]
+            rows = self.postings_rows[lo:hi]
+            tfs = self.postings_tfs[lo:hi].astype(np.float32)
+            idf = np.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lens[rows] / self.avg_len)
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(self.row_ids[row]), float(scores[row])) for row in candidates]
+
+    def save(self, path):
+        vocab_blob = np.frombuffer("\n".join(sorted(self.vocab, key=self.vocab.get)).encode("utf-8"), dtype=np.uint8)
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, vocab=vocab_blob, term_offsets=self.term_offsets, postings_rows=self.postings_rows,
+                         postings_tfs=self.postings_tfs, row_ids=self.row_ids, doc_lens=self.doc_lens)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            blob = data["vocab"].tobytes().decode("utf-8")
+            vocab = blob.split("\n") if blob else []
+            return cls(vocab, data["term_offsets"], data["postings_rows"], data["postings_tfs"],
+                       data["row_ids"], data["doc_lens"])
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked lists of ids; each list contributes 1 / (k + rank) per id."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
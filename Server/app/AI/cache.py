@@ -0,0 +1,205 @@
+import os
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class InMemoryCacheBackend:
+    """Per-process answer cache: a fixed-size embedding matrix with LRU eviction."""
+
+    def __init__(self, max_entries=2048, ttl_seconds=86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._vectors = None  # allocated on first store, once the dimension is known
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._entries = OrderedDict()  # slot -> (query, answer, expires_at), oldest first
+
+    def lookup(self, q_emb, threshold):
+        with self._lock:
+            if not self._entries:
+                return None
+            scores = self._vectors @ q_emb
+            scores[~self._valid] = -np.inf
+            slot = int(np.argmax(scores))
+            if scores[slot] < threshold:
+                return None
+            _, answer, expires_at = self._entries[slot]
+            if expires_at < time.time():
+                del self._entries[slot]
+                self._valid[slot] = False
+                return None
+            self._entries.move_to_end(slot)
+            return answer
+
+    def store(self, query, q_emb, answer):
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, q_emb.shape[0]), dtype=np.float32)
+            if len(self._entries) >= self.max_entries:
+                slot, _ = self._entries.popitem(last=False)
+            else:
+                slot = int(np.argmin(self._valid))
+            self._vectors[slot] = q_emb
+            self._valid[slot] = True
+            self._entries[slot] = (query, answer, time.time() + self.ttl_seconds)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._valid[:] = False
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """Answer cache in a local SQLite file, shared by every worker on the host and kept across restarts."""
+
+    def __init__(self, path, max_entries=2048, ttl_seconds=86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS semantic_cache (
+                id INTEGER PRIMARY KEY,
+                query TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def lookup(self, q_emb, threshold):
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, embedding, answer FROM semantic_cache WHERE created_at > ?",
+                (now - self.ttl_seconds,),
+            ).fetchall()
+            if not rows:
+                return None
+            vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+            scores = vectors @ q_emb
+            best = int(np.argmax(scores))
+            if scores[best] < threshold:
+                return None
+            self._conn.execute("UPDATE semantic_cache SET last_used_at = ? WHERE id = ?", (now, rows[best][0]))
+            self._conn.commit()
+            return rows[best][2]
+
+    def store(self, query, q_emb, answer):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO semantic_cache (query, embedding, answer, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                (query, q_emb.astype(np.float32).tobytes(), answer, now, now),
+            )
+            # Drop expired rows, then the least recently used beyond the size bound
+            self._conn.execute("DELETE FROM semantic_cache WHERE created_at <= ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                """DELETE FROM semantic_cache WHERE id IN (
+                    SELECT id FROM semantic_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM semantic_cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM semantic_cache").fetchone()[0]
+
+
+class SemanticCache:
+    """Returns a stored answer when a new question embeds close enough to a previous one."""
+
+    def __init__(self, backend, threshold=0.92):
+        self.backend = backend
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, q_emb):
+        try:
+            answer = self.backend.lookup(_normalize(q_emb), self.threshold)
+        except Exception as e:
+            logger.error(f"Semantic cache lookup failed: {e}")
+            answer = None
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return answer
+
+    def store(self, query, q_emb, answer):
+        try:
+            self.backend.store(query, _normalize(q_emb), answer)
+        except Exception as e:
+            logger.error(f"Semantic cache store failed: {e}")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "threshold": self.threshold,
+        }
+
+
+class DisabledCache:
+    def lookup(self, q_emb):
+        return None
+
+    def store(self, query, q_emb, answer):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"backend": "disabled"}
+
+
+def build_answer_cache(output_dir):
+    """Build the answer cache from SEMANTIC_CACHE_* environment variables."""
+    backend_name = os.getenv("SEMANTIC_CACHE_BACKEND", "memory")
+    max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048"))
+    ttl_seconds = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+    threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+    if backend_name == "off":
+        return DisabledCache()
+    if backend_name == "sqlite":
+        path = os.getenv("SEMANTIC_CACHE_PATH", os.path.join(output_dir, "answer_cache.sqlite3"))
+        backend = SQLiteCacheBackend(path, max_entries, ttl_seconds)
+    elif backend_name == "memory":
+        backend = InMemoryCacheBackend(max_entries, ttl_seconds)
+    else:
+        raise ValueError(f"Unknown SEMANTIC_CACHE_BACKEND: {backend_name}")
+    logger.info(f"Semantic answer cache: {backend_name} (threshold={threshold}, max={max_entries}, ttl={ttl_seconds}s)")
+    return SemanticCache(backend, threshold)
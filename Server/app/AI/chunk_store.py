@@ -0,0 +1,175 @@
+import os
+import json
+import mmap
+import pickle
+import struct
+import argparse
+import logging
+from array import array
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Layout: MAGIC | UTF-8 text blob | aligned column arrays | JSON footer | footer length (u64) | MAGIC
+MAGIC = b"CHUNKS01"
+_FOOTER_LEN = struct.Struct("<Q")
+
+
+class ChunkStoreWriter:
+    """Streams chunks to a single columnar file; only the small per-chunk columns stay in memory."""
+
+    def __init__(self, path):
+        self.path = path
+        self._tmp_path = f"{path}.tmp"  # moved into place by close()
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(MAGIC)
+        self._offsets = array("q", [0])
+        self._ids = array("q")
+        self._pages = array("i")
+        self._doc_index = array("i")
+        self._docs = {}
+
+    def add(self, chunk):
+        data = chunk["text"].encode("utf-8")
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        self._ids.append(chunk["id"])
+        self._pages.append(chunk.get("page", 0))
+        self._doc_index.append(self._docs.setdefault(chunk.get("doc_id", ""), len(self._docs)))
+
+    def _write_column(self, name, values, dtype, columns):
+        pad = -self._file.tell() % 8
+        self._file.write(b"\0" * pad)
+        data = np.asarray(values, dtype=dtype)
+        columns[name] = {"offset": self._file.tell(), "dtype": data.dtype.str, "count": len(data)}
+        self._file.write(data.tobytes())
+
+    def close(self):
+        """Write the columns and footer, then move the file into place."""
+        try:
+            ids = np.frombuffer(self._ids, dtype=np.int64)
+            order = np.argsort(ids, kind="stable")
+            columns = {}
+            self._write_column("offsets", self._offsets, np.int64, columns)
+            self._write_column("ids", ids, np.int64, columns)
+            self._write_column("pages", self._pages, np.int32, columns)
+            self._write_column("doc_index", self._doc_index, np.int32, columns)
+            self._write_column("sorted_ids", ids[order], np.int64, columns)
+            self._write_column("sorted_rows", order, np.int64, columns)
+            footer = json.dumps({
+                "count": len(ids),
+                "text_offset": len(MAGIC),
+                "docs": list(self._docs),
+                "columns": columns,
+            }).encode("utf-8")
+            self._file.write(footer)
+            self._file.write(_FOOTER_LEN.pack(len(footer)))
+            self._file.write(MAGIC)
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        logger.info(f"Wrote {len(ids)} chunks to {self.path}")
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ChunkStore:
+    """Read-only, memory-mapped view of a chunk file.
+
+    Nothing is decoded up front: looking up a vector id costs a binary search and
+    one UTF-8 decode, and the mapped pages are shared by every worker on the host.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC or self._mm[-len(MAGIC):] != MAGIC:
+            raise ValueError(f"{path} is not a chunk store")
+        footer_end = len(self._mm) - len(MAGIC)
+        (footer_len,) = _FOOTER_LEN.unpack(self._mm[footer_end - _FOOTER_LEN.size:footer_end])
+        footer_start = footer_end - _FOOTER_LEN.size - footer_len
+        footer = json.loads(self._mm[footer_start:footer_start + footer_len])
+        self._count = footer["count"]
+        self._text_offset = footer["text_offset"]
+        self.docs = footer["docs"]
+        for name, column in footer["columns"].items():
+            setattr(self, f"_{name}", np.frombuffer(
+                self._mm, dtype=np.dtype(column["dtype"]), count=column["count"], offset=column["offset"]
+            ))
+
+    def __len__(self):
+        return self._count
+
+    def _row(self, row):
+        start = self._text_offset + int(self._offsets[row])
+        end = self._text_offset + int(self._offsets[row + 1])
+        return {
+            "id": int(self._ids[row]),
+            "text": self._mm[start:end].decode("utf-8"),
+            "page": int(self._pages[row]),
+            "doc_id": self.docs[self._doc_index[row]],
+        }
+
+    def row_of(self, chunk_id):
+        pos = int(np.searchsorted(self._sorted_ids, chunk_id))
+        if pos >= self._count or self._sorted_ids[pos] != chunk_id:
+            return None
+        return int(self._sorted_rows[pos])
+
+    def __getitem__(self, chunk_id):
+        row = self.row_of(chunk_id)
+        if row is None:
+            raise KeyError(chunk_id)
+        return self._row(row)
+
+    def get(self, chunk_id, default=None):
+        row = self.row_of(chunk_id)
+        return default if row is None else self._row(row)
+
+    def __contains__(self, chunk_id):
+        return self.row_of(chunk_id) is not None
+
+    def __iter__(self):
+        """Chunks in stored (document/page) order."""
+        for row in range(self._count):
+            yield self._row(row)
+
+    def values(self):
+        return iter(self)
+
+
+def write_chunk_store(path, chunks):
+    with ChunkStoreWriter(path) as writer:
+        for chunk in chunks:
+            writer.add(chunk)
+
+
+def convert_pickle(pickle_path, store_path):
+    """One-off migration of a legacy text_chunks.pkl (list of dicts) to the columnar format."""
+    with open(pickle_path, "rb") as f:
+        chunks = pickle.load(f)
+    write_chunk_store(store_path, ({**chunk, "id": chunk.get("id", i)} for i, chunk in enumerate(chunks)))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Convert a legacy text_chunks.pkl to the memory-mapped chunk store")
+    parser.add_argument("pickle_path")
+    parser.add_argument("store_path")
+    args = parser.parse_args()
+    convert_pickle(args.pickle_path, args.store_path)
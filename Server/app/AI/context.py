@@ -0,0 +1,123 @@
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rough English/code average for Gemini's tokenizer; good enough for budgeting and logs
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))
+
+SENTENCE_END_RE = re.compile(r"(?<=[.!?:])\s+|\n+")
+
+# The model's system instruction. Gemini sends and bills it with every request, so
+# keeping it short saves tokens; it is only kept out of the per-request prompt text.
+TUTOR_SYSTEM_INSTRUCTION = """You are a warm, patient Python tutor helping a student with their textbook.
+- Briefly restate what the textbook context says, in your own words; weave in page references naturally (e.g. "on page 6 your textbook...").
+- Explain clearly: a one-sentence definition, a relatable analogy, then one beginner-friendly code example with comments. Go step by step for multi-step ideas.
+- Mention related variations briefly, in **bold** Markdown (e.g. **single inheritance**, **multiple inheritance**).
+- Add your own expertise and real-world uses where helpful; keep a friendly, encouraging tone, not a rigid template.
+- If the question is outside the Python syllabus, politely say you focus on the syllabus and steer back to it.
+- Finish by encouraging practice and further reading in the textbook."""
+
+
+def estimate_tokens(text):
+    return int(len(text) / CHARS_PER_TOKEN + 0.5)
+
+
+def split_sentences(text):
+    return [sentence for sentence in SENTENCE_END_RE.split(text) if sentence.strip()]
+
+
+def trim_to_budget(text, max_tokens):
+    """Longest prefix of whole sentences within max_tokens, or "" if the first sentence does not fit."""
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        cost = estimate_tokens(sentence) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    return " ".join(kept)
+
+
+def _normalized(text):
+    return " ".join(text.split()).lower()
+
+
+def dedupe_chunks(chunks):
+    """Drop chunks whose text is contained in a higher-ranked one (or vice versa, keeping the longer)."""
+    kept = []
+    for chunk in chunks:
+        text = _normalized(chunk["text"])
+        duplicate = False
+        for i, other in enumerate(kept):
+            other_text = _normalized(other["text"])
+            if text in other_text:
+                duplicate = True
+                break
+            if other_text in text:
+                kept[i] = {**chunk, "rank": other["rank"]}
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(chunk)
+    return kept
+
+
+def merge_adjacent(chunks):
+    """Merge chunks that are consecutive blocks of the same page into one passage.
+
+    Chunk ids are assigned in reading order, so adjacent blocks have consecutive ids.
+    Chunks without an id are kept as passages of their own. Passages keep the best
+    rank of their chunks.
+    """
+    passages = []
+    for chunk in sorted(chunks, key=lambda c: (c.get("doc_id") or "", c.get("page", 0), c.get("id", -1), c["rank"])):
+        last = passages[-1] if passages else None
+        if (last and chunk.get("id") is not None and last["last_id"] is not None
+                and last.get("doc_id") == chunk.get("doc_id") and last.get("page") == chunk.get("page")
+                and chunk["id"] == last["last_id"] + 1):
+            last["text"] = f"{last['text']}\n{chunk['text']}"
+            last["last_id"] = chunk["id"]
+            last["rank"] = min(last["rank"], chunk["rank"])
+        else:
+            passages.append({**chunk, "last_id": chunk.get("id")})
+    return sorted(passages, key=lambda p: p["rank"])
+
+
+def format_source(chunk):
+    page = chunk.get("page", "?")
+    doc_id = chunk.get("doc_id")
+    return f"{doc_id}, Page {page}" if doc_id else f"Page {page}"
+
+
+def assemble_context(chunks, token_budget):
+    """Build the prompt context from ranked chunks within token_budget.
+
+    Returns (context, stats). The passage that crosses the budget is trimmed on a
+    sentence boundary; anything after it is dropped.
+    """
+    ranked = [{**chunk, "rank": rank} for rank, chunk in enumerate(chunks)]
+    passages = merge_adjacent(dedupe_chunks(ranked))
+    parts = []
+    used = 0
+    for passage in passages:
+        header = f"[{format_source(passage)}]\n"
+        remaining = token_budget - used - estimate_tokens(header)
+        if remaining <= 0:
+            break
+        text = passage["text"].strip()
+        if estimate_tokens(text) > remaining:
+            text = trim_to_budget(text, remaining)
+            if not text:
+                break
+        parts.append(header + text)
+        used += estimate_tokens(header + text)
+    stats = {
+        "chunks": len(chunks),
+        "passages": len(parts),
+        "raw_tokens": sum(estimate_tokens(chunk["text"]) for chunk in chunks),
+        "tokens": used,
+    }
+    return "\n---\n".join(parts), stats
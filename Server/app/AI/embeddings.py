@@ -0,0 +1,256 @@
+import os
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_MODEL_FILES = {"onnx": "model.onnx", "onnx-int8": "model_int8.onnx"}
+# Threads per ONNX Runtime session (0 lets ONNX Runtime choose)
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+
+def onnx_model_dir(output_dir, model_name):
+    """Where export_onnx.py writes a model: <output_dir>/onnx/<model name>."""
+    return os.path.join(output_dir, "onnx", model_name.replace("/", "__"))
+
+
+class OnnxEmbedder:
+    """SentenceTransformer-compatible encoder on ONNX Runtime, with no torch import.
+
+    Loads a model exported by app/scripts/export_onnx.py: the transformer graph
+    (fp32 or int8-quantized), its tokenizer.json, and embedder.json describing the
+    pooling and normalization the SentenceTransformer pipeline applied.
+    """
+
+    def __init__(self, model_dir, quantized=False, threads=ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        with open(os.path.join(model_dir, "embedder.json")) as f:
+            self.config = json.load(f)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        path = os.path.join(model_dir, ONNX_MODEL_FILES["onnx-int8" if quantized else "onnx"])
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"])
+
+    def get_sentence_embedding_dimension(self):
+        return self.config["dim"]
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": input_ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feed)[0]
+        return pool(hidden, mask, self.config["pooling"])
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.config["dim"]), dtype=np.float32)
+        # Longest first, so each batch pads to similar lengths
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            positions = order[start:start + batch_size]
+            embeddings[positions] = self._encode_batch([texts[i] for i in positions])
+        if self.config["normalize"] or normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+def pool(hidden, mask, mode):
+    """Token embeddings (batch, seq, dim) to sentence embeddings, as sentence_transformers' Pooling does."""
+    if mode == "cls":
+        return hidden[:, 0]
+    weights = mask[..., None].astype(hidden.dtype)
+    return (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+
+
+def load_embedder(model_name, backend="torch", onnx_dir=None):
+    """An encoder with SentenceTransformer's encode() and get_sentence_embedding_dimension()."""
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend not in ONNX_MODEL_FILES:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {EMBED_BACKENDS}")
+    if not onnx_dir or not os.path.exists(os.path.join(onnx_dir, ONNX_MODEL_FILES[backend])):
+        raise FileNotFoundError(f"No {backend} export of {model_name} in {onnx_dir}; run app/scripts/export_onnx.py")
+    logger.info(f"Using {backend} embeddings from {onnx_dir}")
+    return OnnxEmbedder(onnx_dir, quantized=backend == "onnx-int8")
+
+
+def normalize_query(text):
+    """Cache key text: case and whitespace differences do not change the question."""
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """LRU of raw query embeddings keyed by normalized text.
+
+    With a path, entries are also written through to a SQLite file shared by every
+    worker on the host, so a restart or a new worker starts warm. Writes are
+    committed every `commit_every` entries or `commit_interval` seconds rather than
+    per miss; a crash loses at most those, which are recomputed. Keys are
+    namespaced by backend and model so switching either never serves stale vectors.
+    """
+
+    def __init__(self, namespace, max_entries=10000, path=None, commit_every=64, commit_interval=5.0):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._conn = None
+        self._writes = 0
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; no fsync per commit
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS query_embedding (
+                    key TEXT PRIMARY KEY,
+                    embedding BLOB NOT NULL,
+                    used_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_query_embedding_used_at ON query_embedding (used_at)")
+            self._conn.commit()
+
+    def _key(self, text):
+        return f"{self.namespace}\x00{normalize_query(text)}"
+
+    def _get(self, key):
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+            return vector
+        if self._conn is None:
+            return None
+        row = self._conn.execute("SELECT embedding FROM query_embedding WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vector = np.frombuffer(row[0], dtype=np.float32)
+        self._remember(key, vector)
+        return vector
+
+    def _remember(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _persist(self, rows):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO query_embedding (key, embedding, used_at) VALUES (?, ?, ?)",
+            [(key, vector.astype(np.float32).tobytes(), now) for key, vector in rows],
+        )
+        self._writes += len(rows)
+        if self._writes >= 1000:
+            # Trim the file to the newest entries now and then rather than on every write
+            self._writes = 0
+            self._conn.execute(
+                "DELETE FROM query_embedding WHERE key NOT IN "
+                "(SELECT key FROM query_embedding ORDER BY used_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+        self._uncommitted += len(rows)
+        if self._uncommitted >= self.commit_every or time.monotonic() - self._committed_at >= self.commit_interval:
+            self._commit()
+
+    def _commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+
+    def flush(self):
+        """Commit entries not yet written to the shared file."""
+        with self._lock:
+            if self._conn is not None and self._uncommitted:
+                self._commit()
+
+    def encode(self, model, texts):
+        """model.encode(texts) with cached rows filled in; misses are encoded in one batch."""
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            cached = [self._get(key) for key in keys]
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            encoded = model.encode([texts[i] for i in missing], convert_to_numpy=True, batch_size=len(missing))
+            fresh = []
+            for i, vector in zip(missing, np.asarray(encoded, dtype=np.float32)):
+                cached[i] = vector
+                fresh.append((keys[i], vector))
+            with self._lock:
+                for key, vector in fresh:
+                    self._remember(key, vector)
+                if self._conn is not None:
+                    self._persist(fresh)
+        return np.stack(cached)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM query_embedding")
+                self._commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "persistent": self._conn is not None,
+        }
+
+
+class NoQueryEmbeddingCache:
+    def encode(self, model, texts):
+        return np.asarray(model.encode(texts, convert_to_numpy=True, batch_size=len(texts)), dtype=np.float32)
+
+    def clear(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def stats(self):
+        return {"entries": 0, "hits": 0, "misses": 0, "hit_rate": 0.0, "persistent": False}
+
+
+def build_query_embedding_cache(output_dir, namespace):
+    """Build the query embedding cache from QUERY_EMBED_CACHE_* environment variables."""
+    # memory (default), sqlite to share a warm cache across workers and restarts, or off
+    backend = os.getenv("QUERY_EMBED_CACHE", "memory")
+    max_entries = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "10000"))
+    if backend == "off":
+        return NoQueryEmbeddingCache()
+    if backend == "sqlite":
+        path = os.getenv("QUERY_EMBED_CACHE_PATH", os.path.join(output_dir, "query_embeddings.sqlite3"))
+        try:
+            return QueryEmbeddingCache(namespace, max_entries, path)
+        except sqlite3.Error as e:
+            logger.warning(f"Query embedding cache at {path} unavailable ({e}); keeping it in memory")
+    return QueryEmbeddingCache(namespace, max_entries)
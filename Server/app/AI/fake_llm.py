@@ -0,0 +1,63 @@
+import asyncio
+import os
+import random
+import time
+
+
+class ServiceUnavailable(Exception):
+    """Named like google.api_core's 503 so the gateway treats it as transient."""
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStreamResponse:
+    """Async iterable of chunks, spreading the configured latency across tokens."""
+
+    def __init__(self, text, latency):
+        self.tokens = [token + " " for token in text.split(" ")]
+        self.delay = latency / max(len(self.tokens), 1)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for token in self.tokens:
+            await asyncio.sleep(self.delay)
+            yield FakeResponse(token)
+
+
+class FakeGenerativeModel:
+    """Offline stand-in for genai.GenerativeModel with a configurable latency.
+
+    FAKE_LLM_FAILURE_RATE of calls fail with ServiceUnavailable and FAKE_LLM_SLOW_RATE
+    take FAKE_LLM_SLOW_LATENCY instead, drawn from a FAKE_LLM_SEED-seeded generator
+    so runs are reproducible.
+    """
+
+    def __init__(self, latency=None, answer=None, system_instruction=None):
+        self.system_instruction = system_instruction
+        self.latency = float(latency if latency is not None else os.getenv("FAKE_LLM_LATENCY", "1.0"))
+        self.answer = answer or "This is a canned answer from the fake tutor model."
+        self.failure_rate = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+        self.slow_rate = float(os.getenv("FAKE_LLM_SLOW_RATE", "0"))
+        self.slow_latency = float(os.getenv("FAKE_LLM_SLOW_LATENCY", "5.0"))
+        self.random = random.Random(int(os.getenv("FAKE_LLM_SEED", "0")))
+
+    def _next_latency(self):
+        if self.random.random() < self.failure_rate:
+            raise ServiceUnavailable("fake LLM unavailable")
+        return self.slow_latency if self.random.random() < self.slow_rate else self.latency
+
+    def generate_content(self, prompt, request_options=None):
+        time.sleep(self._next_latency())
+        return FakeResponse(self.answer)
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        latency = self._next_latency()
+        if stream:
+            return FakeStreamResponse(self.answer, latency)
+        await asyncio.sleep(latency)
+        return FakeResponse(self.answer)
@@ -0,0 +1,322 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+import numpy as np
+from app.AI.resources import resources
+from app.core.metrics import (
+    llm_calls, llm_hedges, llm_in_flight, llm_prompt_tokens, llm_response_tokens, llm_retries, registry, stage,
+)
+
+logger = logging.getLogger(__name__)
+
+# Cap on in-flight LLM calls; callers beyond it queue (within their deadline)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Deadline for one answer, queueing and retries included
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+# Retries on transient errors, with exponential backoff (plus jitter) from LLM_RETRY_BASE_DELAY seconds
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+# Consecutive transient failures that open the circuit, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+# Send a second copy of a call still running after this percentile of recent latencies (0 disables)
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "50"))
+
+# google.api_core exception names worth retrying; matched by name so google is not imported here
+TRANSIENT_ERRORS = {
+    "ServiceUnavailable", "TooManyRequests", "ResourceExhausted", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "Aborted", "RetryError",
+}
+
+
+class LLMUnavailableError(Exception):
+    """No answer could be generated in time; the request should fail rather than save a placeholder."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_transient(error):
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in TRANSIENT_ERRORS
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `cooldown` seconds one probe call is let through."""
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+        return max(1, int(self.opened_at + self.cooldown - time.monotonic() + 1))
+
+    def acquire(self):
+        """(allowed, probe): whether a call may go ahead, and whether it is the half-open probe.
+
+        A probe must end in record_success, record_failure or release, or no further
+        call is let through.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True, False
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True, True
+            return False, False
+
+    def release(self, probe):
+        """End a call that gave no verdict on the provider: cancelled, or timed out waiting locally."""
+        if probe:
+            with self._lock:
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.threshold:
+                if self.opened_at is None or self.state == "half_open":
+                    logger.warning(f"LLM circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+class LLMQueueTimeout(TimeoutError):
+    """The deadline passed waiting for a concurrency slot: local load, not a provider failure."""
+
+
+async def within(deadline, awaitable):
+    """Await with an absolute event-loop deadline; raises TimeoutError when it passes."""
+    async with asyncio.timeout_at(deadline):
+        return await awaitable
+
+
+class LLMGateway:
+    """Every LLM call goes through here: deadline, concurrency cap, retries, circuit breaker and hedging.
+
+    The provider is anything with genai.GenerativeModel's
+    `generate_content_async(prompt, stream=False, request_options=None)`, by default
+    the process-wide `resources.client`, so its connection is reused across calls.
+    The fake provider (LLM_PROVIDER=fake) or a test double can be passed instead.
+    """
+
+    def __init__(self, provider=None, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, retry_base_delay=LLM_RETRY_BASE_DELAY, breaker=None,
+                 hedge_percentile=LLM_HEDGE_PERCENTILE, hedge_min_samples=LLM_HEDGE_MIN_SAMPLES):
+        self._provider = provider
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = deque(maxlen=512)  # seconds, successful non-streaming calls
+
+    @property
+    def provider(self):
+        return self._provider or resources.client
+
+    def _check_breaker(self):
+        """Reject the call while the circuit is open; returns whether it is the half-open probe."""
+        allowed, probe = self.breaker.acquire()
+        if not allowed:
+            llm_calls.inc("rejected")
+            raise LLMUnavailableError("LLM circuit is open", retry_after=self.breaker.retry_after())
+        return probe
+
+    def _fail(self, error):
+        llm_calls.inc("failed")
+        logger.error(f"LLM call failed: {error!r}")
+        return LLMUnavailableError(f"LLM call failed: {error}", retry_after=self.breaker.retry_after() or 1)
+
+    async def _backoff(self, attempt, deadline):
+        """Sleep before retry `attempt`; False when out of retries or the delay would overrun the deadline."""
+        if attempt >= self.max_retries or self.breaker.state != "closed":
+            return False
+        delay = self.retry_base_delay * 2 ** attempt * random.uniform(0.5, 1.5)
+        if asyncio.get_running_loop().time() + delay >= deadline:
+            return False
+        llm_retries.inc()
+        await asyncio.sleep(delay)
+        return True
+
+    @asynccontextmanager
+    async def _slot(self, deadline):
+        """Hold one of the concurrency slots; waiting and running calls show in llm_in_flight."""
+        with stage("llm_queue"), llm_in_flight.track("waiting"):
+            try:
+                await within(deadline, self.semaphore.acquire())
+            except TimeoutError as e:
+                raise LLMQueueTimeout("No LLM slot came free before the deadline") from e
+        try:
+            with stage("llm"), llm_in_flight.track("running"):
+                yield
+        finally:
+            self.semaphore.release()
+
+    @staticmethod
+    def _request_options(deadline):
+        # Also sent to the provider so the server side gives up when we do
+        return {"timeout": max(0.1, deadline - asyncio.get_running_loop().time())}
+
+    def hedge_delay(self):
+        if not self.hedge_percentile or len(self.latencies) < self.hedge_min_samples:
+            return None
+        return float(np.percentile(self.latencies, self.hedge_percentile))
+
+    async def _attempt(self, prompt, deadline):
+        async with self._slot(deadline):
+            start = time.perf_counter()
+            response = await within(deadline, self.provider.generate_content_async(
+                prompt, request_options=self._request_options(deadline)
+            ))
+            self.latencies.append(time.perf_counter() - start)
+            return response
+
+    async def _hedged_attempt(self, prompt, deadline):
+        """Run an attempt; if it outlives the hedge delay and a slot is free, race a second copy."""
+        hedge_after = self.hedge_delay()
+        if hedge_after is None:
+            return await self._attempt(prompt, deadline)
+        primary = asyncio.ensure_future(self._attempt(prompt, deadline))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+            if done or self.semaphore.locked():
+                return await primary
+            llm_hedges.inc("sent")
+            hedge = asyncio.ensure_future(self._attempt(prompt, deadline))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        llm_hedges.inc("won" if task is hedge else "lost")
+                        return task.result()
+            return primary.result()  # both failed; surface the primary's error
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def generate(self, prompt):
+        """One complete response, or LLMUnavailableError once retries or the deadline run out."""
+        probe = self._check_breaker()
+        deadline = asyncio.get_running_loop().time() + self.timeout
+        attempt = 0
+        while True:
+            try:
+                response = await self._hedged_attempt(prompt, deadline)
+            except LLMQueueTimeout as e:
+                self.breaker.release(probe)
+                raise self._fail(e) from e
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.record_success()  # the provider answered; the request itself was bad
+                    raise
+                self.breaker.record_failure()
+                if not await self._backoff(attempt, deadline):
+                    raise self._fail(e) from e
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled: the client went away or a caller's own deadline fired
+                self.breaker.release(probe)
+                raise
+            self.breaker.record_success()
+            llm_calls.inc("ok")
+            log_usage(response)
+            return response
+
+    async def stream(self, prompt):
+        """Yield text chunks as they arrive.
+
+        Failures before the first chunk are retried like generate(); after it, the
+        answer is incomplete and LLMUnavailableError is raised instead.
+        """
+        probe = self._check_breaker()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self._slot(deadline):
+                    response = await within(deadline, self.provider.generate_content_async(
+                        prompt, stream=True, request_options=self._request_options(deadline)
+                    ))
+                    chunks = response.__aiter__()
+                    while True:
+                        try:
+                            chunk = await within(deadline, chunks.__anext__())
+                        except StopAsyncIteration:
+                            break
+                        if chunk.text:
+                            started = True
+                            yield chunk.text
+            except LLMQueueTimeout as e:
+                self.breaker.release(probe)
+                raise self._fail(e) from e
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if started or not await self._backoff(attempt, deadline):
+                    raise self._fail(e) from e
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled, or the consumer stopped reading (GeneratorExit)
+                self.breaker.release(probe)
+                raise
+            self.breaker.record_success()
+            llm_calls.inc("ok")
+            log_usage(response)  # totals are available once the stream is consumed
+            return
+
+
+def log_usage(response):
+    """Log and record Gemini's billed token counts when the response carries them."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        logger.info(f"Gemini tokens: {usage.prompt_token_count} in, {usage.candidates_token_count} out")
+        llm_prompt_tokens.observe(usage.prompt_token_count)
+        llm_response_tokens.observe(usage.candidates_token_count)
+
+
+llm_gateway = LLMGateway()
+
+
+@registry.collector
+def gateway_samples():
+    return [
+        ("llm_circuit_open", "gauge", "1 while the LLM circuit breaker rejects calls", int(llm_gateway.breaker.state == "open")),
+        ("llm_consecutive_failures", "gauge", "Consecutive transient LLM failures", llm_gateway.breaker.failures),
+    ]
@@ -1,12 +1,19 @@
 import os
-from google import generativeai as genai
-from sentence_transformers import SentenceTransformer
-import faiss
-import numpy as np
-import pickle
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from functools import lru_cache
+import numpy as np
 from dotenv import load_dotenv
+from app.AI.resources import EMBED_BACKEND, EMBED_MODEL_NAME, resources
+from app.AI.cache import build_answer_cache
+from app.AI.embeddings import build_query_embedding_cache, normalize_query
+from app.AI.batching import MicroBatcher
+from app.AI.singleflight import FlightCancelled, SingleFlight
+from app.AI.context import TUTOR_SYSTEM_INSTRUCTION, assemble_context, estimate_tokens
+from app.AI.memory import rewrite_for_retrieval
+from app.AI.manifest import sha256_text
+from app.AI.gateway import LLM_TIMEOUT, LLMUnavailableError, llm_gateway, log_usage
+from app.core.metrics import registry, run_in_executor, stage, tutor_replies
 
 # Load environment variables
 load_dotenv()
@@ -15,122 +22,485 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Initialize Gemini client
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    logger.error("Gemini API key not set in .env file")
-    raise ValueError("Gemini API key not set in .env file")
-
-try:
-    genai.configure(api_key=GEMINI_API_KEY)
-    client = genai.GenerativeModel('gemini-1.5-pro')
-except Exception as e:
-    logger.error(f"Failed to initialize Gemini client: {e}")
-    raise
-
-# Absolute path to output folder
-#OUTPUT_DIR = r"E:\Personal Project\AI Projects\AI-Tutor-APP-ME-and-Tony\AJ-AI-TUTOR\AJ-AI-Tutor\Server\app\output"
-OUTPUT_DIR = os.getenv("OUTPUT_DIR", "/code/app/output")  
-
-# Load embedding model and RAG data
-try:
-    embed_model = SentenceTransformer('all-MiniLM-L6-v2')
-    index = faiss.read_index(os.path.join(OUTPUT_DIR, "textbook_index.faiss"))
-    with open(os.path.join(OUTPUT_DIR, "text_chunks.pkl"), "rb") as f:
-        text_chunks = pickle.load(f)
-except Exception as e:
-    logger.error(f"Error loading RAG data: {e}")
-    raise
-
-@lru_cache(maxsize=100)
-def is_python_question(query, threshold=0.7):
-    python_keywords = [
-        'python', 'list', 'dict', 'function', 'loop', 'variable', 'string', 'class',
-        'import', 'lambda', 'def', 'tuple', 'set', 'int', 'float', 'bool', 'syntax',
-        'error', 'numbers', 'numeric', 'arithmetic', 'types', 'math', 'operators',
-        'if', 'elif', 'else', 'while', 'for', 'break', 'continue', 'input', 'print',
-        'type', 'conversion', 'indexing', 'slicing', 'concatenation', 'password'
+# Bounded pool for CPU work (embedding, FAISS search); Gemini calls are bounded by llm_gateway
+RAG_WORKERS = int(os.getenv("RAG_WORKERS", "4"))
+rag_executor = ThreadPoolExecutor(max_workers=RAG_WORKERS, thread_name_prefix="rag")
+
+# Near-duplicate questions are answered from here instead of calling Gemini
+answer_cache = build_answer_cache(resources.output_dir)
+# Repeated questions skip the embedding forward pass
+query_embedding_cache = build_query_embedding_cache(resources.output_dir, f"{EMBED_BACKEND}:{EMBED_MODEL_NAME}")
+
+# The embedding model, FAISS index, chunks and Gemini client are loaded lazily by
+# `resources` (or up front in the FastAPI lifespan hook), not at import time.
+
+# Questions with no syllabus keyword must be at least this close to a topic centroid
+TOPIC_SIMILARITY_THRESHOLD = float(os.getenv("TOPIC_SIMILARITY_THRESHOLD", "0.35"))
+
+# ANN search knobs; ignored by index types they do not apply to
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+
+# Minimum cosine similarity for a chunk to be included in the prompt
+MIN_CONTEXT_SIMILARITY = float(os.getenv("MIN_CONTEXT_SIMILARITY", "0.4"))
+
+# Chunks retrieved per question, and the token budget they are assembled into
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+SYSTEM_INSTRUCTION_TOKENS = estimate_tokens(TUTOR_SYSTEM_INSTRUCTION)
+
+# Hybrid retrieval: dense and BM25 candidates fused by reciprocal rank. The BM25
+# budget bounds lexical scoring per query; common terms beyond it are skipped.
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+HYBRID_BUDGET_MS = float(os.getenv("HYBRID_BUDGET_MS", "20"))
+
+# Concurrent async requests share embedding forward passes and FAISS searches
+MICRO_BATCHING = os.getenv("MICRO_BATCHING", "1") == "1"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "2"))
+
+def search_index(q_emb, top_k, nprobe=None, ef_search=None, snapshot=None):
+    from app.AI.ann import make_search_params  # imports faiss; keep app.main import cheap
+    index = (snapshot or resources.snapshot).index
+    params = make_search_params(index, nprobe or FAISS_NPROBE, ef_search or FAISS_EF_SEARCH)
+    return index.search(q_emb, top_k, params=params)
+
+def embed_batch(queries):
+    """Raw (unnormalized) embeddings, one row per query."""
+    return query_embedding_cache.encode(resources.embed_model, queries)
+
+def fit_to_index(embeddings, snapshot=None):
+    # Unit-length query vectors make inner-product scores cosine similarities
+    if (snapshot or resources.snapshot).meta["normalized"]:
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings.astype(np.float32)
+
+def embed_query(query, snapshot=None):
+    return fit_to_index(embed_batch([query]), snapshot)
+
+def search_batch(requests):
+    """Search many (snapshot, q_emb, top_k) requests with one index.search per snapshot."""
+    groups = {}
+    for pos, (snapshot, _, _) in enumerate(requests):
+        groups.setdefault(id(snapshot), []).append(pos)
+    results = [None] * len(requests)
+    for positions in groups.values():
+        snapshot = requests[positions[0]][0]
+        top_k = max(requests[pos][2] for pos in positions)
+        D, I = search_index(np.vstack([requests[pos][1] for pos in positions]), top_k, snapshot=snapshot)
+        for row, pos in enumerate(positions):
+            k = requests[pos][2]
+            results[pos] = (D[row:row + 1, :k], I[row:row + 1, :k])
+    return results
+
+embed_batcher = MicroBatcher(
+    lambda queries: list(embed_batch(queries)[:, None, :]),
+    rag_executor, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS / 1000, name="embed",
+)
+search_batcher = MicroBatcher(search_batch, rag_executor, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS / 1000, name="search")
+
+# Identical questions asked while one is already being answered wait for that answer
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "1") == "1"
+in_flight = SingleFlight()
+
+@registry.collector
+def rag_samples():
+    """Answer cache, query embedding cache and micro-batcher counters, read at scrape time."""
+    cache = answer_cache.stats()
+    embeddings = query_embedding_cache.stats()
+    samples = [
+        ("answer_cache_hits_total", "counter", "Semantic answer cache hits", cache.get("hits", 0)),
+        ("answer_cache_misses_total", "counter", "Semantic answer cache misses", cache.get("misses", 0)),
+        ("answer_cache_entries", "gauge", "Entries in the semantic answer cache", cache.get("entries", 0)),
+        ("query_embedding_cache_hits_total", "counter", "Query embeddings served from cache", embeddings["hits"]),
+        ("query_embedding_cache_misses_total", "counter", "Query embeddings computed", embeddings["misses"]),
     ]
-    query_lower = query.lower()
-    keyword_match = any(keyword in query_lower for keyword in python_keywords)
-    
-    q_emb = embed_model.encode([query], convert_to_numpy=True)
-    avg_emb = np.mean(embed_model.encode(python_keywords, convert_to_numpy=True), axis=0)
-    similarity = np.dot(q_emb, avg_emb.T) / (np.linalg.norm(q_emb) * np.linalg.norm(avg_emb))
-    
-    return keyword_match or similarity > threshold
-
-def retrieve_relevant_context(query, top_k=3, min_similarity=0.5):
+    for batcher in (embed_batcher, search_batcher):
+        stats = batcher.stats()
+        samples.append((f"{batcher.name}_batches_total", "counter", f"Micro-batched {batcher.name} calls", stats["batches"]))
+        samples.append((f"{batcher.name}_batch_items_total", "counter", f"Requests served by {batcher.name} batches", stats["items"]))
+    flights = in_flight.stats()
+    samples.append(("tutor_generations_in_flight", "gauge", "Coalesced tutor generations running", flights["in_flight"]))
+    samples.append(("tutor_coalesced_requests_total", "counter", "Requests answered by another request's generation", flights["joined"]))
+    return samples
+
+def is_python_question(query, threshold=TOPIC_SIMILARITY_THRESHOLD, q_emb=None):
+    if q_emb is None:
+        q_emb = embed_query(query)
+    with stage("topic_gate"):
+        return resources.topic_classifier.is_python_question(query, q_emb, threshold)
+
+def retrieve_relevant_context(query, top_k=RETRIEVAL_TOP_K, min_similarity=MIN_CONTEXT_SIMILARITY, q_emb=None, nprobe=None, ef_search=None, snapshot=None):
+    return retrieve_with_provenance(query, top_k, min_similarity, q_emb, nprobe, ef_search, snapshot)[0]
+
+def retrieve_with_provenance(query, top_k=RETRIEVAL_TOP_K, min_similarity=MIN_CONTEXT_SIMILARITY, q_emb=None, nprobe=None, ef_search=None, snapshot=None):
+    """(context, provenance) for a query; provenance is None if retrieval failed."""
     try:
-        q_emb = embed_model.encode([query], convert_to_numpy=True)
-        D, I = index.search(q_emb, top_k)
-        retrieved_chunks = []
-        for i, dist in zip(I[0], D[0]):
-            similarity = 1 - (dist / 2.0)
-            if similarity >= min_similarity:
-                chunk = text_chunks[i]
-                text = chunk.get("text", "")
-                page = chunk.get("page", "?")
-                retrieved_chunks.append(f"[Page {page}]\n{text}")
-        return "\n---\n".join(retrieved_chunks) if retrieved_chunks else "No relevant textbook content found."
+        snapshot = snapshot or resources.snapshot
+        if q_emb is None:
+            with stage("embed"):
+                q_emb = embed_query(query, snapshot)
+        with stage("search"):
+            D, I = search_index(q_emb, candidate_count(top_k, snapshot), nprobe, ef_search, snapshot)
+        chunk_ids = select_chunks(snapshot, query, D, I, top_k, min_similarity)
+        return format_context(snapshot, chunk_ids), retrieval_provenance(snapshot, chunk_ids, D, I)
     except Exception as e:
         logger.error(f"Error retrieving context: {e}")
-        return "Error retrieving context."
-
-def generate_rag_prompt(question, context):
-    prompt = f"""
-        You are a warm, patient, and knowledgeable AI tutor, like a great teacher who explains things clearly and makes learning enjoyable. 
-        Your job is to help the student understand their textbook content deeply using the given context, but you can also use your own expertise to add helpful details, real-world applications, and analogies.
-
-        Here’s how to respond:
-        1. Start by naturally acknowledging the relevant textbook content. Summarize it in your own words without quoting mechanically.
-        2. Give a clear, friendly explanation as if you’re teaching a curious student. Expand on the topic with examples, analogies, and practical applications. 
-        3. If code examples make sense, include them in a natural way with helpful comments.
-        4. Smoothly integrate textbook page references into your sentences (e.g., “On page 6, your textbook promises to explain…”), but don’t list them in a rigid block.
-        5. Keep the tone warm, encouraging, and approachable—avoid sounding like a rigid template.
-        6. End by encouraging the student to explore further in the textbook for deeper understanding.
-        7. For multi-step concepts or processes, explain step by step in simple terms.
-        8. If the question is outside the textbook or Python syllabus, politely explain that you focus on the syllabus content and guide the student back to relevant topics.
-
-        
-        When explaining concepts like programming or theory:
-        - Begin with a simple **definition in one sentence**.
-        - Use **an analogy** (e.g., LEGOs, family trees) to make it relatable.
-        - If applicable, include a **visual hierarchy or structure** in text form (like a class diagram or flow).
-        - For programming topics, add **one main example** that demonstrates the concept in a beginner-friendly way, including **comments explaining each part**.
-        - Briefly mention **related variations or types** (like different kinds of inheritance), even if you don’t dive deep. **Whenever you mention these types (single inheritance, multiple inheritance, multilevel inheritance, hybrid inheritance), write them in bold using Markdown** so they stand out.
-        - If needed, show an **extra mini-example** for advanced cases, but keep it short and clear.
-        - Reassure the learner that it’s okay if it feels abstract at first, and encourage **practice and experimentation**.
-        
-
-        Context from the textbook:
-        {context}
-
-        Student’s question:
-        {question}
-
-        Now craft a helpful, teacher-like answer.
-        """
+        return "Error retrieving context.", None
+
+def hybrid_enabled(snapshot):
+    return HYBRID_RETRIEVAL and snapshot.bm25 is not None
+
+def candidate_count(top_k, snapshot):
+    """Dense hits to fetch: extra candidates give the fusion something to re-rank."""
+    return max(top_k, HYBRID_CANDIDATES) if hybrid_enabled(snapshot) else top_k
+
+def select_chunks(snapshot, query, D, I, top_k=RETRIEVAL_TOP_K, min_similarity=MIN_CONTEXT_SIMILARITY):
+    """Vector ids for the prompt: dense hits above min_similarity, fused with BM25 hits when available."""
+    with stage("select"):
+        return _select_chunks(snapshot, query, D, I, top_k, min_similarity)
+
+def _select_chunks(snapshot, query, D, I, top_k, min_similarity):
+    from app.AI.ann import similarity_from_score
+    from app.AI.bm25 import reciprocal_rank_fusion
+    metric = snapshot.meta["metric"]
+    dense = [
+        int(i) for i, score in zip(I[0], D[0])
+        # ANN indexes pad with -1 when fewer than top_k hits are found
+        if i >= 0 and similarity_from_score(score, metric) >= min_similarity
+    ]
+    if not hybrid_enabled(snapshot):
+        return dense[:top_k]
+    lexical = [i for i, _ in snapshot.bm25.search(query, HYBRID_CANDIDATES, HYBRID_BUDGET_MS)]
+    return reciprocal_rank_fusion([dense, lexical])[:top_k]
+
+def chunk_hash(chunk):
+    """Short fingerprint of a chunk's text; ids are reassigned when the index is rebuilt."""
+    return sha256_text(chunk["text"])[:12]
+
+def retrieval_provenance(snapshot, chunk_ids, D, I):
+    """What a prompt's context was built from, compact enough to store with each chat.
+
+    scores are dense cosine similarities; None for chunks only BM25 found.
+    chunk_hashes let a later index version tell whether an id still names the same text.
+    """
+    from app.AI.ann import similarity_from_score
+    metric = snapshot.meta["metric"]
+    dense = {int(i): similarity_from_score(score, metric) for i, score in zip(I[0], D[0]) if i >= 0}
+    chunks = [snapshot.text_chunks[i] for i in chunk_ids]
+    return {
+        "index_version": snapshot.version,
+        "chunk_ids": [int(i) for i in chunk_ids],
+        "scores": [round(float(dense[i]), 4) if i in dense else None for i in chunk_ids],
+        "pages": [chunk["page"] for chunk in chunks],
+        "doc_ids": [chunk.get("doc_id", "") for chunk in chunks],
+        "chunk_hashes": [chunk_hash(chunk) for chunk in chunks],
+    }
+
+def context_from_provenance(snapshot, provenance):
+    """Rebuild a stored answer's context from its chunk ids, without embedding or searching.
+
+    Returns None, so the question is retrieved again, when any chunk is gone or its id
+    now names different text (a full rebuild numbers chunks from 0 again). Provenance
+    saved without chunk_hashes is only trusted on the index version it came from.
+    """
+    chunk_ids = provenance["chunk_ids"]
+    hashes = provenance.get("chunk_hashes") or []
+    if not hashes and provenance["index_version"] != snapshot.version:
+        return None
+    for i, chunk_id in enumerate(chunk_ids):
+        try:
+            chunk = snapshot.text_chunks[chunk_id]
+        except (KeyError, IndexError):
+            return None
+        if hashes and chunk_hash(chunk) != hashes[i]:
+            return None
+    if provenance["index_version"] != snapshot.version:
+        logger.info(f"Reusing context from index v{provenance['index_version']} with index v{snapshot.version}")
+    return format_context(snapshot, chunk_ids)
+
+def format_context(snapshot, chunk_ids, token_budget=CONTEXT_TOKEN_BUDGET):
+    with stage("assemble"):
+        # The vector id is the chunk's id, whether or not the stored chunk carries one
+        chunks = [{**snapshot.text_chunks[i], "id": i} for i in chunk_ids]
+        context, stats = assemble_context(chunks, token_budget)
+    logger.info(
+        f"Context: {stats['chunks']} chunks -> {stats['passages']} passages, "
+        f"~{stats['raw_tokens']} -> ~{stats['tokens']} tokens (budget {token_budget})"
+    )
+    return context or "No relevant textbook content found."
+
+def screen_question(question, raw_emb, use_cache=True):
+    """Topic gate and answer cache for an embedded question.
+
+    Returns (snapshot, q_emb, reply). reply is set when no retrieval or LLM call is needed.
+    """
+    snapshot = resources.snapshot
+    q_emb = fit_to_index(raw_emb, snapshot)
+    if not is_python_question(question, q_emb=q_emb):
+        logger.info("Question rejected by topic gate")
+        tutor_replies.inc("off_topic")
+        return snapshot, q_emb, OFF_TOPIC_REPLY
+    if not use_cache:
+        return snapshot, q_emb, None
+    with stage("cache_lookup"):
+        reply = answer_cache.lookup(q_emb)
+    if reply is not None:
+        tutor_replies.inc("cache")
+    return snapshot, q_emb, reply
+
+def conversation_history(memory):
+    """The prompt's conversation section; answers generated with one depend on the session."""
+    return memory.render() if memory is not None else ""
+
+def prepare_reply(question, memory=None, use_cache=True):
+    """Run the CPU-bound steps before generation: embed once, topic gate, answer cache, retrieval.
+
+    Follow-ups are embedded and retrieved together with the previous question.
+    Returns (reply, q_emb, context, provenance). reply is set when no LLM call is
+    needed; q_emb is None when the answer depends on the conversation (a follow-up,
+    or any question asked with history in the prompt) and must not be cached;
+    provenance records the retrieved chunks (see retrieval_provenance).
+    """
+    search_query, follow_up = rewrite_for_retrieval(question, memory)
+    with stage("embed"):
+        raw_emb = embed_batch([search_query])
+    snapshot, q_emb, reply = screen_question(search_query, raw_emb, use_cache and not follow_up)
+    if reply is not None:
+        return reply, q_emb, None, None
+    context, provenance = retrieve_with_provenance(search_query, q_emb=q_emb, snapshot=snapshot)
+    cacheable = not follow_up and not conversation_history(memory)
+    return None, q_emb if cacheable else None, context, with_search_query(provenance, search_query, follow_up)
+
+def with_search_query(provenance, search_query, follow_up):
+    # A follow-up was searched with the earlier question folded in; keep what was actually searched
+    if provenance is not None and follow_up:
+        provenance["search_query"] = search_query
+    return provenance
+
+def reload_index(force=False):
+    """Hot-swap to a newer index on disk; cached answers were built from the old one."""
+    reloaded = resources.reload_index(force)
+    if reloaded:
+        answer_cache.clear()
+    return reloaded
+
+def generate_rag_prompt(question, context, history=None):
+    """Per-request prompt; the tutoring instructions are the client's system instruction."""
+    conversation = f"Conversation so far:\n{history}\n\n" if history else ""
+    prompt = f"Textbook context:\n{context}\n\n{conversation}Student's question:\n{question}"
+    logger.info(f"Prompt ~{estimate_tokens(prompt)} tokens (+{SYSTEM_INSTRUCTION_TOKENS} system instruction)")
     return prompt
 
 
-def get_tutor_reply_with_rag(question):
+IDENTITY_REPLY = (
+    "I am your AI tutor, designed to help you navigate and understand your textbook syllabus "
+    "by intelligently reading through your PDF and providing clear, concise explanations tailored to your questions."
+)
+
+OFF_TOPIC_REPLY = (
+    "I focus on the Python topics in your textbook syllabus, so I can't help with that one. "
+    "Try asking me about things like variables, loops, functions, or classes!"
+)
+
+def is_identity_question(question):
+    question_lower = question.lower()
+    return "who are you" in question_lower or "what are you" in question_lower or "yourself" in question_lower
+
+def get_tutor_reply_with_rag(question, memory=None):
+    """Blocking variant for scripts; errors are raised, never returned as the answer."""
     try:
-        question_lower = question.lower()
-        if "who are you" in question_lower or "what are you" in question_lower or "yourself" in question_lower:
-            return (
-                "I am your AI tutor, designed to help you navigate and understand your textbook syllabus "
-                "by intelligently reading through your PDF and providing clear, concise explanations tailored to your questions."
-            )
-
-        context = retrieve_relevant_context(question)
-        prompt = generate_rag_prompt(question, context)
-        response = client.generate_content(prompt)
-        return response.text.strip()
+        if is_identity_question(question):
+            tutor_replies.inc("identity")
+            return IDENTITY_REPLY
+
+        reply, q_emb, context, _ = prepare_reply(question, memory)
+        if reply is not None:
+            return reply
+        prompt = generate_rag_prompt(question, context, conversation_history(memory))
+        with stage("llm"):
+            response = resources.client.generate_content(prompt, request_options={"timeout": LLM_TIMEOUT})
+        log_usage(response)
+        answer = response.text.strip()
+        tutor_replies.inc("llm")
+        if q_emb is not None:
+            answer_cache.store(question, q_emb, answer)
+        return answer
     except Exception as e:
         logger.error(f"Error getting tutor reply: {e}")
-        return f"⚠️ An error occurred: {e}"
+        tutor_replies.inc("error")
+        raise
+
+async def prepare_reply_async(question, memory=None, top_k=RETRIEVAL_TOP_K):
+    """prepare_reply with the embedding and FAISS search micro-batched across concurrent requests."""
+    loop = asyncio.get_running_loop()
+    if not MICRO_BATCHING:
+        return await run_in_executor(loop, rag_executor, prepare_reply, question, memory)
+    search_query, follow_up = rewrite_for_retrieval(question, memory)
+    # Batched stages are timed as the caller sees them, queueing included
+    with stage("embed"):
+        raw_emb = await embed_batcher.submit(search_query)
+    snapshot, q_emb, reply = await run_in_executor(
+        loop, rag_executor, screen_question, search_query, raw_emb, not follow_up
+    )
+    if reply is not None:
+        return reply, q_emb, None, None
+    try:
+        with stage("search"):
+            D, I = await search_batcher.submit((snapshot, q_emb, candidate_count(top_k, snapshot)))
+        chunk_ids = await run_in_executor(loop, rag_executor, select_chunks, snapshot, search_query, D, I, top_k)
+        context = format_context(snapshot, chunk_ids)
+        provenance = with_search_query(retrieval_provenance(snapshot, chunk_ids, D, I), search_query, follow_up)
+    except Exception as e:
+        logger.error(f"Error retrieving context: {e}")
+        context, provenance = "Error retrieving context.", None
+    cacheable = not follow_up and not conversation_history(memory)
+    return None, q_emb if cacheable else None, context, provenance
+
+async def store_answer_async(question, q_emb, answer):
+    if q_emb is None:
+        return  # the answer depends on the conversation
+    loop = asyncio.get_running_loop()
+    with stage("cache_store"):
+        await loop.run_in_executor(rag_executor, answer_cache.store, question, q_emb, answer)
+
+def coalescing_key(question, memory=None):
+    """Key shared by requests that would get the same answer, or None when it depends on the session.
+
+    Only questions without conversation history qualify: their prompt is the same
+    for every student, so one generation can answer them all.
+    """
+    if not COALESCE_REQUESTS or conversation_history(memory) or is_identity_question(question):
+        return None
+    return normalize_query(question).rstrip("?!. ")
+
+async def get_tutor_reply_with_rag_async(question, memory=None):
+    """Non-blocking variant of get_tutor_reply_with_rag for async handlers.
 
+    Concurrent identical questions (see coalescing_key) share one generation.
+    Returns (answer, provenance); provenance is None when no retrieval was needed.
+    Raises LLMUnavailableError when Gemini cannot answer within its deadline.
+    """
+    key = coalescing_key(question, memory)
+    if key is None:
+        return await _tutor_reply_async(question, memory)
 
+    async def produce(flight):
+        answer, provenance = await _tutor_reply_async(question)
+        flight.publish(answer)
+        return provenance
 
+    flight, started = in_flight.join(key, produce)
+    if not started:
+        tutor_replies.inc("coalesced")
+    try:
+        provenance = await flight.wait()
+    except FlightCancelled as e:
+        raise LLMUnavailableError(str(e)) from e
+    return flight.text, provenance and dict(provenance)
+
+async def _tutor_reply_async(question, memory=None):
+    try:
+        if is_identity_question(question):
+            tutor_replies.inc("identity")
+            return IDENTITY_REPLY, None
+
+        reply, q_emb, context, provenance = await prepare_reply_async(question, memory)
+        if reply is not None:
+            return reply, None
+        prompt = generate_rag_prompt(question, context, conversation_history(memory))
+        response = await llm_gateway.generate(prompt)
+        answer = response.text.strip()
+        tutor_replies.inc("llm")
+        await store_answer_async(question, q_emb, answer)
+        return answer, provenance
+    except Exception as e:
+        if not isinstance(e, LLMUnavailableError):
+            logger.error(f"Error getting tutor reply: {e}")
+        tutor_replies.inc("error")
+        raise
 
+async def stream_tutor_reply_with_rag(question, memory=None, provenance=None):
+    """Yield the tutor answer in chunks as Gemini generates it; errors are raised after the chunks so far.
+
+    Concurrent identical questions share one generation, streamed or not; a request
+    that joins late is sent the chunks so far at once. Pass a dict as `provenance`
+    to have the retrieval provenance filled in by the end of the stream.
+    """
+    key = coalescing_key(question, memory)
+    if key is None:
+        async for text in _stream_tutor_reply(question, memory, provenance):
+            yield text
+        return
+
+    async def produce(flight):
+        retrieved = {}
+        async for text in _stream_tutor_reply(question, None, retrieved):
+            flight.publish(text)
+        return retrieved or None
+
+    flight, started = in_flight.join(key, produce)
+    if not started:
+        tutor_replies.inc("coalesced")
+    try:
+        async for text in flight.stream():
+            yield text
+    except FlightCancelled as e:
+        raise LLMUnavailableError(str(e)) from e
+    if provenance is not None and flight.result:
+        provenance.update(flight.result)
+
+async def _stream_tutor_reply(question, memory=None, provenance=None):
+    try:
+        if is_identity_question(question):
+            tutor_replies.inc("identity")
+            yield IDENTITY_REPLY
+            return
+
+        reply, q_emb, context, retrieved = await prepare_reply_async(question, memory)
+        if reply is not None:
+            yield reply
+            return
+        if provenance is not None and retrieved is not None:
+            provenance.update(retrieved)
+        prompt = generate_rag_prompt(question, context, conversation_history(memory))
+        parts = []
+        async for text in llm_gateway.stream(prompt):
+            parts.append(text)
+            yield text
+        tutor_replies.inc("llm")
+        await store_answer_async(question, q_emb, "".join(parts).strip())
+    except Exception as e:
+        if not isinstance(e, LLMUnavailableError):
+            logger.error(f"Error streaming tutor reply: {e}")
+        tutor_replies.inc("error")
+        raise
+
+async def regenerate_reply_async(question, provenance=None, memory=None):
+    """A fresh answer to an earlier question, from the context it was first answered with.
+
+    The stored chunk ids are looked up directly; only answers saved without provenance
+    (or whose chunks left or changed in the index) go through the topic gate and retrieval again.
+    The answer cache is bypassed. Returns (answer, provenance).
+    """
+    loop = asyncio.get_running_loop()
+    context = None
+    if provenance:
+        context = await run_in_executor(loop, rag_executor, context_from_provenance, resources.snapshot, provenance)
+    if context is None:
+        if is_identity_question(question):
+            return IDENTITY_REPLY, None
+        reply, _, context, provenance = await run_in_executor(loop, rag_executor, prepare_reply, question, memory, False)
+        if reply is not None:
+            return reply, None
+    prompt = generate_rag_prompt(question, context, conversation_history(memory))
+    try:
+        response = await llm_gateway.generate(prompt)
+    except Exception as e:
+        if not isinstance(e, LLMUnavailableError):
+            logger.error(f"Error regenerating tutor reply: {e}")
+        tutor_replies.inc("error")
+        raise
+    tutor_replies.inc("regenerated")
+    return response.text.strip(), provenance
@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_path(path):
+    """Yield a temporary path next to `path` and move it into place only if writing succeeds."""
+    tmp_path = f"{path}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sha256_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def page_hash(chunks):
+    return sha256_text("\x00".join(chunk["text"] for chunk in chunks))
+
+
+class ManifestBuilder:
+    """Builds the manifest from a stream of chunks grouped by document, in page order."""
+
+    def __init__(self, doc_files, version=1, next_id=None):
+        self.doc_files = doc_files
+        self.version = version
+        self.next_id = next_id or 0
+        self.documents = {}
+        self._page = None
+        self._page_digest = None
+
+    def add(self, chunk):
+        doc = self.documents.setdefault(chunk["doc_id"], {**self.doc_files[chunk["doc_id"]], "pages": {}})
+        page_key = str(chunk["page"])
+        page = doc["pages"].get(page_key)
+        if page is None:
+            self._finish_page()
+            page = doc["pages"][page_key] = {"sha256": None, "chunks": []}
+            self._page, self._page_digest = page, hashlib.sha256()
+        else:
+            self._page_digest.update(b"\x00")
+        text = chunk["text"].encode("utf-8")
+        self._page_digest.update(text)
+        page["chunks"].append([hashlib.sha256(text).hexdigest(), chunk["id"]])
+        # Ids of deleted chunks are never handed out again
+        self.next_id = max(self.next_id, chunk["id"] + 1)
+
+    def _finish_page(self):
+        if self._page is not None:
+            self._page["sha256"] = self._page_digest.hexdigest()
+
+    def build(self):
+        self._finish_page()
+        return {"version": self.version, "next_id": self.next_id, "documents": self.documents}
+
+
+def build_manifest(doc_files, chunks, version=1, next_id=None):
+    """Content-hash manifest per document, page and chunk, mapping chunks to their vector ids.
+
+    doc_files maps doc_id to {"path", "sha256"}; chunks must be grouped by document in page order.
+    """
+    builder = ManifestBuilder(doc_files, version, next_id)
+    for chunk in chunks:
+        builder.add(chunk)
+    return builder.build()
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
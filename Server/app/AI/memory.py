@@ -0,0 +1,128 @@
+import os
+import re
+from collections import OrderedDict, deque
+
+# Turns kept verbatim per session; older ones are folded into a short rolling summary
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "3"))
+MEMORY_SUMMARY_CHARS = int(os.getenv("MEMORY_SUMMARY_CHARS", "600"))
+MEMORY_ANSWER_CHARS = int(os.getenv("MEMORY_ANSWER_CHARS", "400"))
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "2000"))
+# Keep sessions in process between requests. Only correct with a single worker: turns
+# answered by another worker would be missing, so by default each request reloads them
+MEMORY_CACHE = os.getenv("MEMORY_CACHE", "0") == "1"
+
+# Words that only make sense relative to an earlier turn
+FOLLOW_UP_RE = re.compile(
+    r"\b(it|its|this|that|these|those|them|they|another|again|more|else|same|above|previous|"
+    r"earlier|instead|also|further|elaborate|example|why|how come)\b|^(and|but|so|what about|how about)\b",
+    re.IGNORECASE,
+)
+CONTENT_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{3,}")
+FOLLOW_UP_MAX_CONTENT_WORDS = 4
+
+
+def _clip(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " …"
+
+
+class SessionMemory:
+    """Rolling summary plus the last few turns of one chat session."""
+
+    def __init__(self, recent_turns=MEMORY_RECENT_TURNS, summary_chars=MEMORY_SUMMARY_CHARS):
+        self.turns = deque(maxlen=recent_turns)
+        self.summary_topics = deque()
+        self.summary_chars = summary_chars
+
+    def add_turn(self, query, answer):
+        if len(self.turns) == self.turns.maxlen:
+            self._fold(self.turns[0][0])
+        self.turns.append((query, answer))
+
+    def _fold(self, query):
+        # Extractive summary of earlier questions: no extra LLM call per turn, bounded size
+        self.summary_topics.append(_clip(query, 120))
+        while sum(len(topic) + 2 for topic in self.summary_topics) > self.summary_chars:
+            self.summary_topics.popleft()
+
+    @property
+    def last_query(self):
+        return self.turns[-1][0] if self.turns else None
+
+    def render(self, answer_chars=MEMORY_ANSWER_CHARS):
+        """Conversation context for the prompt; its size does not grow with the session."""
+        lines = []
+        if self.summary_topics:
+            lines.append("Earlier the student asked about: " + "; ".join(self.summary_topics))
+        for query, answer in self.turns:
+            lines.append(f"Student: {_clip(query, 300)}")
+            lines.append(f"Tutor: {_clip(answer, answer_chars)}")
+        return "\n".join(lines)
+
+
+def is_follow_up(query):
+    """Short questions that lean on a previous turn ("can you show another example?")."""
+    return bool(FOLLOW_UP_RE.search(query)) and len(CONTENT_WORD_RE.findall(query)) <= FOLLOW_UP_MAX_CONTENT_WORDS
+
+
+def rewrite_for_retrieval(query, memory):
+    """Return (retrieval query, is_follow_up). Follow-ups borrow the topic of the previous question."""
+    if memory is None or memory.last_query is None or not is_follow_up(query):
+        return query, False
+    return f"{memory.last_query} {query}", True
+
+
+class ConversationMemory:
+    """Bounded LRU of SessionMemory keyed by (user_id, chat_session_id).
+
+    Misses are filled from the last `load_limit` chats of the session, so a cold
+    session costs one LIMIT query rather than reading its whole history. Disabled
+    (every lookup misses) unless MEMORY_CACHE=1.
+    """
+
+    def __init__(self, max_sessions=MEMORY_MAX_SESSIONS, recent_turns=MEMORY_RECENT_TURNS, enabled=MEMORY_CACHE):
+        self.max_sessions = max_sessions
+        self.recent_turns = recent_turns
+        self.enabled = enabled
+        self._sessions = OrderedDict()
+
+    @property
+    def load_limit(self):
+        # The recent turns plus enough older questions to seed the summary
+        return self.recent_turns * 3
+
+    def get(self, key):
+        memory = self._sessions.get(key)
+        if memory is not None:
+            self._sessions.move_to_end(key)
+        return memory
+
+    def put(self, key, memory):
+        if not self.enabled:
+            return
+        self._sessions[key] = memory
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def from_rows(self, key, rows):
+        """Seed a session from (query, answer) rows in chronological order."""
+        memory = SessionMemory(self.recent_turns)
+        for query, answer in rows:
+            memory.add_turn(query, answer)
+        self.put(key, memory)
+        return memory
+
+    def record_turn(self, key, query, answer):
+        memory = self.get(key)
+        if memory is not None:
+            memory.add_turn(query, answer)
+
+    def discard(self, key):
+        self._sessions.pop(key, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+conversation_memory = ConversationMemory()
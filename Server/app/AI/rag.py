@@ -1,17 +1,93 @@
 import fitz  # PyMuPDF
 import os
-import pickle
+import glob
+import itertools
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 import faiss
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import logging
 import argparse
+from app.AI.ann import (
+    INDEX_TYPES, METRICS, build_index_metadata, create_faiss_index, describe_index,
+    read_index_metadata, supports_removal, with_id_map, write_index_metadata,
+)
+from app.AI.bm25 import BM25Index
+from app.AI.chunk_store import ChunkStore, ChunkStoreWriter
+from app.AI.embeddings import EMBED_BACKENDS, load_embedder, onnx_model_dir
+from app.AI.manifest import (
+    ManifestBuilder, atomic_path, load_manifest, page_hash, save_manifest, sha256_file, sha256_text,
+)
+from app.AI.topics import build_topic_centroids, save_topic_centroids
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def extract_pdf_paragraph_chunks_with_metadata(pdf_path, max_chunk_size=1000):
+def document_id(pdf_path, root=None):
+    """Stable id for a source document: its path under the input root, without extension.
+
+    Files given directly (root None) are identified by their bare name, as single-PDF
+    indexes always were; PDFs found under a directory keep their subdirectories.
+    """
+    relative = os.path.relpath(pdf_path, root or os.path.dirname(pdf_path) or ".")
+    return os.path.splitext(relative)[0].replace(os.sep, "/")
+
+def _glob_root(pattern):
+    """The directory part of a glob pattern, before its first wildcard."""
+    root = os.path.dirname(pattern)
+    while glob.has_magic(root):
+        root = os.path.dirname(root)
+    return root
+
+def iter_pdf_documents(inputs):
+    """Expand files, directories (searched recursively) and glob patterns into (doc_id, path) pairs."""
+    seen = {}
+    for item in inputs:
+        if os.path.isdir(item):
+            paths, root = sorted(glob.glob(os.path.join(item, "**", "*.pdf"), recursive=True)), item
+        elif os.path.exists(item):
+            paths, root = [item], None
+        else:
+            paths, root = sorted(glob.glob(item, recursive=True)), _glob_root(item)
+            if not paths:
+                logger.error(f"PDF file not found: {item}")
+                raise FileNotFoundError(f"PDF file not found: {item}")
+        for path in paths:
+            doc_id = document_id(path, root)
+            if doc_id in seen:
+                if os.path.abspath(seen[doc_id]) != os.path.abspath(path):
+                    raise ValueError(f"{path} and {seen[doc_id]} would both be document {doc_id!r}; pass their parent directory instead")
+                continue
+            seen[doc_id] = path
+            yield doc_id, path
+
+def _split_point(text, max_chunk_size):
+    """Where to cut an oversized block: the last sentence end, else the last space, in its second half."""
+    window = text[:max_chunk_size]
+    cut = max(window.rfind(mark) for mark in (". ", "? ", "! ", "\n"))
+    if cut < max_chunk_size // 2:
+        cut = window.rfind(" ")
+    return cut + 1 if cut >= max_chunk_size // 2 else max_chunk_size
+
+def _page_chunks(page, page_num, doc_id, max_chunk_size):
+    chunks = []
+    blocks = page.get_text("blocks")  # paragraph-level chunks
+    for block in blocks:
+        text = block[4].strip()
+        if not text:
+            continue
+        # Split large blocks into smaller chunks, never mid-word
+        while len(text) > max_chunk_size:
+            cut = _split_point(text, max_chunk_size)
+            chunks.append({"text": text[:cut].strip(), "page": page_num, "doc_id": doc_id})
+            text = text[cut:].strip()
+        if text:
+            chunks.append({"text": text, "page": page_num, "doc_id": doc_id})
+    return chunks
+
+def extract_pdf_paragraph_chunks_with_metadata(pdf_path, max_chunk_size=1000, doc_id=None):
     """Extract paragraph-level text chunks from a PDF with metadata."""
     if not os.path.exists(pdf_path):
         logger.error(f"PDF file not found: {pdf_path}")
@@ -23,65 +99,326 @@ def extract_pdf_paragraph_chunks_with_metadata(pdf_path, max_chunk_size=1000):
             logger.error("PDF is empty or invalid")
             raise ValueError("PDF is empty or invalid")
         
+        doc_id = doc_id or document_id(pdf_path)
         chunks = []
         for page_num, page in enumerate(doc, start=1):
-            blocks = page.get_text("blocks")  # paragraph-level chunks
-            for block in blocks:
-                text = block[4].strip()
-                if not text:
-                    continue
-                # Split large blocks into smaller chunks
-                while len(text) > max_chunk_size:
-                    chunks.append({"text": text[:max_chunk_size], "page": page_num})
-                    text = text[max_chunk_size:]
-                if text:
-                    chunks.append({"text": text, "page": page_num})
+            chunks.extend(_page_chunks(page, page_num, doc_id, max_chunk_size))
         logger.info(f"Extracted {len(chunks)} chunks from {pdf_path}")
         return chunks
     except Exception as e:
         logger.error(f"Error extracting PDF: {e}")
         raise
 
-def build_faiss_index(chunks, embed_model_name="all-MiniLM-L6-v2"):
-    """Build and return FAISS index with embedded chunks."""
+def _extract_page_range(pdf_path, doc_id, start, stop, max_chunk_size):
+    """Worker task: chunks for pages [start, stop) of one PDF (1-based page numbers)."""
+    with fitz.open(pdf_path) as doc:
+        chunks = []
+        for page_num in range(start, stop):
+            chunks.extend(_page_chunks(doc[page_num - 1], page_num, doc_id, max_chunk_size))
+    return chunks, stop - start
+
+def iter_pdf_chunks(documents, max_chunk_size=1000, workers=None, pages_per_task=8, stats=None):
+    """Yield chunks from (doc_id, path) pairs, extracting page ranges across a process pool.
+
+    At most 2 * workers page ranges are in flight, and chunks are yielded in
+    document/page order, so memory stays bounded regardless of corpus size.
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = stats if stats is not None else {}
+    stats.setdefault("documents", 0)
+    stats.setdefault("pages", 0)
+    stats.setdefault("chunks", 0)
+
+    def tasks():
+        for doc_id, pdf_path in documents:
+            with fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
+            if page_count == 0:
+                logger.error(f"PDF is empty or invalid: {pdf_path}")
+                raise ValueError(f"PDF is empty or invalid: {pdf_path}")
+            stats["documents"] += 1
+            for start in range(1, page_count + 1, pages_per_task):
+                yield pdf_path, doc_id, start, min(start + pages_per_task, page_count + 1)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        task_iter = tasks()
+        for task in itertools.islice(task_iter, 2 * workers):
+            pending.append(pool.submit(_extract_page_range, *task, max_chunk_size))
+        while pending:
+            chunks, page_count = pending.popleft().result()
+            next_task = next(task_iter, None)
+            if next_task is not None:
+                pending.append(pool.submit(_extract_page_range, *next_task, max_chunk_size))
+            stats["pages"] += page_count
+            stats["chunks"] += len(chunks)
+            yield from chunks
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+def embed_chunks(model, chunks, batch_size=64):
+    return model.encode(
+        [chunk["text"] for chunk in chunks],
+        batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True,
+    ).astype(np.float32)
+
+def build_faiss_index_streaming(chunk_iter, model, index_type="flat", metric="ip", batch_size=64, train_size=20000, on_chunk=None, **index_options):
+    """Embed chunks batch by batch and add them to a FAISS index as they arrive.
+
+    Each chunk gets a sequential "id" that is also its vector id. Returns (index, chunks);
+    when on_chunk is given, each chunk is passed to it instead and chunks is None, so
+    nothing but the index grows with the corpus. Embeddings are added and dropped per
+    batch; index types that need training buffer the first train_size vectors.
+    """
+    chunks = [] if on_chunk is None else None
+    next_id = 0
+    index = None
+    pending = []  # (embeddings, ids) held back until an untrained index has been trained
+
+    def add(embeddings, ids):
+        nonlocal index
+        if index is None:
+            index = with_id_map(create_faiss_index(embeddings.shape[1], len(embeddings), index_type, metric, **index_options))
+        if not index.is_trained:
+            logger.info(f"Training {index_type} index on {len(embeddings)} vectors...")
+            index.train(embeddings)
+        index.add_with_ids(embeddings, ids)
+
+    for batch in batched(chunk_iter, batch_size):
+        for chunk in batch:
+            chunk["id"] = next_id
+            next_id += 1
+            if on_chunk is None:
+                chunks.append(chunk)
+            else:
+                on_chunk(chunk)
+        embeddings = embed_chunks(model, batch, batch_size)
+        ids = np.array([chunk["id"] for chunk in batch], dtype=np.int64)
+        if index is not None or index_type in ("flat", "hnsw"):
+            add(embeddings, ids)
+            continue
+        pending.append((embeddings, ids))
+        if sum(len(ids) for _, ids in pending) >= train_size:
+            add(np.concatenate([e for e, _ in pending]), np.concatenate([i for _, i in pending]))
+            pending = []
+    if pending:
+        add(np.concatenate([e for e, _ in pending]), np.concatenate([i for _, i in pending]))
+    if index is None:
+        raise ValueError("No text chunks to index")
+    logger.info(f"FAISS index built successfully: {describe_index(index)}")
+    return index, chunks
+
+def build_faiss_index(chunks, embed_model_name="all-MiniLM-L6-v2", model=None, index_type="flat", metric="ip", **index_options):
+    """Build and return FAISS index with embedded chunks.
+
+    Embeddings are L2-normalized, so with metric="ip" scores are cosine similarities.
+    index_type is one of flat, ivf, hnsw or ivfpq; index_options are passed to create_faiss_index.
+    model is any encoder from load_embedder (PyTorch by default).
+    """
     try:
-        model = SentenceTransformer(embed_model_name)
-        texts = [chunk["text"] for chunk in chunks]
-        logger.info(f"Embedding {len(texts)} chunks...")
-        embeddings = model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-        
-        index = faiss.IndexFlatL2(embeddings.shape[1])
-        index.add(embeddings)
-        logger.info("FAISS index built successfully")
-        return index, chunks
+        model = model or load_embedder(embed_model_name)
+        logger.info(f"Embedding {len(chunks)} chunks...")
+        return build_faiss_index_streaming(
+            iter(chunks), model, index_type, metric, train_size=len(chunks), **index_options
+        )
     except Exception as e:
         logger.error(f"Error building FAISS index: {e}")
         raise
 
+def save_artifacts(args, index, meta, manifest):
+    """Write the index, BM25 index, manifest and metadata through temp files, metadata last.
+
+    The chunk store has already been moved into place by its writer. The API
+    reloads when the metadata version changes, so it never sees a partial update.
+    """
+    with atomic_path(args.output_index) as tmp_path:
+        faiss.write_index(index, tmp_path)
+    # Rebuilt from the final store on updates too; tokenizing is cheap next to embedding
+    bm25 = BM25Index.build(ChunkStore(args.output_chunks))
+    bm25.save(args.output_bm25)
+    logger.info(f"BM25 index: {len(bm25.vocab)} terms, {len(bm25.postings_rows)} postings")
+    save_manifest(args.output_manifest, manifest)
+    write_index_metadata(args.output_index, meta)
+
+def _reuse_page_ids(page_chunks, old_page, available):
+    """Reuse a page's vector ids wholesale when its content hash is unchanged."""
+    if not old_page or old_page["sha256"] != page_hash(page_chunks) or len(old_page["chunks"]) != len(page_chunks):
+        return False
+    if any(chunk_id not in available[chunk_hash] for chunk_hash, chunk_id in old_page["chunks"]):
+        return False
+    for chunk, (chunk_hash, chunk_id) in zip(page_chunks, old_page["chunks"]):
+        available[chunk_hash].remove(chunk_id)
+        chunk["id"] = chunk_id
+    return True
+
+def update_index(args, documents, model):
+    """Re-embed only new or changed chunks and delete vectors of removed ones.
+
+    documents maps doc_id to path for the complete corpus: documents in the
+    manifest but not in it are removed from the index.
+    """
+    manifest = load_manifest(args.output_manifest)
+    if manifest is None:
+        raise ValueError(f"No manifest at {args.output_manifest}; run a full build first")
+    meta = read_index_metadata(args.output_index)
+    if meta.get("model") != args.embed_model:
+        raise ValueError(f"Index was built with {meta.get('model')!r}; cannot update it with {args.embed_model!r}")
+    index = faiss.read_index(args.output_index)
+    old_store = ChunkStore(args.output_chunks)
+    old_ids_by_doc = defaultdict(list)
+    for chunk in old_store:
+        old_ids_by_doc[chunk["doc_id"]].append(chunk["id"])
+
+    doc_files = {}
+    changed_docs = []
+    for doc_id, path in documents.items():
+        doc_files[doc_id] = {"path": path, "sha256": sha256_file(path)}
+        old_doc = manifest["documents"].get(doc_id)
+        if old_doc is None or old_doc["sha256"] != doc_files[doc_id]["sha256"]:
+            changed_docs.append((doc_id, path))
+
+    removed_docs = set(manifest["documents"]) - set(doc_files)
+    if not changed_docs and not removed_docs:
+        logger.info(f"Index version {manifest['version']} is already up to date")
+        return
+    removed_ids = [chunk_id for doc_id in removed_docs for chunk_id in old_ids_by_doc[doc_id]]
+    next_id = manifest["next_id"]
+    new_by_doc = {}
+    to_embed = []
+    stats = {}
+    chunk_iter = iter_pdf_chunks(changed_docs, args.max_chunk_size, args.workers, args.pages_per_task, stats)
+    for doc_id, doc_chunks in itertools.groupby(chunk_iter, key=lambda chunk: chunk["doc_id"]):
+        old_pages = manifest["documents"].get(doc_id, {}).get("pages", {})
+        available = defaultdict(list)  # chunk hash -> old vector ids not yet reused
+        for page in old_pages.values():
+            for chunk_hash, chunk_id in page["chunks"]:
+                available[chunk_hash].append(chunk_id)
+        doc_chunks = list(doc_chunks)
+        for page, page_chunks in itertools.groupby(doc_chunks, key=lambda chunk: chunk["page"]):
+            page_chunks = list(page_chunks)
+            if _reuse_page_ids(page_chunks, old_pages.get(str(page)), available):
+                continue
+            for chunk in page_chunks:
+                candidates = available[sha256_text(chunk["text"])]
+                if candidates:
+                    chunk["id"] = candidates.pop(0)  # same text, maybe moved page: keep the vector
+                else:
+                    chunk["id"] = next_id
+                    next_id += 1
+                    to_embed.append(chunk)
+        removed_ids.extend(chunk_id for ids in available.values() for chunk_id in ids)
+        new_by_doc[doc_id] = doc_chunks
+    for doc_id, _ in changed_docs:
+        if doc_id not in new_by_doc:  # changed to a document with no extractable text
+            removed_ids.extend(old_ids_by_doc[doc_id])
+            new_by_doc[doc_id] = []
+
+    if removed_ids:
+        if not supports_removal(index):
+            raise ValueError("This index type cannot delete vectors; run a full rebuild instead")
+        index.remove_ids(np.array(sorted(removed_ids), dtype=np.int64))
+    for batch in batched(to_embed, args.batch_size):
+        ids = np.array([chunk["id"] for chunk in batch], dtype=np.int64)
+        index.add_with_ids(embed_chunks(model, batch, args.batch_size), ids)
+
+    version = manifest["version"] + 1
+    builder = ManifestBuilder(doc_files, version, next_id)
+    with ChunkStoreWriter(args.output_chunks) as writer:
+        for doc_id in documents:
+            # Unchanged documents are copied straight from the old store
+            if doc_id in new_by_doc:
+                doc_chunks = new_by_doc[doc_id]
+            else:
+                doc_chunks = (old_store[chunk_id] for chunk_id in old_ids_by_doc[doc_id])
+            for chunk in doc_chunks:
+                writer.add(chunk)
+                builder.add(chunk)
+    manifest = builder.build()
+    meta = {**meta, "version": version, "ntotal": index.ntotal}
+    save_artifacts(args, index, meta, manifest)
+    logger.info(
+        f"♻️ Updated index to version {version}: {len(changed_docs)} changed document(s), "
+        f"{len(removed_docs)} removed, {len(to_embed)} chunks embedded, "
+        f"{len(removed_ids)} vectors deleted, {index.ntotal} total"
+    )
+
 def main(): 
-    parser = argparse.ArgumentParser(description="Build FAISS index from a PDF textbook")
-    parser.add_argument("--pdf_path", default="../data/Python_Programming.pdf", help="Path to the PDF file")
+    parser = argparse.ArgumentParser(description="Build FAISS index from one or more PDF textbooks")
+    parser.add_argument("--pdf_path", default="../data/Python_Programming.pdf", help="Path to the PDF file (used when --inputs is not given)")
+    parser.add_argument("--inputs", nargs="+", default=None, help="PDF files, directories or glob patterns to ingest")
+    parser.add_argument("--update", action="store_true", help="Incrementally update the existing index from --inputs (the full corpus)")
     parser.add_argument("--output_index", default="../output/textbook_index.faiss", help="Output path for FAISS index")
-    parser.add_argument("--output_chunks", default="../output/text_chunks.pkl", help="Output path for text chunks")
+    parser.add_argument("--output_chunks", default="../output/text_chunks.bin", help="Output path for the memory-mapped chunk store")
+    parser.add_argument("--output_manifest", default="../output/manifest.json", help="Output path for the content-hash manifest")
+    parser.add_argument("--output_bm25", default="../output/bm25_index.npz", help="Output path for the BM25 lexical index")
+    parser.add_argument("--output_topics", default="../output/topic_centroids.npz", help="Output path for topic centroids")
     parser.add_argument("--max_chunk_size", type=int, default=1000, help="Maximum chunk size in characters")
     parser.add_argument("--embed_model", default="all-MiniLM-L6-v2", help="SentenceTransformer model name")
+    parser.add_argument("--embed_backend", default="torch", choices=EMBED_BACKENDS, help="Embedding runtime; onnx backends need export_onnx.py first")
+    parser.add_argument("--onnx_dir", default=None, help="Exported ONNX model directory (default: <index dir>/onnx/<model>)")
+    parser.add_argument("--index_type", default="flat", choices=INDEX_TYPES, help="FAISS index type")
+    parser.add_argument("--metric", default="ip", choices=tuple(METRICS), help="Search metric over normalized embeddings")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default ~4*sqrt(n))")
+    parser.add_argument("--pq_m", type=int, default=8, help="IVF-PQ sub-quantizers (must divide the dimension)")
+    parser.add_argument("--pq_bits", type=int, default=8, help="IVF-PQ bits per sub-quantizer code")
+    parser.add_argument("--hnsw_m", type=int, default=32, help="HNSW neighbours per node")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count)")
+    parser.add_argument("--pages_per_task", type=int, default=8, help="Pages extracted per worker task")
+    parser.add_argument("--batch_size", type=int, default=64, help="Chunks per embedding batch")
     args = parser.parse_args()
 
-    logger.info("📖 Extracting paragraphs...")
-    chunks = extract_pdf_paragraph_chunks_with_metadata(args.pdf_path, args.max_chunk_size)
+    documents = dict(iter_pdf_documents(args.inputs or [args.pdf_path]))
+    onnx_dir = args.onnx_dir or onnx_model_dir(os.path.dirname(args.output_index), args.embed_model)
+    model = load_embedder(args.embed_model, args.embed_backend, onnx_dir)
+    start = time.perf_counter()
+    if args.update:
+        logger.info(f"♻️ Checking {len(documents)} PDF(s) against {args.output_manifest}...")
+        update_index(args, documents, model)
+        logger.info(f"✅ Incremental update finished in {time.perf_counter() - start:.1f}s")
+        return
+
+    logger.info(f"📖 Extracting paragraphs from {len(documents)} PDF(s) and 📐 embedding & indexing...")
+    stats = {}
+    previous = load_manifest(args.output_manifest)
+    version = previous["version"] + 1 if previous else 1
+    doc_files = {doc_id: {"path": path, "sha256": sha256_file(path)} for doc_id, path in documents.items()}
+    builder = ManifestBuilder(doc_files, version)
+
+    def store_chunk(chunk):
+        writer.add(chunk)
+        builder.add(chunk)
 
-    logger.info("📐 Embedding & indexing...")
-    faiss_index, enriched_chunks = build_faiss_index(chunks, args.embed_model)
+    chunk_iter = iter_pdf_chunks(documents.items(), args.max_chunk_size, args.workers, args.pages_per_task, stats)
+    with ChunkStoreWriter(args.output_chunks) as writer:
+        faiss_index, _ = build_faiss_index_streaming(
+            chunk_iter, model, index_type=args.index_type, metric=args.metric, batch_size=args.batch_size,
+            on_chunk=store_chunk, nlist=args.nlist, pq_m=args.pq_m, pq_bits=args.pq_bits, hnsw_m=args.hnsw_m,
+        )
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"⏱️ Ingested {stats['documents']} document(s), {stats['pages']} pages, {stats['chunks']} chunks in {elapsed:.1f}s "
+        f"({stats['pages'] / elapsed:.1f} pages/s, {stats['chunks'] / elapsed:.1f} chunks/s)"
+    )
+    topic_names, topic_centroids = build_topic_centroids(model)
 
     logger.info("💾 Saving index and chunks...")
     try:
-        faiss.write_index(faiss_index, args.output_index)
-        with open(args.output_chunks, "wb") as f:
-            pickle.dump(enriched_chunks, f)
-        logger.info(f"✅ Index saved to {args.output_index} and chunks to {args.output_chunks}")
+        save_artifacts(
+            args, faiss_index,
+            {
+                **build_index_metadata(faiss_index, args.embed_model, args.metric, True, args.index_type, version),
+                "embed_backend": args.embed_backend,
+            },
+            builder.build(),
+        )
+        save_topic_centroids(args.output_topics, topic_names, topic_centroids)
+        logger.info(f"✅ Index saved to {args.output_index}, chunks to {args.output_chunks} and topics to {args.output_topics}")
     except Exception as e:
         logger.error(f"Error saving index/chunks: {e}")
         raise
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,243 @@
+import os
+import pickle
+import logging
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Absolute path to output folder
+#OUTPUT_DIR = r"E:\Personal Project\AI Projects\AI-Tutor-APP-ME-and-Tony\AJ-AI-TUTOR\AJ-AI-Tutor\Server\app\output"
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "/code/app/output")
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+# torch (SentenceTransformer), or onnx / onnx-int8 exported by app/scripts/export_onnx.py
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
+# Memory-map the index so forked workers share one copy through the page cache
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") == "1"
+# Legacy text_chunks.pkl files are only unpickled when explicitly allowed
+ALLOW_PICKLE_CHUNKS = os.getenv("ALLOW_PICKLE_CHUNKS", "0") == "1"
+
+
+def load_embed_model(model_name=EMBED_MODEL_NAME, backend=EMBED_BACKEND):
+    from app.AI.embeddings import load_embedder, onnx_model_dir
+    return load_embedder(model_name, backend, onnx_model_dir(OUTPUT_DIR, model_name))
+
+
+def load_faiss_index(path, mmap=FAISS_MMAP):
+    import faiss
+    if mmap:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            # Not every index type supports mmap; fall back to a private copy
+            logger.warning(f"Could not memory-map {path}, loading into memory: {e}")
+    return faiss.read_index(path)
+
+
+def load_index_metadata(index_path):
+    from app.AI.ann import read_index_metadata
+    return read_index_metadata(index_path)
+
+
+def load_text_chunks(path):
+    """Return a mapping of vector id -> chunk dict.
+
+    The columnar chunk store is memory-mapped and decodes chunks on access. A legacy
+    pickle (positional ids) is loaded fully, and only when ALLOW_PICKLE_CHUNKS=1.
+    """
+    from app.AI.chunk_store import ChunkStore
+    if path.endswith(".bin"):
+        return ChunkStore(path)
+    if not ALLOW_PICKLE_CHUNKS:
+        raise ValueError(
+            f"Refusing to unpickle {path}; convert it once with "
+            f"`python -m app.AI.chunk_store {path} {os.path.splitext(path)[0]}.bin` or set ALLOW_PICKLE_CHUNKS=1"
+        )
+    logger.warning(f"Loading legacy pickled chunks from {path}")
+    with open(path, "rb") as f:
+        chunks = pickle.load(f)
+    # Ids are positional, and set on the chunks too: retrieval and provenance read chunk["id"]
+    chunks = ({**chunk, "id": chunk.get("id", i)} for i, chunk in enumerate(chunks))
+    return {chunk["id"]: chunk for chunk in chunks}
+
+
+def load_bm25_index(path):
+    from app.AI.bm25 import BM25Index
+    if not os.path.exists(path):
+        logger.warning(f"{path} not found; retrieval is vector-only. Rebuild with rag.py to enable hybrid search.")
+        return None
+    return BM25Index.load(path)
+
+
+class IndexSnapshot:
+    """A FAISS index with the metadata and chunks it was built with, swapped in as one unit."""
+
+    def __init__(self, index, meta, text_chunks, bm25=None):
+        self.index = index
+        self.meta = meta
+        self.text_chunks = text_chunks
+        self.bm25 = bm25  # lexical index for hybrid retrieval; None when it was not built
+
+    @property
+    def version(self):
+        return self.meta.get("version", 0)
+
+
+def load_topic_classifier(path, embed_model_loader):
+    from app.AI.topics import TopicClassifier, build_topic_centroids, load_topic_centroids
+    if os.path.exists(path):
+        names, centroids = load_topic_centroids(path)
+    else:
+        # Older artifacts predate topic centroids; compute them once for this process
+        logger.warning(f"{path} not found, computing topic centroids at startup")
+        names, centroids = build_topic_centroids(embed_model_loader())
+    return TopicClassifier(names, centroids)
+
+
+def load_llm_client(provider=LLM_PROVIDER):
+    from app.AI.context import TUTOR_SYSTEM_INSTRUCTION
+    if provider == "fake":
+        from app.AI.fake_llm import FakeGenerativeModel
+        logger.warning("Using fake LLM provider")
+        return FakeGenerativeModel(system_instruction=TUTOR_SYSTEM_INSTRUCTION)
+
+    from google import generativeai as genai
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        logger.error("Gemini API key not set in .env file")
+        raise ValueError("Gemini API key not set in .env file")
+    try:
+        genai.configure(api_key=api_key)
+        # The SDK sends the system instruction with every generate_content call (billed each time)
+        return genai.GenerativeModel(GEMINI_MODEL, system_instruction=TUTOR_SYSTEM_INSTRUCTION)
+    except Exception as e:
+        logger.error(f"Failed to initialize Gemini client: {e}")
+        raise
+
+
+class RAGResources:
+    """Loads the embedding model, FAISS index (validated against its metadata), text chunks and LLM client on first use.
+
+    Each resource is loaded at most once per process and is read-only afterwards,
+    so it can be shared by every request handler and executor thread.
+    """
+
+    def __init__(self, output_dir=OUTPUT_DIR):
+        self.output_dir = output_dir
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._loaded = {}
+        self._loaders = {
+            "embed_model": lambda: load_embed_model(),
+            "snapshot": lambda: self._load_snapshot(),
+            "topic_classifier": lambda: load_topic_classifier(
+                os.path.join(self.output_dir, "topic_centroids.npz"), lambda: self.embed_model
+            ),
+            "client": lambda: load_llm_client(),
+        }
+
+    @property
+    def index_path(self):
+        return os.path.join(self.output_dir, "textbook_index.faiss")
+
+    @property
+    def bm25_path(self):
+        return os.path.join(self.output_dir, "bm25_index.npz")
+
+    @property
+    def chunks_path(self):
+        path = os.path.join(self.output_dir, "text_chunks.bin")
+        legacy_path = os.path.join(self.output_dir, "text_chunks.pkl")
+        return legacy_path if not os.path.exists(path) and os.path.exists(legacy_path) else path
+
+    def _load_snapshot(self):
+        from app.AI.ann import validate_index_metadata
+        meta = load_index_metadata(self.index_path)
+        index = load_faiss_index(self.index_path)
+        model_dim = self.embed_model.get_sentence_embedding_dimension()
+        validate_index_metadata(meta, index, EMBED_MODEL_NAME, model_dim)
+        text_chunks = load_text_chunks(self.chunks_path)
+        return IndexSnapshot(index, meta, text_chunks, load_bm25_index(self.bm25_path))
+
+    def reload_index(self, force=False):
+        """Load a newer index from disk and swap it in atomically; returns True if swapped.
+
+        Requests already holding the previous snapshot finish against it.
+        """
+        with self._reload_lock:
+            current = self._loaded.get("snapshot")
+            if current is not None and not force:
+                on_disk = load_index_metadata(self.index_path).get("version", 0)
+                if on_disk == current.version:
+                    return False
+            start = time.perf_counter()
+            snapshot = self._load_snapshot()
+            self._loaded["snapshot"] = snapshot
+            logger.info(f"Swapped in index version {snapshot.version} in {time.perf_counter() - start:.2f}s")
+            return True
+
+    def _get(self, name):
+        value = self._loaded.get(name)
+        if value is None:
+            with self._lock:
+                value = self._loaded.get(name)
+                if value is None:
+                    start = time.perf_counter()
+                    try:
+                        value = self._loaders[name]()
+                    except Exception as e:
+                        logger.error(f"Error loading {name}: {e}")
+                        raise
+                    self._loaded[name] = value
+                    logger.info(f"Loaded {name} in {time.perf_counter() - start:.2f}s")
+        return value
+
+    @property
+    def embed_model(self):
+        return self._get("embed_model")
+
+    @property
+    def snapshot(self):
+        """Take one reference per request so index, metadata and chunks always match."""
+        return self._get("snapshot")
+
+    @property
+    def index(self):
+        return self.snapshot.index
+
+    @property
+    def index_meta(self):
+        return self.snapshot.meta
+
+    @property
+    def text_chunks(self):
+        return self.snapshot.text_chunks
+
+    @property
+    def topic_classifier(self):
+        return self._get("topic_classifier")
+
+    @property
+    def client(self):
+        return self._get("client")
+
+    def load(self):
+        """Eagerly load everything, e.g. from the FastAPI lifespan hook."""
+        for name in self._loaders:
+            self._get(name)
+
+    @property
+    def ready(self):
+        return all(name in self._loaded for name in self._loaders)
+
+    def status(self):
+        return {name: name in self._loaded for name in self._loaders}
+
+
+resources = RAGResources()
@@ -0,0 +1,102 @@
+import asyncio
+
+
+class FlightCancelled(Exception):
+    """The shared producer was cancelled before it finished; its followers get no answer."""
+
+
+class Flight:
+    """One in-flight generation that any number of requests can follow.
+
+    The producer publishes chunks as they arrive; followers replay them from the
+    first, so a request that joins late still sees the whole answer.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.followers = 0
+        self._updated = asyncio.Event()
+
+    def publish(self, chunk):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def _notify(self):
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def stream(self):
+        """Every chunk from the first; raises the producer's error once the chunks run out."""
+        sent = 0
+        while True:
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._updated.wait()
+
+    async def wait(self):
+        """The producer's return value once it finishes, or its error."""
+        while not self.done:
+            await self._updated.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    @property
+    def text(self):
+        return "".join(self.chunks).strip()
+
+
+class SingleFlight:
+    """Concurrent requests with the same key share one producer run.
+
+    The producer runs as its own task, so a client that disconnects does not
+    cancel the answer for everyone following it. Keys are forgotten as soon as
+    the run finishes; later requests start a new one.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.started = 0
+        self.joined = 0
+
+    def join(self, key, producer):
+        """(flight, started): the flight for key, starting `await producer(flight)` if none is in flight."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.followers += 1
+            self.joined += 1
+            return flight, False
+        flight = Flight()
+        self._flights[key] = flight
+        self.started += 1
+        flight.task = asyncio.create_task(self._run(key, flight, producer))
+        return flight, True
+
+    async def _run(self, key, flight, producer):
+        try:
+            flight.result = await producer(flight)
+        except Exception as e:
+            flight.error = e
+        except asyncio.CancelledError:
+            # e.g. shutdown: followers must not take the partial (or empty) answer as complete
+            flight.error = FlightCancelled("The shared generation was cancelled")
+            raise
+        finally:
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight._notify()
+
+    def __len__(self):
+        return len(self._flights)
+
+    def stats(self):
+        return {"in_flight": len(self._flights), "started": self.started, "joined": self.joined}
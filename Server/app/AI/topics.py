@@ -0,0 +1,66 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Syllabus areas and the terms that describe them; one centroid is built per area
+PYTHON_TOPICS = {
+    "basics": ['python', 'syntax', 'variable', 'input', 'print', 'import', 'module', 'password'],
+    "data_types": ['int', 'float', 'bool', 'string', 'numbers', 'numeric', 'types', 'type', 'conversion'],
+    "operators": ['arithmetic', 'math', 'operators', 'expression', 'comparison'],
+    "control_flow": ['if', 'elif', 'else', 'while', 'for', 'loop', 'break', 'continue'],
+    "data_structures": ['list', 'dict', 'tuple', 'set', 'indexing', 'slicing', 'concatenation'],
+    "functions": ['function', 'def', 'lambda', 'argument', 'return'],
+    "oop": ['class', 'object', 'inheritance', 'method', 'attribute', 'constructor'],
+    "errors": ['error', 'exception', 'try', 'except', 'raise'],
+    "files": ['file', 'open', 'read', 'write'],
+}
+
+PYTHON_KEYWORDS = [keyword for keywords in PYTHON_TOPICS.values() for keyword in keywords]
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def build_topic_centroids(embed_model, topics=PYTHON_TOPICS):
+    """Encode each syllabus area's terms once and return (names, unit-length centroids)."""
+    names = list(topics)
+    centroids = [
+        np.mean(_normalize(embed_model.encode(topics[name], convert_to_numpy=True)), axis=0)
+        for name in names
+    ]
+    return names, _normalize(np.stack(centroids))
+
+
+def save_topic_centroids(path, names, centroids):
+    np.savez(path, names=np.array(names), centroids=centroids)
+
+
+def load_topic_centroids(path):
+    with np.load(path) as data:
+        return [str(name) for name in data["names"]], data["centroids"].astype(np.float32)
+
+
+class TopicClassifier:
+    """Matches a query embedding against precomputed syllabus centroids."""
+
+    def __init__(self, names, centroids, keywords=PYTHON_KEYWORDS):
+        self.names = names
+        self.centroids = _normalize(centroids)
+        self.keywords = keywords
+
+    def classify(self, q_emb):
+        """Return (best topic, cosine similarity) for a single query embedding."""
+        scores = self.centroids @ _normalize(q_emb).reshape(-1)
+        best = int(np.argmax(scores))
+        return self.names[best], float(scores[best])
+
+    def is_python_question(self, query, q_emb, threshold):
+        query_lower = query.lower()
+        if any(keyword in query_lower for keyword in self.keywords):
+            return True
+        _, score = self.classify(q_emb)
+        return score > threshold
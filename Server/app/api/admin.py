@@ -0,0 +1,54 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from app.AI.llm import rag_executor, reload_index
+from app.AI.resources import resources
+from app.core.security import require_admin
+from app.db.database import database
+from app.db.export import export_query, gzip_jsonl_chunks, iter_chat_batches
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+# Concurrent exports per worker; each holds one pooled connection for its whole cursor
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "1"))
+export_slots = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+
+@router.post("/reload-index")
+async def reload_index_now():
+    """Swap this worker to the index currently on disk (other workers pick it up on their next check)."""
+    try:
+        await asyncio.get_running_loop().run_in_executor(rag_executor, reload_index, True)
+    except Exception as e:
+        logger.error(f"Index reload failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Index reload failed: {str(e)}")
+    return {"version": resources.snapshot.version}
+
+@router.get("/export/chats")
+async def export_chats(
+    after_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    include_answers: bool = True,
+):
+    """Stream every chat (or those after `after_id` / in [since, until)) as gzip-compressed JSON Lines."""
+    if export_slots.locked():
+        raise HTTPException(status_code=429, detail="An export is already running, try again later", headers={"Retry-After": "60"})
+    query = export_query(after_id, since, until, include_answers)
+
+    async def body():
+        # Held only while the body is sent, so a response that is never sent can't keep it.
+        # Exports that passed the check above together wait here for their turn.
+        async with export_slots:
+            async for chunk in gzip_jsonl_chunks(iter_chat_batches(database, query)):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip",
+        headers={"Content-Disposition": 'attachment; filename="chats.jsonl.gz"'},
+    )
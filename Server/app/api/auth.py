@@ -1,10 +1,10 @@
 import logging
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy import select
+from fastapi import APIRouter, HTTPException, Depends, Request
+from app.db import queries
 from app.db.database import database
-from app.db.models import User
 from app.schemas.user import UserCreate, UserOut, UserLogin
-from passlib.context import CryptContext
+from app.core.security import enforce_limit, login_failure_limiter, login_ip_limiter, password_hasher, register_ip_limiter
+from app.core.metrics import stage
 from sqlalchemy.exc import SQLAlchemyError
 
 # Configure logging
@@ -16,7 +16,8 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
 
 async def get_db():
     try:
@@ -27,53 +28,74 @@ async def get_db():
     finally:
         pass  # No close() needed here
 
+def login_failed(email, ip):
+    login_failure_limiter.hit((email, ip))
+    login_ip_limiter.hit(ip)
+
 @router.post("/register", response_model=UserOut)
-async def register(user: UserCreate, db: database = Depends(get_db)): # type: ignore
+async def register(user: UserCreate, request: Request, db: database = Depends(get_db)): # type: ignore
     logger.info(f"Processing registration for email: {user.email}")
+    # Registrations hash a password, so they have a per-IP budget of their own
+    ip = client_ip(request)
+    enforce_limit(register_ip_limiter, ip)
+    register_ip_limiter.hit(ip)
     # Lowercase email for uniqueness
     email = user.email.lower()
 
     # Check if email already exists
-    query = select(User).where(User.email == email)
-    existing_user = await db.fetch_one(query)
+    existing_user = await db.fetch_one(queries.USER_BY_EMAIL, {"email": email})
     if existing_user:
         logger.warning(f"Registration attempt with existing email: {email}")
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    # Hash the password before saving
-    hashed_password = pwd_context.hash(user.password)
+    # Hash the password before saving, off the event loop
+    with stage("password_hash"):
+        hashed_password = await password_hasher.hash(user.password)
     logger.debug(f"Hashed password for {email}")
 
     # Use a transaction context
     async with db.transaction():
         logger.info(f"Starting transaction for user: {email}")
         # Insert new user with hashed password
-        query = User.__table__.insert().values(
-            name=user.name,
-            email=email,
-            password=hashed_password
-        )
-        user_id = await db.execute(query)
+        user_id = await db.fetch_val(queries.INSERT_USER, {
+            "name": user.name,
+            "email": email,
+            "password": hashed_password,
+        })
         logger.info(f"Successfully inserted user with ID: {user_id}")
     logger.info(f"Registration completed for user: {email}")
     return {"id": user_id, "name": user.name, "email": email}
 
 @router.post("/login")
-async def login(payload:UserLogin, db: database = Depends(get_db)): # type: ignore
+async def login(payload:UserLogin, request: Request, db: database = Depends(get_db)): # type: ignore
     email = payload.email.lower()
     password = payload.password
     logger.info(f"Login attempt for email: {email}")
-    query = select(User).where(User.email == email)
-    user = await db.fetch_one(query)
+    # Throttled clients are turned away before any database or bcrypt work
+    ip = client_ip(request)
+    enforce_limit(login_ip_limiter, ip)
+    enforce_limit(login_failure_limiter, (email, ip))
+    with stage("user_lookup"):
+        user = await db.fetch_one(queries.USER_BY_EMAIL, {"email": email})
 
     if not user:
+        login_failed(email, ip)
         logger.warning(f"Failed login attempt for non-existent email: {email}")
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
     # user.password here is hashed, verify it
-    if not pwd_context.verify(password, user.password):
+    with stage("password_verify"):
+        valid, new_hash = await password_hasher.verify_and_update(password, user.password)
+    if not valid:
+        login_failed(email, ip)
         logger.warning(f"Failed login attempt for email: {email} due to incorrect password")
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    login_failure_limiter.reset((email, ip))
+
+    if new_hash:
+        # Stored hash used outdated bcrypt parameters; replace it while we have the plaintext
+        await db.execute(queries.UPDATE_PASSWORD, {"user_id": user.id, "new_password": new_hash})
+        logger.info(f"Rehashed password for user: {user.name}")
 
     logger.info(f"Successful login for user: {user.name}")
     return {"id": user.id, "name": user.name}
\ No newline at end of file
@@ -1,70 +1,145 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy import insert, select, func
+import base64
+import json
+import logging
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from app.schemas.tutor import TutorRequest, TutorResponse, ChatHistory, ChatSessionInfo
-from app.AI.llm import get_tutor_reply_with_rag
+from app.AI.llm import get_tutor_reply_with_rag_async, regenerate_reply_async, stream_tutor_reply_with_rag, answer_cache
+from app.AI.memory import SessionMemory, conversation_memory
+from app.AI.gateway import LLMUnavailableError
+from app.core.metrics import stage
+from app.db import queries
 from app.db.database import database
-from app.db.models import Chat, User
 from typing import List
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Keyset page sizes for /history and /sessions
+HISTORY_PAGE_SIZE = 50
+SESSIONS_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Turns are saved with one data-modifying CTE on Postgres; other databases get a stepwise fallback
+WRITABLE_CTES = database.url.get_backend_name() == "postgresql"
+
 async def validate_user(user_id: int):
     """Validate if user exists."""
-    query = select(User).where(User.id == user_id)
-    user = await database.fetch_one(query)
+    user = await database.fetch_one(queries.USER_BY_ID, {"user_id": user_id})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 async def get_next_session_id(user_id: int) -> int:
-    """Generate a new chat_session_id for the user."""
-    query = select(func.max(Chat.chat_session_id)).where(Chat.user_id == user_id)
-    max_session_id = await database.fetch_val(query)
-    return (max_session_id or 0) + 1
+    """The chat_session_id the user's next new session will get."""
+    count = await database.fetch_val(queries.USER_SESSION_COUNT, {"user_id": user_id})
+    if count is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return count + 1
+
+async def load_session_memory(user_id: int, chat_session_id: int):
+    """Summary and recent turns of a session, from its latest chats (or the in-process cache with MEMORY_CACHE=1).
+
+    Returns None if the session has no chats, i.e. does not exist for this user.
+    """
+    key = (user_id, chat_session_id)
+    memory = conversation_memory.get(key)
+    if memory is None:
+        rows = await database.fetch_all(queries.RECENT_CHATS, {
+            "user_id": user_id, "chat_session_id": chat_session_id, "limit": conversation_memory.load_limit,
+        })
+        if not rows:
+            return None
+        memory = conversation_memory.from_rows(key, [(row.query, row.answer) for row in reversed(rows)])
+    return memory
+
+async def resolve_chat_session(request: TutorRequest):
+    """Validate the request's session before answering; returns (chat_session_id, memory).
+
+    chat_session_id is None for a new session, which is allocated when the chat is saved.
+    Loading an existing session's memory doubles as the ownership check.
+    """
+    # Reject chat_session_id: 0 explicitly
+    if request.chat_session_id == 0:
+        raise HTTPException(status_code=400, detail="chat_session_id cannot be 0. Omit it to start a new session or use a valid session ID.")
+
+    if request.chat_session_id is None:
+        await validate_user(request.user_id)
+        return None, None
+
+    memory = await load_session_memory(request.user_id, request.chat_session_id)
+    if memory is not None:
+        return request.chat_session_id, memory
+    # Clients may also start a session by naming the next id
+    if request.chat_session_id != await get_next_session_id(request.user_id):
+        raise HTTPException(status_code=400, detail=f"Invalid chat_session_id {request.chat_session_id} for user {request.user_id}")
+    return None, None
+
+async def insert_chat_stepwise(chat_session_id: int | None, user_id: int, query: str, answer: str, retrieval: dict | None):
+    """The same writes as the single-statement inserts, one per statement in a transaction.
+
+    For databases without data-modifying CTEs, i.e. the SQLite stand-in used by bench_suite.py.
+    """
+    async with database.transaction():
+        if chat_session_id is None:
+            chat_session_id = await database.fetch_val(queries.ALLOCATE_SESSION_ID, {"user_id": user_id})
+            if chat_session_id is None:
+                return None
+            await database.execute(queries.INSERT_SESSION, {
+                "user_id": user_id, "chat_session_id": chat_session_id, "first_query": query, "turn_count": 1,
+            })
+        else:
+            touched = await database.fetch_val(queries.TOUCH_SESSION, {"b_user_id": user_id, "b_chat_session_id": chat_session_id})
+            if touched is None:
+                return None
+        return await database.fetch_one(queries.INSERT_CHAT, {
+            "chat_session_id": chat_session_id, "user_id": user_id, "query": query, "answer": answer, "retrieval": retrieval,
+        })
+
+async def save_chat(chat_session_id: int | None, user_id: int, query: str, answer: str, retrieval: dict | None = None) -> TutorResponse:
+    """Save a turn and its retrieval provenance in a single round trip, allocating a new session when chat_session_id is None."""
+    with stage("db_save"):
+        if not WRITABLE_CTES:
+            new_chat = await insert_chat_stepwise(chat_session_id, user_id, query, answer, retrieval)
+        elif chat_session_id is None:
+            new_chat = await database.fetch_one(queries.INSERT_CHAT_IN_NEW_SESSION, {
+                "b_user_id": user_id, "b_query": query, "b_answer": answer, "b_retrieval": retrieval,
+            })
+        else:
+            new_chat = await database.fetch_one(queries.INSERT_CHAT_IN_SESSION, {
+                "b_user_id": user_id, "b_chat_session_id": chat_session_id, "b_query": query, "b_answer": answer,
+                "b_retrieval": retrieval,
+            })
+    if not new_chat:
+        if chat_session_id is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        raise HTTPException(status_code=400, detail=f"Invalid chat_session_id {chat_session_id} for user {user_id}")
+    key = (user_id, new_chat.chat_session_id)
+    if chat_session_id is None:
+        conversation_memory.from_rows(key, [(query, answer)])
+    else:
+        conversation_memory.record_turn(key, query, answer)
+    return TutorResponse.model_validate(new_chat)
 
 @router.post("/ask", response_model=TutorResponse)
 async def ask_tutor(request: TutorRequest):
-    await validate_user(request.user_id)
     try:
-        # Reject chat_session_id: 0 explicitly
-        if request.chat_session_id == 0:
-            raise HTTPException(status_code=400, detail="chat_session_id cannot be 0. Omit it to start a new session or use a valid session ID.")
+        with stage("validate"):
+            chat_session_id, memory = await resolve_chat_session(request)
 
-        # Validate or generate chat_session_id
-        if request.chat_session_id is None:
-            request.chat_session_id = await get_next_session_id(request.user_id)
-        else:
-            # Verify chat_session_id belongs to user
-            query = select(Chat).where(
-                Chat.chat_session_id == request.chat_session_id,
-                Chat.user_id == request.user_id
-            )
-            existing_chat = await database.fetch_one(query)
-            if not existing_chat and request.chat_session_id != await get_next_session_id(request.user_id):
-                raise HTTPException(status_code=400, detail=f"Invalid chat_session_id {request.chat_session_id} for user {request.user_id}")
-
-        # Get AI answer (remove await if synchronous)
-        answer = get_tutor_reply_with_rag(request.query)  # Changed from await
-
-        # Insert into DB
-        query_stmt = (
-            insert(Chat)
-            .values(
-                chat_session_id=request.chat_session_id,
-                user_id=request.user_id,
-                query=request.query,
-                answer=answer,
-            )
-            .returning(Chat.id, Chat.chat_session_id, Chat.user_id, Chat.query, Chat.answer, Chat.created_at)
-        )
-
-        new_chat = await database.fetch_one(query_stmt)
-        if not new_chat:
-            raise HTTPException(status_code=500, detail="Failed to save chat")
+        # Get AI answer without blocking the event loop
+        answer, retrieval = await get_tutor_reply_with_rag_async(request.query, memory)
 
-        return TutorResponse.model_validate(new_chat)
+        return await save_chat(chat_session_id, request.user_id, request.query, answer, retrieval)
 
+    except LLMUnavailableError as e:
+        # Nothing is saved, so the client can simply retry the same question
+        raise HTTPException(
+            status_code=503, detail="The tutor is temporarily unavailable, please try again shortly",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=f"Bad request: {str(ve)}")
     except HTTPException as he:
@@ -72,53 +147,181 @@ async def ask_tutor(request: TutorRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@router.get("/history/{user_id}/{chat_session_id}", response_model=ChatHistory)
-async def get_chat_history(user_id: int, chat_session_id: int, _=Depends(validate_user)):
+def sse_event(data: str, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {data}\n\n"
+
+@router.post("/ask/stream")
+async def ask_tutor_stream(request: TutorRequest):
+    """Same as /ask, but streams the answer as Server-Sent Events.
+
+    Emits one `data: {"token": ...}` event per chunk, then a final `done` event
+    carrying the saved TutorResponse, or an `error` event if the answer could not
+    be completed or saved. Incomplete answers are not saved.
+    """
+    with stage("validate"):
+        chat_session_id, memory = await resolve_chat_session(request)
+
+    async def event_stream():
+        parts = []
+        retrieval = {}
+        try:
+            async for token in stream_tutor_reply_with_rag(request.query, memory, retrieval):
+                parts.append(token)
+                yield sse_event(json.dumps({"token": token}))
+        except LLMUnavailableError as e:
+            yield sse_event(json.dumps({"detail": "The tutor is temporarily unavailable", "retry_after": e.retry_after}), event="error")
+            return
+        except Exception as e:
+            logger.error(f"Failed to stream answer: {e}")
+            yield sse_event(json.dumps({"detail": "Failed to generate an answer"}), event="error")
+            return
+
+        answer = "".join(parts).strip()
+        try:
+            saved = await save_chat(chat_session_id, request.user_id, request.query, answer, retrieval or None)
+            yield sse_event(saved.model_dump_json(), event="done")
+        except Exception as e:
+            logger.error(f"Failed to save streamed chat: {e}")
+            yield sse_event(json.dumps({"detail": "Failed to save chat"}), event="error")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def memory_before(chat) -> SessionMemory:
+    """The session's conversation as it was when `chat` was asked."""
+    rows = await database.fetch_all(queries.CHATS_BEFORE, {
+        "user_id": chat.user_id, "chat_session_id": chat.chat_session_id,
+        "before_created_at": chat.created_at, "before_id": chat.id, "limit": conversation_memory.load_limit,
+    })
+    memory = SessionMemory(conversation_memory.recent_turns)
+    for row in reversed(rows):
+        memory.add_turn(row.query, row.answer)
+    return memory
+
+@router.post("/regenerate/{user_id}/{chat_id}", response_model=TutorResponse)
+async def regenerate_answer(user_id: int, chat_id: int):
+    """Answer a saved chat's question again, replacing its answer.
+
+    The context is rebuilt from the chat's stored retrieval provenance, so nothing
+    is re-embedded or re-searched, and the conversation is the one it was asked in.
+    """
     try:
-        query = (
-            select(Chat)
-            .where(Chat.user_id == user_id, Chat.chat_session_id == chat_session_id)
-            .order_by(Chat.created_at)
+        chat = await database.fetch_one(queries.CHAT_BY_ID, {"chat_id": chat_id, "user_id": user_id})
+        if not chat:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        memory = await memory_before(chat)
+        answer, retrieval = await regenerate_reply_async(chat.query, chat.retrieval, memory if memory.turns else None)
+        with stage("db_save"):
+            updated = await database.fetch_one(queries.UPDATE_ANSWER, {
+                "b_chat_id": chat_id, "b_user_id": user_id, "b_answer": answer, "b_retrieval": retrieval,
+            })
+        if not updated:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        # Cached memory may hold the old answer
+        conversation_memory.discard((user_id, chat.chat_session_id))
+        return TutorResponse.model_validate(updated)
+
+    except LLMUnavailableError as e:
+        raise HTTPException(
+            status_code=503, detail="The tutor is temporarily unavailable, please try again shortly",
+            headers={"Retry-After": str(e.retry_after)},
         )
-        chats = await database.fetch_all(query)
-        if not chats:
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor: the sort key of the last row returned."""
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/history/{user_id}/{chat_session_id}", response_model=ChatHistory)
+async def get_chat_history(
+    user_id: int,
+    chat_session_id: int,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    _=Depends(validate_user),
+):
+    """The latest `limit` chats of a session, oldest first.
+
+    next_cursor fetches the page of chats before these; each page is one index range scan.
+    """
+    try:
+        values = {"user_id": user_id, "chat_session_id": chat_session_id, "limit": limit + 1}
+        query = queries.HISTORY_PAGE
+        if cursor:
+            created_at, chat_id = decode_cursor(cursor)
+            query = queries.HISTORY_PAGE_BEFORE
+            values.update(before_created_at=datetime.fromisoformat(created_at), before_id=chat_id)
+        chats = await database.fetch_all(query, values)
+        if not chats and not cursor:
             raise HTTPException(status_code=404, detail="Chat session not found")
 
+        page = chats[:limit]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(chats) > limit else None
         return ChatHistory(
             chat_session_id=chat_session_id,
-            chats=[TutorResponse.model_validate(chat) for chat in chats]
+            chats=[TutorResponse.model_validate(chat) for chat in reversed(page)],
+            next_cursor=next_cursor,
         )
 
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.get("/sessions/{user_id}", response_model=List[ChatSessionInfo])
-async def get_user_sessions(user_id: int, _=Depends(validate_user)):
+async def get_user_sessions(
+    user_id: int,
+    response: Response,
+    limit: int = Query(SESSIONS_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    _=Depends(validate_user),
+):
+    """The user's sessions, newest first, read from their summary rows.
+
+    When more sessions exist, the X-Next-Cursor header holds the cursor for the next page.
+    """
     try:
-        # Fixed select statement syntax
-        query = (
-            select(
-                Chat.chat_session_id,
-                func.min(Chat.created_at).label('created_at'),
-                func.min(Chat.query).label('query')
-                
+        values = {"user_id": user_id, "limit": limit + 1}
+        query = queries.SESSIONS_PAGE
+        if cursor:
+            (last_session_id,) = decode_cursor(cursor)
+            query = queries.SESSIONS_PAGE_BEFORE
+            values["before_session_id"] = last_session_id
 
-            )
-            .where(Chat.user_id == user_id)
-            .group_by(Chat.chat_session_id)
-            .order_by(Chat.chat_session_id.desc())
-        )
-        
-        sessions = await database.fetch_all(query)
+        sessions = await database.fetch_all(query, values)
+        page = sessions[:limit]
+        if len(sessions) > limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(page[-1].chat_session_id)
         return [
             ChatSessionInfo(
                 chat_session_id=session.chat_session_id,
                 created_at=session.created_at,
-                chat_query=session.query
-
-            ) 
-            for session in sessions
+                chat_query=session.first_query,
+                last_activity_at=session.last_activity_at,
+                turn_count=session.turn_count,
+            )
+            for session in page
         ]
 
+    except HTTPException as he:
+        raise he
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the semantic answer cache."""
+    return answer_cache.stats()
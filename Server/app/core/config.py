@@ -5,7 +5,8 @@ load_dotenv()
 
 class Settings(BaseSettings):
     DATABASE_URL: str 
-    GEMINI_API_KEY: str
+    GEMINI_API_KEY: str | None = None  # only needed once the Gemini client is first used
+    ADMIN_TOKEN: str | None = None  # bearer token for /admin; the endpoints are disabled without one
 
     class Config:
         env_file = ".env"
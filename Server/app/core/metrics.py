@@ -0,0 +1,231 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+
+# METRICS_ENABLED=0 turns every timer and counter below into a no-op and removes /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Let clients ask for a per-request stage breakdown with an `X-Trace: 1` request header
+TRACE_ENABLED = METRICS_ENABLED and os.getenv("METRICS_TRACE", "1") == "1"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# Stage timings of the current request, when it asked for a trace: a list of (stage, seconds)
+_trace = contextvars.ContextVar("metrics_trace", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, le=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels):
+        """Count the block as in progress while it runs."""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = [(k, list(counts), total, n) for k, (counts, total, n) in self._values.items()]
+        lines = self.header()
+        for labels, counts, total, n in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, '+Inf')} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {n}")
+        return lines
+
+
+class Registry:
+    """Metrics plus collectors, which report values owned elsewhere (caches, pools) at scrape time."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """fn() returns [(name, kind, help, value)]; exceptions skip it for that scrape."""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for fn in self.collectors:
+            try:
+                samples = fn()
+            except Exception:
+                continue
+            for name, kind, help, value in samples:
+                lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "tutor_stage_seconds", "Time spent in each request stage", ["stage"]))
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]))
+llm_prompt_tokens = registry.register(Histogram(
+    "llm_prompt_tokens", "Prompt tokens per LLM call", buckets=TOKEN_BUCKETS))
+llm_response_tokens = registry.register(Histogram(
+    "llm_response_tokens", "Response tokens per LLM call", buckets=TOKEN_BUCKETS))
+llm_in_flight = registry.register(Gauge(
+    "llm_in_flight", "LLM calls by state: waiting for a slot or running", ["state"]))
+llm_calls = registry.register(Counter(
+    "llm_calls_total", "LLM calls by outcome: ok, failed (after retries) or rejected (circuit open)", ["outcome"]))
+llm_retries = registry.register(Counter(
+    "llm_retries_total", "LLM attempts retried after a transient error"))
+llm_hedges = registry.register(Counter(
+    "llm_hedges_total", "Hedged LLM attempts: sent, and whether the hedge won or lost the race", ["result"]))
+tutor_replies = registry.register(Counter(
+    "tutor_replies_total", "Tutor replies by where the answer came from", ["source"]))
+
+
+_NOOP = nullcontext()
+
+
+@contextmanager
+def _timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, name)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((name, elapsed))
+
+
+def stage(name):
+    """Time a block into tutor_stage_seconds{stage=name} and the request's trace, if any."""
+    return _timed(name) if METRICS_ENABLED else _NOOP
+
+
+def run_in_executor(loop, executor, fn, *args):
+    """loop.run_in_executor that carries the request's trace into the worker thread."""
+    if _trace.get() is None:
+        return loop.run_in_executor(executor, fn, *args)
+    return loop.run_in_executor(executor, contextvars.copy_context().run, fn, *args)
+
+
+def server_timing(trace):
+    """Stage breakdown in the standard Server-Timing header format (durations in ms)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in trace)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency histogram, and a Server-Timing header on X-Trace requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trace = None
+        if TRACE_ENABLED and (b"x-trace", b"1") in scope["headers"]:
+            trace = []
+        token = _trace.set(trace)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if trace is not None:
+                    headers = list(message.get("headers", []))
+                    total = (time.perf_counter() - start) * 1000
+                    headers.append((b"server-timing", f"{server_timing(trace)}, total;dur={total:.1f}".lstrip(", ").encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            # Label by route template so /history/1/2 and /history/3/4 share a series
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_seconds.observe(time.perf_counter() - start, scope["method"], path, str(status))
@@ -0,0 +1,120 @@
+import os
+import hmac
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import Header, HTTPException
+from passlib.context import CryptContext
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# bcrypt cost; raising it rehashes each user's password on their next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a few threads use a few cores without touching the event loop
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+# Hash/verify calls allowed to queue before new ones are rejected with 503
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "32"))
+
+# Login throttling within a sliding window: failed logins per (email, IP), and a much higher
+# ceiling per IP, since a whole classroom can share one NAT address. Successful logins don't count.
+LOGIN_FAILURE_LIMIT = int(os.getenv("LOGIN_FAILURE_LIMIT", "5"))
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "300"))
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+# Registrations per IP in the same window; each one costs a bcrypt hash
+REGISTER_IP_LIMIT = int(os.getenv("REGISTER_IP_LIMIT", "200"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated bounded pool, shedding load once too much work is queued."""
+
+    def __init__(self, context, workers=PASSWORD_WORKERS, max_pending=PASSWORD_MAX_PENDING):
+        self.context = context
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self.max_pending = max_pending
+        self.pending = 0
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            logger.warning(f"Password work queue full ({self.pending} pending), rejecting request")
+            raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password):
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password, hashed):
+        """Return (valid, new_hash); new_hash is set when the stored hash uses outdated parameters."""
+        return await self._run(self.context.verify_and_update, password, hashed)
+
+
+class SlidingWindowLimiter:
+    """In-process per-key attempt counter over a sliding window, bounded to max_keys keys (LRU)."""
+
+    def __init__(self, limit, window, max_keys=100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = OrderedDict()
+
+    def _recent(self, key, now):
+        hits = self._hits.get(key)
+        if hits is None:
+            return None
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        return hits
+
+    def retry_after(self, key):
+        """Seconds until key may try again, or 0 if it is under the limit."""
+        now = time.monotonic()
+        hits = self._recent(key, now)
+        if not hits or len(hits) < self.limit:
+            return 0
+        return max(1, int(hits[0] + self.window - now + 1))
+
+    def hit(self, key):
+        now = time.monotonic()
+        hits = self._recent(key, now)
+        if hits is None:
+            hits = self._hits[key] = deque()
+        hits.append(now)
+        self._hits.move_to_end(key)
+        while len(self._hits) > self.max_keys:
+            self._hits.popitem(last=False)
+
+    def reset(self, key):
+        self._hits.pop(key, None)
+
+
+def enforce_limit(limiter, key):
+    retry_after = limiter.retry_after(key)
+    if retry_after:
+        raise HTTPException(
+            status_code=429, detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def require_admin(authorization: str | None = Header(default=None)):
+    """Dependency for admin endpoints: `Authorization: Bearer <ADMIN_TOKEN>`, and none at all without a token set."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+password_hasher = PasswordHasher(pwd_context)
+login_failure_limiter = SlidingWindowLimiter(LOGIN_FAILURE_LIMIT, LOGIN_WINDOW_SECONDS)
+login_ip_limiter = SlidingWindowLimiter(LOGIN_IP_LIMIT, LOGIN_WINDOW_SECONDS)
+register_ip_limiter = SlidingWindowLimiter(REGISTER_IP_LIMIT, LOGIN_WINDOW_SECONDS)
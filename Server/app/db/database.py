@@ -1,7 +1,151 @@
-from databases import Database
+import os
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from sqlalchemy import make_url, text
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from ..core.config import settings
+from ..core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open per worker, and extra ones opened under bursts then closed again
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections older than this many seconds are replaced (-1 never recycles)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Check connections are alive on checkout, so a Postgres restart doesn't fail the next requests
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# Prepared statements cached per asyncpg connection (set 0 behind pgbouncer in transaction mode)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+# Compiled SQL strings cached per engine
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+# The connection of the transaction open in the current task, if any
+_transaction_connection = ContextVar("transaction_connection", default=None)
+
+
+def async_url(url):
+    """DATABASE_URL with an async driver, so plain postgresql:// URLs keep working."""
+    url = make_url(str(url))
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def create_engine(url, **overrides):
+    """The pooled AsyncEngine, configured from the DB_* environment variables and any overrides."""
+    url = async_url(url)
+    options = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING, "query_cache_size": DB_QUERY_CACHE_SIZE}
+    if url.get_backend_name() == "postgresql":
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+        )
+    options.update(overrides)
+    return create_async_engine(url, **options)
+
+
+class Database:
+    """One shared AsyncEngine per process behind a small fetch/execute API.
+
+    Statements outside `transaction()` run on an autocommit connection checked out
+    for just that statement, so a read costs one round trip rather than
+    BEGIN/query/COMMIT. Inside `transaction()` they share the transaction's
+    connection, found through a context variable.
+    """
+
+    def __init__(self, url, **engine_options):
+        self.url = async_url(url)
+        self.engine_options = engine_options
+        self._engine = None
+        self._autocommit = None
+
+    @property
+    def is_connected(self):
+        return self._engine is not None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            raise RuntimeError("Database is not connected")
+        return self._engine
+
+    async def connect(self):
+        if self._engine is not None:
+            return
+        engine = create_engine(self.url, **self.engine_options)
+        # Fail startup now rather than on the first request
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        self._engine = engine
+        self._autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+        logger.info(f"Connected to {self.url.render_as_string(hide_password=True)}")
+
+    async def disconnect(self):
+        if self._engine is None:
+            return
+        engine, self._engine, self._autocommit = self._engine, None, None
+        await engine.dispose()
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Commit the statements inside on exit, or roll them all back on an exception."""
+        conn = _transaction_connection.get()
+        if conn is not None:
+            async with conn.begin_nested():
+                yield
+            return
+        async with self.engine.begin() as conn:
+            token = _transaction_connection.set(conn)
+            try:
+                yield
+            finally:
+                _transaction_connection.reset(token)
+
+    async def _run(self, query, values, consume):
+        if isinstance(query, str):
+            query = text(query)
+        conn = _transaction_connection.get()
+        if conn is not None:
+            return consume(await conn.execute(query, values))
+        if self._autocommit is None:
+            raise RuntimeError("Database is not connected")
+        async with self._autocommit.connect() as conn:
+            return consume(await conn.execute(query, values))
+
+    async def fetch_one(self, query, values=None):
+        return await self._run(query, values, lambda result: result.first())
+
+    async def fetch_all(self, query, values=None):
+        return await self._run(query, values, lambda result: result.all())
+
+    async def fetch_val(self, query, values=None):
+        return await self._run(query, values, lambda result: result.scalar())
+
+    async def execute(self, query, values=None):
+        """Run a statement without rows; returns the number of rows it affected."""
+        return await self._run(query, values, lambda result: result.rowcount)
+
 
 database = Database(settings.DATABASE_URL)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+@registry.collector
+def pool_samples():
+    """Connection pool occupancy; skipped until connected, and on pools without a fixed size."""
+    pool = database.engine.pool
+    in_use = pool.checkedout()
+    return [
+        ("db_pool_size", "gauge", "Open database connections", pool.checkedin() + in_use),
+        ("db_pool_in_use", "gauge", "Database connections checked out", in_use),
+        ("db_pool_overflow", "gauge", "Connections open beyond the pool size", max(pool.overflow(), 0)),
+        ("db_pool_max_size", "gauge", "Database pool capacity", pool.size() + pool._max_overflow),
+    ]
@@ -0,0 +1,127 @@
+"""Streaming exports of the chat table for offline analytics.
+
+Rows are read in id order through a server-side cursor and written batch by
+batch, so memory stays constant however large the table grows.
+"""
+import os
+import gzip
+import json
+import zlib
+from sqlalchemy import select
+from app.AI.manifest import atomic_path
+from .models import Chat
+
+# Rows fetched per cursor round trip, and per JSONL chunk / Parquet row group
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FORMATS = ("jsonl", "parquet")
+EXPORT_COLUMNS = (Chat.id, Chat.user_id, Chat.chat_session_id, Chat.query, Chat.answer, Chat.created_at, Chat.retrieval)
+# Parquet column types. Declared rather than inferred, so a first batch of NULLs (e.g.
+# chats saved before provenance was recorded) can't fix a column's type; retrieval is
+# stored as JSON text
+PARQUET_TYPES = {
+    "id": "int64", "user_id": "int64", "chat_session_id": "int64",
+    "query": "string", "answer": "string", "created_at": "string", "retrieval": "string",
+}
+
+
+def export_query(after_id=None, since=None, until=None, include_answers=True):
+    """Chats in id order; after_id resumes an interrupted export."""
+    columns = [column for column in EXPORT_COLUMNS if include_answers or column.key != "answer"]
+    query = select(*columns).order_by(Chat.id)
+    if after_id is not None:
+        query = query.where(Chat.id > after_id)
+    if since is not None:
+        query = query.where(Chat.created_at >= since)
+    if until is not None:
+        query = query.where(Chat.created_at < until)
+    return query
+
+
+def chat_record(row):
+    record = dict(row._mapping)
+    if record.get("created_at") is not None:
+        record["created_at"] = record["created_at"].isoformat()
+    return record
+
+
+async def iter_chat_batches(db, query, batch_size=EXPORT_BATCH_SIZE):
+    """Lists of export records, fetched `batch_size` rows at a time through a server-side cursor."""
+    async with db.engine.connect() as conn:
+        result = await conn.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions(batch_size):
+            yield [chat_record(row) for row in rows]
+
+
+def parquet_schema(columns):
+    import pyarrow as pa
+    return pa.schema([(column, pa.type_for_alias(PARQUET_TYPES[column])) for column in columns])
+
+
+def parquet_record(record):
+    if record.get("retrieval") is not None:
+        record = {**record, "retrieval": json.dumps(record["retrieval"])}
+    return record
+
+
+def jsonl_bytes(records):
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+
+
+async def gzip_jsonl_chunks(batches):
+    """Gzip-compressed JSON Lines for a streaming response, one compressed chunk per batch."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes the gzip container
+    async for batch in batches:
+        chunk = compressor.compress(jsonl_bytes(batch))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+async def write_export(path, batches, fmt="jsonl"):
+    """Write batches to gzip JSONL or Parquet (one row group per batch); returns (rows, last id)."""
+    rows, last_id = 0, None
+    with atomic_path(path) as tmp_path:
+        if fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            writer = None
+            try:
+                async for batch in batches:
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp_path, parquet_schema(batch[0]), compression="zstd")
+                    writer.write_table(pa.Table.from_pylist([parquet_record(r) for r in batch], schema=writer.schema))
+                    rows, last_id = rows + len(batch), batch[-1]["id"]
+                if writer is None:
+                    pq.write_table(parquet_schema(PARQUET_TYPES).empty_table(), tmp_path)  # nothing matched: still a valid file
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            with gzip.open(tmp_path, "wb") as f:
+                async for batch in batches:
+                    f.write(jsonl_bytes(batch))
+                    rows, last_id = rows + len(batch), batch[-1]["id"]
+    return rows, last_id
+
+
+def iter_export_records(path, batch_size=EXPORT_BATCH_SIZE):
+    """Read an export back in batches of records, whichever format it was written in."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size):
+            records = batch.to_pylist()
+            for record in records:
+                if record.get("retrieval") is not None:
+                    record["retrieval"] = json.loads(record["retrieval"])
+            yield records
+        return
+    batch = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
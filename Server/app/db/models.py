@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import JSON, Column, Integer, String, ForeignKey, ForeignKeyConstraint, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship, validates
 from .database import Base
 
@@ -10,14 +11,30 @@ class User(Base):
     name = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False)
     password = Column(String, nullable=False)  # store hashed password
+    chat_session_count = Column(Integer, nullable=False, server_default="0")  # last allocated chat_session_id
 
     chats = relationship("Chat", back_populates="user", cascade="all, delete-orphan")
+    chat_sessions = relationship("ChatSession", back_populates="user", cascade="all, delete-orphan")
 
     @validates("email")
     def convert_lowercase(self, key, value):
         return value.lower()
 
 
+class ChatSession(Base):
+    __tablename__ = "chat_session"
+
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    chat_session_id = Column(Integer, primary_key=True)  # numbered per user, allocated from user.chat_session_count
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Summary maintained by the statements that save chats, so listings never scan chat rows
+    first_query = Column(String, nullable=False, server_default="")
+    last_activity_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    turn_count = Column(Integer, nullable=False, server_default="0")
+
+    user = relationship("User", back_populates="chat_sessions")
+
+
 class Chat(Base):
     __tablename__ = "chat"
 
@@ -27,5 +44,15 @@ class Chat(Base):
     query = Column(String, nullable=False)
     answer = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Chunk ids, scores, pages and index version the answer's context came from; NULL when nothing was retrieved
+    retrieval = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
 
     user = relationship("User", back_populates="chats")
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["user_id", "chat_session_id"], ["chat_session.user_id", "chat_session.chat_session_id"], ondelete="CASCADE"
+        ),
+        # Serves a session's chats in order (history, latest N for memory) with an index range scan
+        Index("ix_chat_user_session_created", "user_id", "chat_session_id", "created_at"),
+    )
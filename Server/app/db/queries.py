@@ -0,0 +1,184 @@
+"""Statements for the hot paths of api/tutor.py and api/auth.py, built once at import.
+
+Each takes its values as bind parameters, so handlers don't rebuild the same
+select() on every call; SQLAlchemy reuses the compiled SQL, and asyncpg the
+prepared statement on each pooled connection. Execute them as
+`database.fetch_one(USER_BY_ID, {"user_id": 1})`.
+"""
+from datetime import timezone
+from sqlalchemy import DateTime, Integer, String, bindparam, func, insert, literal, select, tuple_, update
+from sqlalchemy.types import TypeDecorator
+from .models import Chat, ChatSession, User
+
+
+class CursorTimestamp(TypeDecorator):
+    """A created_at bound for keyset comparisons, in the format the column is stored in.
+
+    SQLite keeps server_default timestamps as 'YYYY-MM-DD HH:MM:SS' text and compares
+    them as strings; a bound datetime would render as '...:SS.000000', which sorts after
+    every row of that second, so a cursor would return its own row again.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(DateTime(timezone=True))
+
+    def process_bind_param(self, value, dialect):
+        if dialect.name != "sqlite" or value is None:
+            return value
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat(sep=" ", timespec="microseconds" if value.microsecond else "seconds")
+
+
+CHAT_COLUMNS = (Chat.id, Chat.chat_session_id, Chat.user_id, Chat.query, Chat.answer, Chat.created_at, Chat.retrieval)
+
+# Users
+
+USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+
+USER_SESSION_COUNT = select(User.chat_session_count).where(User.id == bindparam("user_id"))
+
+# Inserts take their column values as the execute() parameters
+INSERT_USER = insert(User).returning(User.id)
+
+UPDATE_PASSWORD = update(User).where(User.id == bindparam("user_id")).values(password=bindparam("new_password"))
+
+# Chats
+
+RECENT_CHATS = (
+    select(Chat.query, Chat.answer)
+    .where(Chat.user_id == bindparam("user_id"), Chat.chat_session_id == bindparam("chat_session_id"))
+    .order_by(Chat.created_at.desc(), Chat.id.desc())
+    .limit(bindparam("limit", type_=Integer))
+)
+
+HISTORY_PAGE = (
+    select(Chat)
+    .where(Chat.user_id == bindparam("user_id"), Chat.chat_session_id == bindparam("chat_session_id"))
+    .order_by(Chat.created_at.desc(), Chat.id.desc())
+    .limit(bindparam("limit", type_=Integer))
+)
+
+# The page of chats before the cursor's (created_at, id)
+HISTORY_PAGE_BEFORE = HISTORY_PAGE.where(
+    tuple_(Chat.created_at, Chat.id)
+    < tuple_(bindparam("before_created_at", type_=CursorTimestamp()), bindparam("before_id", type_=Integer))
+)
+
+CHAT_BY_ID = select(Chat).where(Chat.id == bindparam("chat_id"), Chat.user_id == bindparam("user_id"))
+
+# The turns of a session before a given chat, newest first
+CHATS_BEFORE = (
+    select(Chat.query, Chat.answer)
+    .where(
+        Chat.user_id == bindparam("user_id"), Chat.chat_session_id == bindparam("chat_session_id"),
+        tuple_(Chat.created_at, Chat.id)
+        < tuple_(bindparam("before_created_at", type_=CursorTimestamp()), bindparam("before_id", type_=Integer)),
+    )
+    .order_by(Chat.created_at.desc(), Chat.id.desc())
+    .limit(bindparam("limit", type_=Integer))
+)
+
+SESSIONS_PAGE = (
+    select(ChatSession)
+    .where(ChatSession.user_id == bindparam("user_id"))
+    .order_by(ChatSession.chat_session_id.desc())
+    .limit(bindparam("limit", type_=Integer))
+)
+
+SESSIONS_PAGE_BEFORE = SESSIONS_PAGE.where(ChatSession.chat_session_id < bindparam("before_session_id"))
+
+# Saving a turn: values are b_user_id, b_query, b_answer and b_retrieval, plus b_chat_session_id for an existing session.
+# Bind names in an INSERT or UPDATE can't be column names of its table, hence the b_ prefix.
+
+def _new_session_chat():
+    """One statement: bump the user's session counter, create the session row and insert the chat.
+
+    The counter row lock serializes concurrent allocations for the same user.
+    """
+    allocated = (
+        update(User)
+        .where(User.id == bindparam("b_user_id"))
+        .values(chat_session_count=User.chat_session_count + 1)
+        .returning(User.id.label("user_id"), User.chat_session_count.label("chat_session_id"))
+        .cte("allocated")
+    )
+    new_session = (
+        insert(ChatSession)
+        .from_select(
+            ["user_id", "chat_session_id", "first_query", "turn_count"],
+            select(allocated.c.user_id, allocated.c.chat_session_id,
+                   bindparam("b_query", type_=String), literal(1, Integer)),
+        )
+        .returning(ChatSession.user_id, ChatSession.chat_session_id)
+        .cte("new_session")
+    )
+    return (
+        insert(Chat)
+        .from_select(
+            ["chat_session_id", "user_id", "query", "answer", "retrieval"],
+            select(new_session.c.chat_session_id, new_session.c.user_id,
+                   bindparam("b_query", type_=String), bindparam("b_answer", type_=String),
+                   bindparam("b_retrieval", type_=Chat.retrieval.type)),
+        )
+        .returning(*CHAT_COLUMNS)
+    )
+
+def _session_chat():
+    """One statement: update the session summary and insert the chat, only if the session belongs to the user."""
+    touched = (
+        update(ChatSession)
+        .where(ChatSession.user_id == bindparam("b_user_id"), ChatSession.chat_session_id == bindparam("b_chat_session_id"))
+        .values(turn_count=ChatSession.turn_count + 1, last_activity_at=func.now())
+        .returning(ChatSession.user_id, ChatSession.chat_session_id)
+        .cte("touched")
+    )
+    return (
+        insert(Chat)
+        .from_select(
+            ["chat_session_id", "user_id", "query", "answer", "retrieval"],
+            select(touched.c.chat_session_id, touched.c.user_id,
+                   bindparam("b_query", type_=String), bindparam("b_answer", type_=String),
+                   bindparam("b_retrieval", type_=Chat.retrieval.type)),
+        )
+        .returning(*CHAT_COLUMNS)
+    )
+
+INSERT_CHAT_IN_NEW_SESSION = _new_session_chat()
+INSERT_CHAT_IN_SESSION = _session_chat()
+
+# The same writes one statement at a time, for databases without data-modifying CTEs
+
+ALLOCATE_SESSION_ID = (
+    update(User)
+    .where(User.id == bindparam("user_id"))
+    .values(chat_session_count=User.chat_session_count + 1)
+    .returning(User.chat_session_count)
+)
+
+# Values: user_id, chat_session_id, first_query, turn_count
+INSERT_SESSION = insert(ChatSession)
+
+TOUCH_SESSION = (
+    update(ChatSession)
+    .where(ChatSession.user_id == bindparam("b_user_id"), ChatSession.chat_session_id == bindparam("b_chat_session_id"))
+    .values(turn_count=ChatSession.turn_count + 1, last_activity_at=func.now())
+    .returning(ChatSession.chat_session_id)
+)
+
+# Values: chat_session_id, user_id, query, answer, retrieval
+INSERT_CHAT = insert(Chat).returning(*CHAT_COLUMNS)
+
+# Replace a chat's answer in place; values b_chat_id, b_user_id, b_answer, b_retrieval
+UPDATE_ANSWER = (
+    update(Chat)
+    .where(Chat.id == bindparam("b_chat_id"), Chat.user_id == bindparam("b_user_id"))
+    .values(answer=bindparam("b_answer", type_=String), retrieval=bindparam("b_retrieval", type_=Chat.retrieval.type))
+    .returning(*CHAT_COLUMNS)
+)
@@ -1,11 +1,47 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.db.database import database
-from app.api import auth, tutor
-from fastapi.responses import JSONResponse
+from app.api import admin, auth, tutor
+from app.AI.llm import query_embedding_cache, rag_executor, reload_index
+from app.AI.resources import resources
+from app.core.metrics import METRICS_ENABLED, MetricsMiddleware, registry
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 
+logger = logging.getLogger(__name__)
+
+# Load the embedding model, index and chunks before serving (set PRELOAD_RAG=0 to load on first request)
+PRELOAD_RAG = os.getenv("PRELOAD_RAG", "1") == "1"
+# Seconds between checks for a newer index written by `rag.py --update` (0 disables)
+INDEX_RELOAD_INTERVAL = float(os.getenv("INDEX_RELOAD_INTERVAL", "30"))
+
+async def watch_index():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(INDEX_RELOAD_INTERVAL)
+        try:
+            await loop.run_in_executor(rag_executor, reload_index)
+        except Exception as e:
+            logger.error(f"Index reload failed, keeping the current index: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await database.connect()
+    if PRELOAD_RAG:
+        await asyncio.get_running_loop().run_in_executor(rag_executor, resources.load)
+    watcher = asyncio.create_task(watch_index()) if INDEX_RELOAD_INTERVAL > 0 else None
+    yield
+    if watcher:
+        watcher.cancel()
+    query_embedding_cache.flush()
+    await database.disconnect()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="AI Tutor API",
     description="API Documentation for AI Tutor Application",
     version="1.0.0",
@@ -20,23 +56,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],  # keyset pagination of /tutor/sessions, X-Trace breakdown
 )
-
-@app.on_event("startup")
-async def startup():
-    await database.connect()
-
-@app.on_event("shutdown")
-async def shutdown():
-    await database.disconnect()
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(tutor.router, prefix="/tutor", tags=["Tutor"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 @app.get("/")
 def read_root():
     return {"message": "Hello from FastAPI!"}
 
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    """Readiness: the database is connected and the RAG resources are loaded."""
+    checks = {"database": database.is_connected, **resources.status()}
+    status_code = 200 if all(checks.values()) else 503
+    return JSONResponse(status_code=status_code, content={"ready": status_code == 200, "checks": checks})
+
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus text exposition of request, stage, LLM, cache and DB pool metrics."""
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     return JSONResponse(
@@ -10,6 +10,17 @@ class TutorRequest(BaseModel):
     chat_session_id: int | None = None  # optional, if not provided → start new session
 
 
+# Where an answer's textbook context came from
+class RetrievalInfo(BaseModel):
+    index_version: int | None = None
+    chunk_ids: List[int]
+    scores: List[float | None]  # dense cosine similarity; None for chunks found by keyword search only
+    pages: List[int]
+    doc_ids: List[str] = []
+    chunk_hashes: List[str] = []  # short text hashes; chunk ids are reassigned when the index is rebuilt
+    search_query: str | None = None  # set when a follow-up was searched together with the previous question
+
+
 # Response for a single chat entry
 class TutorResponse(BaseModel):
     id: int
@@ -18,6 +29,7 @@ class TutorResponse(BaseModel):
     query: str
     answer: str
     created_at: datetime
+    retrieval: RetrievalInfo | None = None  # None for cached, off-topic and identity answers
 
     class Config:
         from_attributes = True
@@ -27,11 +39,14 @@ class TutorResponse(BaseModel):
 class ChatHistory(BaseModel):
     chat_session_id: int
     chats: List[TutorResponse]
+    next_cursor: str | None = None  # pass as ?cursor= to fetch earlier chats
 
 
 class ChatSessionInfo(BaseModel):
     chat_session_id: int
     created_at: datetime
     chat_query: str
+    last_activity_at: datetime | None = None
+    turn_count: int = 0
     class Config:
         from_attributes = True
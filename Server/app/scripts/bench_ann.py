@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from app.AI.ann import create_faiss_index, make_search_params
+from app.AI.resources import OUTPUT_DIR, load_embed_model, load_text_chunks
+
+SAMPLE_QUESTIONS = [
+    "What is a list comprehension?",
+    "Difference between list and tuple",
+    "How do I define a function in Python?",
+    "How does a for loop work?",
+    "What is inheritance in classes?",
+    "How do I handle ZeroDivisionError?",
+    "What does the break statement do?",
+    "How do I convert a string to an int?",
+]
+
+
+def load_corpus(chunks_path, model, scale, seed=0):
+    """Embed the textbook chunks; scale > 1 adds jittered copies to mimic a larger library."""
+    texts = [chunk["text"] for chunk in load_text_chunks(chunks_path).values()]
+    vectors = model.encode(texts, convert_to_numpy=True, batch_size=64, normalize_embeddings=True).astype(np.float32)
+    if scale > 1:
+        rng = np.random.default_rng(seed)
+        noise = vectors.std() * 0.1
+        copies = [vectors] + [vectors + rng.normal(0, noise, vectors.shape).astype(np.float32) for _ in range(scale - 1)]
+        vectors = np.concatenate(copies)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def time_search(index, queries, top_k, params):
+    latencies = []
+    results = []
+    for q in queries:
+        start = time.perf_counter()
+        _, I = index.search(q.reshape(1, -1), top_k, params=params)
+        latencies.append(time.perf_counter() - start)
+        results.append(I[0])
+    return np.array(results), np.array(latencies) * 1000
+
+
+def recall_at_k(results, truth):
+    hits = [len(set(r[r >= 0]) & set(t)) / len(t) for r, t in zip(results, truth)]
+    return float(np.mean(hits))
+
+
+def bench_ann(chunks_path, scale, top_k, num_queries, output):
+    model = load_embed_model()
+    corpus = load_corpus(chunks_path, model, scale)
+    rng = np.random.default_rng(1)
+    sampled = corpus[rng.choice(len(corpus), size=min(num_queries, len(corpus)), replace=False)]
+    queries = np.concatenate([model.encode(SAMPLE_QUESTIONS, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32), sampled])
+    dim = corpus.shape[1]
+    print(f"Corpus: {len(corpus)} vectors x {dim} dims, {len(queries)} queries, top_k={top_k}")
+
+    # The exact flat index is the ground truth for recall
+    flat = create_faiss_index(dim, len(corpus), "flat")
+    flat.add(corpus)
+    truth, flat_ms = time_search(flat, queries, top_k, None)
+    rows = [{"index": "flat", "param": None, "recall": 1.0,
+             "p50_ms": float(np.percentile(flat_ms, 50)), "p99_ms": float(np.percentile(flat_ms, 99))}]
+
+    sweeps = {"ivf": [1, 4, 16, 64], "ivfpq": [1, 4, 16, 64], "hnsw": [16, 32, 64, 128]}
+    for index_type, values in sweeps.items():
+        start = time.perf_counter()
+        index = create_faiss_index(dim, len(corpus), index_type)
+        if not index.is_trained:
+            index.train(corpus)
+        index.add(corpus)
+        build_s = time.perf_counter() - start
+        for value in values:
+            params = make_search_params(index, nprobe=value, ef_search=value)
+            results, ms = time_search(index, queries, top_k, params)
+            rows.append({
+                "index": index_type,
+                "param": {"efSearch" if index_type == "hnsw" else "nprobe": value},
+                "build_s": round(build_s, 3),
+                "recall": recall_at_k(results, truth),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p99_ms": float(np.percentile(ms, 99)),
+            })
+
+    for row in rows:
+        print(f"{row['index']:>6} {str(row['param'] or ''):>18}  recall@{top_k}={row['recall']:.3f}  "
+              f"p50={row['p50_ms']:.3f}ms  p99={row['p99_ms']:.3f}ms")
+    if output:
+        with open(output, "w") as f:
+            json.dump({"corpus_size": len(corpus), "top_k": top_k, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs latency of ANN index types against exact flat search")
+    parser.add_argument("--chunks", default=os.path.join(OUTPUT_DIR, "text_chunks.bin"), help="Chunk file to embed")
+    parser.add_argument("--scale", type=int, default=1, help="Replicate the corpus with jitter to simulate more books")
+    parser.add_argument("--top_k", type=int, default=3)
+    parser.add_argument("--num_queries", type=int, default=200, help="Chunk vectors sampled as extra queries")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+    bench_ann(args.chunks, args.scale, args.top_k, args.num_queries, args.output)
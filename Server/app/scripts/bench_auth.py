@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+# Must be set before app.AI.llm is imported
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY", "0.05")
+
+import httpx
+from app.main import app
+from app.db.database import database
+from app.core.security import login_failure_limiter, password_hasher
+
+# httpx's ASGI transport reports every request as coming from this address
+CLIENT_IP = "127.0.0.1"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else float("nan")
+
+
+async def timed(client, method, url, **kwargs):
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    return time.perf_counter() - start, response.status_code
+
+
+async def login_burst(client, credentials, logins, concurrency):
+    """Issue `logins` logins, `concurrency` at a time; return (logins/s, status codes)."""
+    remaining = iter(range(logins))
+    statuses = []
+
+    async def worker():
+        for _ in remaining:
+            _, status = await timed(client, "POST", "/auth/login", json=credentials)
+            statuses.append(status)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return logins / (time.perf_counter() - start), statuses
+
+
+async def ask_probes(client, user_id, stop):
+    """Sequential /tutor/ask calls until `stop` is set; returns latencies in ms."""
+    latencies = []
+    payload = {"query": "What is a list comprehension in Python?", "user_id": user_id}
+    while not stop.is_set():
+        latency, _ = await timed(client, "POST", "/tutor/ask", json=payload)
+        latencies.append(latency * 1000)
+    return latencies
+
+
+async def run_mode(client, credentials, user_id, logins, concurrency, inline):
+    original = password_hasher._run
+    if inline:
+        # What the handlers did before: bcrypt on the event loop thread
+        async def run_inline(fn, *args):
+            return fn(*args)
+        password_hasher._run = run_inline
+    try:
+        stop = asyncio.Event()
+        probes = asyncio.create_task(ask_probes(client, user_id, stop))
+        throughput, statuses = await login_burst(client, credentials, logins, concurrency)
+        stop.set()
+        latencies = await probes
+    finally:
+        password_hasher._run = original
+    return throughput, statuses, latencies
+
+
+async def bench_auth(logins, concurrency):
+    await database.connect()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+            credentials = {"email": f"bench-{uuid.uuid4().hex[:8]}@example.com", "password": "correct horse"}
+            response = await client.post("/auth/register", json={"name": "bench", **credentials})
+            response.raise_for_status()
+            user_id = response.json()["id"]
+
+            stop = asyncio.Event()
+            asyncio.get_running_loop().call_later(2, stop.set)
+            baseline = await ask_probes(client, user_id, stop)
+            print(f"[📊] /tutor/ask alone: p50={statistics.median(baseline):.0f}ms p99={percentile(baseline, 99):.0f}ms")
+
+            for inline in (True, False):
+                throughput, statuses, latencies = await run_mode(client, credentials, user_id, logins, concurrency, inline)
+                label = "bcrypt inline   " if inline else "bcrypt offloaded"
+                rejected = sum(status == 503 for status in statuses)
+                print(f"[📊] {label}: {throughput:.1f} logins/s ({rejected} shed with 503), "
+                      f"concurrent /tutor/ask p50={statistics.median(latencies):.0f}ms p99={percentile(latencies, 99):.0f}ms "
+                      f"over {len(latencies)} calls")
+
+            # Brute force against one account is cut off after a few failures, before bcrypt runs
+            wrong = {**credentials, "password": "wrong"}
+            statuses = [(await timed(client, "POST", "/auth/login", json=wrong))[1] for _ in range(20)]
+            print(f"[📊] 20 wrong passwords: {statuses.count(401)} x 401, {statuses.count(429)} x 429")
+            login_failure_limiter.reset((credentials["email"], CLIENT_IP))
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login throughput and concurrent /tutor/ask latency, bcrypt inline vs offloaded")
+    parser.add_argument("--logins", type=int, default=64, help="Logins per mode")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent login clients")
+    args = parser.parse_args()
+    asyncio.run(bench_auth(args.logins, args.concurrency))
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.AI.batching import MicroBatcher
+from app.AI.resources import load_embed_model
+
+QUESTIONS = [
+    "What is a list comprehension?",
+    "Difference between list and tuple",
+    "How do I define a function in Python?",
+    "How does a for loop work?",
+    "What is inheritance in classes?",
+    "How do I handle ZeroDivisionError?",
+    "What does the break statement do?",
+    "How do I convert a string to an int?",
+]
+
+
+async def run_level(embed, concurrency, requests):
+    """Issue `requests` embeddings with `concurrency` callers in flight; return (emb/s, latencies ms)."""
+    latencies = []
+    counter = iter(range(requests))
+
+    async def caller():
+        for n in counter:
+            start = time.perf_counter()
+            await embed(f"{QUESTIONS[n % len(QUESTIONS)]} ({n})")  # distinct texts, no tokenizer cache hits
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[caller() for _ in range(concurrency)])
+    return requests / (time.perf_counter() - start), np.array(latencies)
+
+
+async def bench_batching(levels, requests, workers, max_batch, max_wait_ms, output):
+    model = load_embed_model()
+    model.encode(QUESTIONS)  # warm up
+    executor = ThreadPoolExecutor(max_workers=workers)
+    loop = asyncio.get_running_loop()
+
+    async def unbatched(query):
+        return await loop.run_in_executor(executor, model.encode, [query])
+
+    batcher = MicroBatcher(lambda queries: list(model.encode(queries, batch_size=len(queries))),
+                           executor, max_batch, max_wait_ms / 1000, name="embed")
+    modes = {"unbatched": unbatched, "batched": batcher.submit}
+
+    rows = []
+    for concurrency in levels:
+        for mode, embed in modes.items():
+            before = batcher.stats()
+            throughput, ms = await run_level(embed, concurrency, requests)
+            after = batcher.stats()
+            batches = after["batches"] - before["batches"]
+            row = {
+                "mode": mode,
+                "concurrency": concurrency,
+                "emb_per_s": round(throughput, 1),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "mean_batch_size": round((after["items"] - before["items"]) / batches, 2) if batches else 1.0,
+            }
+            rows.append(row)
+            print(f"{mode:>9} c={concurrency:<4} {row['emb_per_s']:>8.1f} emb/s  p50={row['p50_ms']:.1f}ms  "
+                  f"p99={row['p99_ms']:.1f}ms  batch={row['mean_batch_size']}")
+    executor.shutdown()
+    if output:
+        with open(output, "w") as f:
+            json.dump({"max_batch": max_batch, "max_wait_ms": max_wait_ms, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query embedding throughput and latency with and without micro-batching")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=512, help="Embeddings per concurrency level and mode")
+    parser.add_argument("--workers", type=int, default=4, help="Executor threads (RAG_WORKERS)")
+    parser.add_argument("--max_batch", type=int, default=32)
+    parser.add_argument("--max_wait_ms", type=float, default=2.0)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+    asyncio.run(bench_batching(args.concurrency, args.requests, args.workers, args.max_batch, args.max_wait_ms, args.output))
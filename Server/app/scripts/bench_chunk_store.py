@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+from app.AI.resources import OUTPUT_DIR
+
+# Each measurement runs in a fresh interpreter so resident memory is not shared between loaders
+PROBE = r"""
+import json, pickle, random, sys, time
+
+def rss_kb(field="RssAnon:"):
+    # RssAnon is private to this worker; mapped file pages are shared through the page cache
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return 0
+
+kind, path, lookups, top_k = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+from app.AI.chunk_store import ChunkStore  # import cost (numpy) is paid before the baseline
+before = rss_kb()
+start = time.perf_counter()
+if kind == "pickle":
+    with open(path, "rb") as f:
+        chunks = {chunk.get("id", i): chunk for i, chunk in enumerate(pickle.load(f))}
+else:
+    chunks = ChunkStore(path)
+load_s = time.perf_counter() - start
+after_load = rss_kb()
+
+ids = list(range(len(chunks)))
+rng = random.Random(0)
+start = time.perf_counter()
+for _ in range(lookups):
+    texts = [chunks[i]["text"] for i in rng.sample(ids, top_k)]
+lookup_us = (time.perf_counter() - start) / lookups * 1e6
+print(json.dumps({
+    "load_ms": load_s * 1000,
+    "rss_load_mb": (after_load - before) / 1024,
+    "rss_after_lookups_mb": (rss_kb() - before) / 1024,
+    "file_backed_mb": rss_kb("RssFile:") / 1024,
+    "lookup_us": lookup_us,
+}))
+"""
+
+
+def scaled_chunks(pickle_path, scale):
+    with open(pickle_path, "rb") as f:
+        chunks = pickle.load(f)
+    return [
+        {**chunk, "id": copy * len(chunks) + i, "doc_id": chunk.get("doc_id") or f"copy{copy}"}
+        for copy in range(scale)
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def probe(kind, path, lookups, top_k):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, kind, path, str(lookups), str(top_k)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench_chunk_store(pickle_path, scales, lookups, top_k, output):
+    from app.AI.chunk_store import write_chunk_store
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            chunks = scaled_chunks(pickle_path, scale)
+            pkl = os.path.join(tmp, f"chunks_{scale}.pkl")
+            store = os.path.join(tmp, f"chunks_{scale}.bin")
+            with open(pkl, "wb") as f:
+                pickle.dump(chunks, f)
+            write_chunk_store(store, chunks)
+            for kind, path in (("pickle", pkl), ("store", store)):
+                row = {"format": kind, "chunks": len(chunks), "file_mb": os.path.getsize(path) / 2**20}
+                row.update(probe(kind, path, lookups, top_k))
+                rows.append(row)
+                print(f"{kind:>6} {row['chunks']:>8} chunks  file={row['file_mb']:.1f}MB  load={row['load_ms']:.1f}ms  "
+                      f"private rss={row['rss_load_mb']:.1f}MB (after lookups {row['rss_after_lookups_mb']:.1f}MB)  "
+                      f"top_{top_k} lookup={row['lookup_us']:.1f}us")
+    if output:
+        with open(output, "w") as f:
+            json.dump({"top_k": top_k, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load time and resident memory of pickled chunks vs the memory-mapped chunk store")
+    parser.add_argument("--pickle", default=os.path.join(OUTPUT_DIR, "text_chunks.pkl"), help="Source chunks (legacy pickle)")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 50], help="Corpus replication factors")
+    parser.add_argument("--lookups", type=int, default=1000, help="Simulated retrievals per run")
+    parser.add_argument("--top_k", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+    bench_chunk_store(args.pickle, args.scale, args.lookups, args.top_k, args.output)
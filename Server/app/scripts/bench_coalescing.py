@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import numpy as np
+from app.AI.fake_llm import FakeGenerativeModel
+from app.AI.gateway import LLMGateway
+from app.AI.llm import coalescing_key
+from app.AI.singleflight import SingleFlight
+
+# A class told to "ask the tutor about for loops": the same few questions, typed slightly differently
+PHRASINGS = [
+    "What is a for loop?",
+    "what is a for loop",
+    "What is a for loop ?",
+    "How does a for loop work?",
+    "how does a for loop work",
+    "What is range() used for in a for loop?",
+]
+
+
+async def run_burst(gateway, students, window, coalesce, seed):
+    """`students` questions arriving uniformly over `window` seconds; returns (latencies ms, LLM calls)."""
+    rng = random.Random(seed)
+    flights = SingleFlight()
+    calls = 0
+
+    async def generate(question):
+        nonlocal calls
+        calls += 1
+        response = await gateway.generate(question)
+        return response.text.strip()
+
+    async def student(question, delay):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        if coalesce:
+            flight, _ = flights.join(coalescing_key(question), lambda flight: generate(question))
+            await flight.wait()
+        else:
+            await generate(question)
+        return (time.perf_counter() - start) * 1000
+
+    latencies = await asyncio.gather(*[
+        student(rng.choice(PHRASINGS), rng.uniform(0, window)) for _ in range(students)
+    ])
+    return np.array(latencies), calls
+
+
+async def bench_coalescing(students, window, latency, max_concurrency, output):
+    rows = []
+    for coalesce in (False, True):
+        gateway = LLMGateway(FakeGenerativeModel(latency=latency), max_concurrency=max_concurrency,
+                             timeout=60, hedge_percentile=0)
+        ms, calls = await run_burst(gateway, students, window, coalesce, seed=0)
+        row = {
+            "mode": "coalesced" if coalesce else "one call per request",
+            "students": students,
+            "llm_calls": calls,
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p99_ms": float(np.percentile(ms, 99)),
+        }
+        rows.append(row)
+        print(f"[📊] {row['mode']:<22} {calls:>4} LLM calls for {students} students  "
+              f"p50={row['p50_ms']:.0f}ms  p99={row['p99_ms']:.0f}ms")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"window_s": window, "latency_s": latency, "max_concurrency": max_concurrency, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM calls and latency for a classroom burst of identical questions, with and without coalescing")
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--window", type=float, default=3.0, help="Seconds over which the questions arrive")
+    parser.add_argument("--latency", type=float, default=1.5, help="Fake LLM latency (s)")
+    parser.add_argument("--max_concurrency", type=int, default=8, help="Concurrent LLM calls allowed by the gateway")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+    asyncio.run(bench_coalescing(args.students, args.window, args.latency, args.max_concurrency, args.output))
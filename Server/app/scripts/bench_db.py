@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+import numpy as np
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, func, insert, select
+from app.api.tutor import resolve_chat_session, save_chat
+from app.AI.memory import conversation_memory
+from app.core.config import settings
+from app.db import queries
+from app.db.database import Base, database
+from app.db.models import User
+from app.schemas.tutor import TutorRequest
+
+# The pre-chat_session write path, replayed against a copy of the old chat table
+legacy_metadata = MetaData()
+legacy_chat = Table(
+    "bench_legacy_chat", legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("chat_session_id", Integer, nullable=False, index=True),
+    Column("user_id", Integer, nullable=False),
+    Column("query", String, nullable=False),
+    Column("answer", String, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+ROUND_TRIP_METHODS = ("fetch_one", "fetch_all", "fetch_val", "execute")
+
+
+class RoundTripCounter:
+    """Counts statements sent through the shared database engine."""
+
+    def __init__(self):
+        self.count = 0
+        for name in ROUND_TRIP_METHODS:
+            setattr(database, name, self._wrap(getattr(database, name)))
+
+    def _wrap(self, method):
+        async def counted(*args, **kwargs):
+            self.count += 1
+            return await method(*args, **kwargs)
+        return counted
+
+
+async def legacy_ask(user_id, chat_session_id):
+    """validate_user, MAX() allocation or ownership SELECT (+ MAX again), then INSERT."""
+    if not await database.fetch_one(select(User).where(User.id == user_id)):
+        raise ValueError("User not found")
+
+    async def next_session_id():
+        max_id = await database.fetch_val(select(func.max(legacy_chat.c.chat_session_id)).where(legacy_chat.c.user_id == user_id))
+        return (max_id or 0) + 1
+
+    if chat_session_id is None:
+        chat_session_id = await next_session_id()
+    else:
+        existing = await database.fetch_one(select(legacy_chat).where(
+            legacy_chat.c.chat_session_id == chat_session_id, legacy_chat.c.user_id == user_id
+        ))
+        if not existing and chat_session_id != await next_session_id():
+            raise ValueError("Invalid chat_session_id")
+    row = await database.fetch_one(
+        insert(legacy_chat).values(chat_session_id=chat_session_id, user_id=user_id, query="q", answer="a")
+        .returning(legacy_chat.c.chat_session_id)
+    )
+    return row.chat_session_id
+
+
+async def legacy_list_sessions(user_id):
+    """The old /sessions query: GROUP BY over every chat row of the user."""
+    return await database.fetch_all(
+        select(legacy_chat.c.chat_session_id, func.min(legacy_chat.c.created_at), func.min(legacy_chat.c.query))
+        .where(legacy_chat.c.user_id == user_id)
+        .group_by(legacy_chat.c.chat_session_id)
+        .order_by(legacy_chat.c.chat_session_id.desc())
+    )
+
+
+async def list_sessions_page(user_id, limit=50):
+    """The /sessions query: one keyset page of summary rows."""
+    return await database.fetch_all(queries.SESSIONS_PAGE, {"user_id": user_id, "limit": limit + 1})
+
+
+async def new_ask(user_id, chat_session_id, warm):
+    if not warm:
+        conversation_memory._sessions.clear()
+    request = TutorRequest(query="q", user_id=user_id, chat_session_id=chat_session_id)
+    resolved_id, _ = await resolve_chat_session(request)
+    saved = await save_chat(resolved_id, user_id, "q", "a")
+    return saved.chat_session_id
+
+
+async def seed(user_id, sessions, turns):
+    """Give the user an existing history on both paths so MAX() scans have work to do."""
+    for _ in range(sessions):
+        session_id = await new_ask(user_id, None, warm=True)
+        await legacy_ask(user_id, session_id)
+        for _ in range(turns - 1):
+            await new_ask(user_id, session_id, warm=True)
+            await legacy_ask(user_id, session_id)
+    return session_id
+
+
+async def measure(counter, requests, call):
+    latencies = []
+    trips = []
+    for _ in range(requests):
+        before = counter.count
+        start = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - start) * 1000)
+        trips.append(counter.count - before)
+    return {
+        "round_trips": float(np.mean(trips)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+async def bench_db(history_sessions, turns, requests, concurrency, output):
+    if not str(settings.DATABASE_URL).startswith("postgresql"):
+        raise SystemExit("bench_db needs a Postgres DATABASE_URL (e.g. the docker-compose db service)")
+    await database.connect()
+    async with database.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(legacy_metadata.create_all)
+
+    counter = RoundTripCounter()
+    user_id = await database.fetch_val(queries.INSERT_USER, {
+        "name": "bench", "email": f"bench-{uuid.uuid4().hex[:8]}@example.com", "password": "x",
+    })
+    try:
+        session_id = await seed(user_id, history_sessions, turns)
+        print(f"Seeded {history_sessions} sessions x {turns} turns for user {user_id}")
+        scenarios = {
+            "before: new session": lambda: legacy_ask(user_id, None),
+            "before: existing session": lambda: legacy_ask(user_id, session_id),
+            "after: new session": lambda: new_ask(user_id, None, warm=False),
+            "after: existing session (cold)": lambda: new_ask(user_id, session_id, warm=False),
+            "after: existing session (warm)": lambda: new_ask(user_id, session_id, warm=True),
+            "before: list sessions": lambda: legacy_list_sessions(user_id),
+            "after: list sessions (page)": lambda: list_sessions_page(user_id),
+        }
+        rows = []
+        for name, call in scenarios.items():
+            row = {"scenario": name, **await measure(counter, requests, call)}
+            rows.append(row)
+            print(f"{name:<32} {row['round_trips']:.1f} round trips  p50={row['p50_ms']:.2f}ms  p99={row['p99_ms']:.2f}ms")
+
+        # Concurrent "new session" requests from one user must not share a session id
+        legacy_ids = await asyncio.gather(*[legacy_ask(user_id, None) for _ in range(concurrency)])
+        new_ids = await asyncio.gather(*[new_ask(user_id, None, warm=True) for _ in range(concurrency)])
+        race = {"requests": concurrency, "before_distinct": len(set(legacy_ids)), "after_distinct": len(set(new_ids))}
+        print(f"{concurrency} concurrent new sessions: {race['before_distinct']} distinct ids before, {race['after_distinct']} after")
+    finally:
+        await database.execute(delete(User).where(User.id == user_id))
+        await database.execute(delete(legacy_chat).where(legacy_chat.c.user_id == user_id))
+        async with database.engine.begin() as conn:
+            await conn.run_sync(legacy_metadata.drop_all)
+        await database.disconnect()
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"history_sessions": history_sessions, "turns": turns, "results": rows, "race": race}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DB round trips and latency of the /tutor write path and session listing, before and after chat_session")
+    parser.add_argument("--history_sessions", type=int, default=200, help="Existing sessions seeded for the bench user")
+    parser.add_argument("--turns", type=int, default=5, help="Chats per seeded session")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent new-session requests in the race check")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+    asyncio.run(bench_db(args.history_sessions, args.turns, args.requests, args.concurrency, args.output))
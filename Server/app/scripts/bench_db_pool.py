@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+import numpy as np
+from sqlalchemy import func, insert, select, update
+from app.core.config import settings
+from app.db import queries
+from app.db.database import Base, Database
+from app.db.models import Chat, ChatSession, User
+
+# Share of each hot query in the mix: the per-request reads of /ask, /sessions and /history, plus saving a turn
+MIX = {"validate_user": 0.4, "sessions_page": 0.2, "history_page": 0.2, "save_turn": 0.2}
+
+
+class PerCallQueries:
+    """The hot queries as the handlers used to run them: a fresh select() per call."""
+
+    def __init__(self, db, writable_ctes):
+        self.db = db
+        self.writable_ctes = writable_ctes
+
+    async def validate_user(self, user_id, session_id):
+        return await self.db.fetch_one(select(User).where(User.id == user_id))
+
+    async def sessions_page(self, user_id, session_id):
+        return await self.db.fetch_all(
+            select(ChatSession).where(ChatSession.user_id == user_id)
+            .order_by(ChatSession.chat_session_id.desc()).limit(21)
+        )
+
+    async def history_page(self, user_id, session_id):
+        return await self.db.fetch_all(
+            select(Chat).where(Chat.user_id == user_id, Chat.chat_session_id == session_id)
+            .order_by(Chat.created_at.desc(), Chat.id.desc()).limit(21)
+        )
+
+    async def save_turn(self, user_id, session_id):
+        async with self.db.transaction():
+            await self.db.execute(
+                update(ChatSession)
+                .where(ChatSession.user_id == user_id, ChatSession.chat_session_id == session_id)
+                .values(turn_count=ChatSession.turn_count + 1, last_activity_at=func.now())
+            )
+            return await self.db.execute(
+                insert(Chat).values(chat_session_id=session_id, user_id=user_id, query="q", answer="a")
+            )
+
+
+class PrebuiltQueries(PerCallQueries):
+    """The same queries through app.db.queries, as the handlers run them now."""
+
+    async def validate_user(self, user_id, session_id):
+        return await self.db.fetch_one(queries.USER_BY_ID, {"user_id": user_id})
+
+    async def sessions_page(self, user_id, session_id):
+        return await self.db.fetch_all(queries.SESSIONS_PAGE, {"user_id": user_id, "limit": 21})
+
+    async def history_page(self, user_id, session_id):
+        return await self.db.fetch_all(queries.HISTORY_PAGE, {"user_id": user_id, "chat_session_id": session_id, "limit": 21})
+
+    async def save_turn(self, user_id, session_id):
+        values = {"b_user_id": user_id, "b_chat_session_id": session_id}
+        if self.writable_ctes:
+            return await self.db.fetch_one(queries.INSERT_CHAT_IN_SESSION, {**values, "b_query": "q", "b_answer": "a"})
+        async with self.db.transaction():
+            await self.db.fetch_val(queries.TOUCH_SESSION, values)
+            return await self.db.fetch_one(queries.INSERT_CHAT, {
+                "chat_session_id": session_id, "user_id": user_id, "query": "q", "answer": "a",
+            })
+
+
+def configurations(postgres, include_legacy):
+    """(name, make database, query style) for each variant compared."""
+    configs = []
+    if include_legacy:
+        try:
+            from databases import Database as LegacyDatabase
+            url = str(settings.DATABASE_URL).replace("+asyncpg", "")
+            configs.append(("databases package, per-call statements", lambda: LegacyDatabase(url), PerCallQueries))
+        except ImportError:
+            print("[⚠️] The databases package is not installed; skipping the legacy baseline")
+    configs += [
+        ("engine, per-call statements", lambda: Database(settings.DATABASE_URL), PerCallQueries),
+        ("engine, prebuilt statements", lambda: Database(settings.DATABASE_URL), PrebuiltQueries),
+        ("engine, prebuilt, no pre-ping", lambda: Database(settings.DATABASE_URL, pool_pre_ping=False), PrebuiltQueries),
+    ]
+    if postgres:
+        configs.append((
+            "engine, prebuilt, no statement cache",
+            lambda: Database(settings.DATABASE_URL, connect_args={"prepared_statement_cache_size": 0}),
+            PrebuiltQueries,
+        ))
+    return configs
+
+
+async def seed(db, sessions, turns):
+    """A user with some history, written through the prebuilt statements."""
+    user_id = await db.fetch_val(queries.INSERT_USER, {
+        "name": "bench", "email": f"bench-{uuid.uuid4().hex[:8]}@example.com", "password": "x",
+    })
+    for session_id in range(1, sessions + 1):
+        await db.execute(queries.INSERT_SESSION, {
+            "user_id": user_id, "chat_session_id": session_id, "first_query": "q", "turn_count": turns,
+        })
+        for _ in range(turns):
+            await db.fetch_one(queries.INSERT_CHAT, {
+                "chat_session_id": session_id, "user_id": user_id, "query": "q", "answer": "a",
+            })
+    await db.execute(update(User).where(User.id == user_id).values(chat_session_count=sessions))
+    return user_id
+
+
+async def run_load(runner, user_id, sessions, requests, concurrency, seed_value):
+    """`requests` queries drawn from MIX, `concurrency` at a time; returns throughput and latency."""
+    rng = random.Random(seed_value)
+    names = rng.choices(list(MIX), weights=list(MIX.values()), k=requests)
+    work = iter(enumerate(names))
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for n, name in work:
+            start = time.perf_counter()
+            try:
+                await getattr(runner, name)(user_id, 1 + n % sessions)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"[❌] {name} failed: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "queries_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2) if latencies else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2) if latencies else None,
+        "errors": errors,
+    }
+
+
+async def bench_db_pool(requests, concurrency_levels, sessions, turns, include_legacy, output):
+    setup = Database(settings.DATABASE_URL)
+    postgres = setup.url.get_backend_name() == "postgresql"
+    if not postgres:
+        print("[⚠️] Not a Postgres DATABASE_URL: pool sizing and statement caching won't apply, numbers are only a smoke test")
+    await setup.connect()
+    async with setup.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    user_id = await seed(setup, sessions, turns)
+
+    rows = []
+    try:
+        for name, make_database, style in configurations(postgres, include_legacy):
+            db = make_database()
+            await db.connect()
+            runner = style(db, postgres)
+            try:
+                await run_load(runner, user_id, sessions, min(requests, 200), max(concurrency_levels), seed_value=0)  # warm up
+                for concurrency in concurrency_levels:
+                    row = {"config": name, "concurrency": concurrency,
+                           **await run_load(runner, user_id, sessions, requests, concurrency, seed_value=concurrency)}
+                    rows.append(row)
+                    print(f"[📊] {name:<40} c={concurrency:<4} {row['queries_per_s']:>8.1f} q/s  "
+                          f"p50={row['p50_ms']}ms  p99={row['p99_ms']}ms  errors={row['errors']}")
+            finally:
+                await db.disconnect()
+    finally:
+        await setup.execute(Chat.__table__.delete().where(Chat.user_id == user_id))
+        await setup.execute(ChatSession.__table__.delete().where(ChatSession.user_id == user_id))
+        await setup.execute(User.__table__.delete().where(User.id == user_id))
+        await setup.disconnect()
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"requests": requests, "mix": MIX, "sessions": sessions, "turns": turns, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hot-query throughput under concurrent load for each database layer configuration")
+    parser.add_argument("--requests", type=int, default=4000, help="Queries per configuration and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--sessions", type=int, default=50, help="Seeded sessions")
+    parser.add_argument("--turns", type=int, default=20, help="Seeded chats per session")
+    parser.add_argument("--no_legacy", action="store_true", help="Skip the databases-package baseline")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+    asyncio.run(bench_db_pool(args.requests, args.concurrency, args.sessions, args.turns, not args.no_legacy, args.output))
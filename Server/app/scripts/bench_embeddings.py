@@ -0,0 +1,115 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+import numpy as np
+from app.AI.embeddings import EMBED_BACKENDS, QueryEmbeddingCache
+
+QUESTIONS = [
+    "What is a list comprehension?",
+    "Difference between list and tuple",
+    "How do I define a function in Python?",
+    "How does a for loop work?",
+    "What is inheritance in classes?",
+    "How do I handle ZeroDivisionError?",
+    "What does the break statement do?",
+    "How do I convert a string to an int?",
+]
+
+# Startup cost in a fresh interpreter: imports plus model load, and the resident memory that leaves behind
+LOAD_COST = """
+import time
+start = time.perf_counter()
+from app.AI.resources import load_embed_model
+model = load_embed_model(backend={backend!r})
+model.encode(["warm up"])
+elapsed = time.perf_counter() - start
+rss = next(int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmRSS"))
+print(elapsed, rss / 1024)
+"""
+
+
+def load_cost(backend):
+    output = subprocess.run([sys.executable, "-c", LOAD_COST.format(backend=backend)],
+                            capture_output=True, text=True, check=True).stdout
+    seconds, rss_mb = output.strip().splitlines()[-1].split()
+    return float(seconds), float(rss_mb)
+
+
+def unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def bench_embeddings(backends, passages, top_k, output):
+    from app.AI.llm import fit_to_index, search_index
+    from app.AI.resources import load_embed_model, resources
+
+    snapshot = resources.snapshot
+    texts = [snapshot.text_chunks[i]["text"] for i in range(min(passages, len(snapshot.text_chunks)))]
+    # Real questions plus the opening sentence of sampled passages, as stand-in queries
+    queries = QUESTIONS + [text.split(". ")[0][:200] for text in texts[::max(1, len(texts) // 64)]]
+
+    models = {backend: load_embed_model(backend=backend) for backend in backends}
+    reference = models.get("torch") or load_embed_model(backend="torch")
+    ref_raw = np.asarray(reference.encode(queries, convert_to_numpy=True), dtype=np.float32)
+    ref_q = unit(ref_raw)
+    _, ref_ids = search_index(fit_to_index(ref_raw, snapshot), top_k, snapshot=snapshot)
+
+    rows = []
+    for backend, model in models.items():
+        model.encode(texts[:8])  # warm up
+        start = time.perf_counter()
+        model.encode(texts, batch_size=64)
+        passages_per_s = len(texts) / (time.perf_counter() - start)
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            model.encode([query])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        raw = np.asarray(model.encode(queries, convert_to_numpy=True), dtype=np.float32)
+        q = unit(raw)
+        _, ids = search_index(fit_to_index(raw, snapshot), top_k, snapshot=snapshot)
+        overlap = np.mean([len(set(a) & set(b)) / top_k for a, b in zip(ids, ref_ids)])
+        load_s, rss_mb = load_cost(backend)
+        row = {
+            "backend": backend,
+            "passages_per_s": round(passages_per_s, 1),
+            "query_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "query_p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            "cosine_vs_fp32": round(float(np.mean(np.sum(q * ref_q, axis=1))), 5),
+            f"overlap_at_{top_k}": round(float(overlap), 4),
+            "load_s": round(load_s, 2),
+            "rss_mb": round(rss_mb, 1),
+        }
+        rows.append(row)
+        print(f"[📊] {backend:<10} {row['passages_per_s']:>8.1f} passages/s  query p50={row['query_p50_ms']:.1f}ms  "
+              f"cos={row['cosine_vs_fp32']:.4f}  overlap@{top_k}={overlap:.1%}  load={load_s:.1f}s  rss={rss_mb:.0f}MB")
+
+    # Repeated questions through the query embedding cache
+    model = models[backends[-1]]
+    cache = QueryEmbeddingCache("bench", max_entries=len(queries))
+    cache.encode(model, queries)
+    start = time.perf_counter()
+    for query in queries:
+        cache.encode(model, [query.upper() + "  "])  # normalization maps these onto the cached keys
+    cached_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"[📊] query embedding cache hit: {cached_ms:.3f}ms per query ({cache.stats()['hit_rate']:.0%} hit rate)")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"passages": len(texts), "queries": len(queries), "top_k": top_k,
+                       "results": rows, "cache_hit_ms": cached_ms}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backend throughput and retrieval drift against the fp32 index")
+    parser.add_argument("--backends", nargs="+", default=list(EMBED_BACKENDS), choices=EMBED_BACKENDS)
+    parser.add_argument("--passages", type=int, default=512, help="Chunks encoded for the throughput measurement")
+    parser.add_argument("--top_k", type=int, default=5, help="Retrieval depth for the overlap check")
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+    bench_embeddings(args.backends, args.passages, args.top_k, args.output)
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import numpy as np
+from app.AI.fake_llm import FakeGenerativeModel
+from app.AI.gateway import CircuitBreaker, LLMGateway, LLMUnavailableError
+
+
+def make_provider(latency, slow_rate, slow_latency, failure_rate, seed):
+    os.environ.update(
+        FAKE_LLM_SLOW_RATE=str(slow_rate), FAKE_LLM_SLOW_LATENCY=str(slow_latency),
+        FAKE_LLM_FAILURE_RATE=str(failure_rate), FAKE_LLM_SEED=str(seed),
+    )
+    return FakeGenerativeModel(latency=latency)
+
+
+async def run_calls(gateway, calls, concurrency):
+    """Issue `calls` generate() calls, `concurrency` at a time; returns (latencies ms, failures)."""
+    latencies = []
+    failures = 0
+    counter = iter(range(calls))
+
+    async def caller():
+        nonlocal failures
+        for _ in counter:
+            start = time.perf_counter()
+            try:
+                await gateway.generate("prompt")
+                latencies.append((time.perf_counter() - start) * 1000)
+            except LLMUnavailableError:
+                failures += 1
+
+    await asyncio.gather(*[caller() for _ in range(concurrency)])
+    return np.array(latencies), failures
+
+
+def report(name, latencies, failures, calls):
+    row = {
+        "mode": name,
+        "ok": len(latencies),
+        "failed": failures,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+    }
+    print(f"[📊] {name:<28} ok={row['ok']}/{calls}  p50={row['p50_ms'] or 0:.0f}ms  p99={row['p99_ms'] or 0:.0f}ms")
+    return row
+
+
+async def bench_gateway(calls, concurrency, latency, slow_rate, slow_latency, failure_rate, hedge_percentile, output):
+    rows = []
+    # Tail latency: a few slow calls, with and without hedging after the chosen percentile
+    for hedge in (0, hedge_percentile):
+        provider = make_provider(latency, slow_rate, slow_latency, 0, seed=1)
+        gateway = LLMGateway(provider, max_concurrency=concurrency * 2, timeout=slow_latency * 2,
+                             hedge_percentile=hedge, hedge_min_samples=20)
+        await run_calls(gateway, 50, concurrency)  # latency history for the hedge delay
+        latencies, failures = await run_calls(gateway, calls, concurrency)
+        rows.append(report(f"slow {slow_rate:.0%}, hedge p{hedge:g}" if hedge else f"slow {slow_rate:.0%}, no hedging",
+                           latencies, failures, calls))
+
+    # Transient errors: retried with backoff instead of surfacing to the user
+    for retries in (0, 2):
+        provider = make_provider(latency, 0, slow_latency, failure_rate, seed=2)
+        gateway = LLMGateway(provider, timeout=10, max_retries=retries, retry_base_delay=0.05,
+                             breaker=CircuitBreaker(threshold=10_000))
+        latencies, failures = await run_calls(gateway, calls, concurrency)
+        rows.append(report(f"{failure_rate:.0%} errors, {retries} retries", latencies, failures, calls))
+
+    # Outage: once the breaker opens, calls fail fast instead of each waiting out its deadline
+    provider = make_provider(latency, 0, slow_latency, 1.0, seed=3)
+    gateway = LLMGateway(provider, timeout=2, max_retries=2, retry_base_delay=0.05, breaker=CircuitBreaker(5, 30))
+    start = time.perf_counter()
+    _, failures = await run_calls(gateway, calls, concurrency)
+    elapsed = time.perf_counter() - start
+    print(f"[📊] full outage: {failures}/{calls} failed in {elapsed:.2f}s (circuit {gateway.breaker.state})")
+    rows.append({"mode": "outage", "failed": failures, "elapsed_s": elapsed, "circuit": gateway.breaker.state})
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM gateway tail latency with hedging, retries and the circuit breaker, against the fake provider")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Typical fake LLM latency (s)")
+    parser.add_argument("--slow_rate", type=float, default=0.03, help="Fraction of calls that are slow")
+    parser.add_argument("--slow_latency", type=float, default=1.0, help="Latency of slow calls (s)")
+    parser.add_argument("--failure_rate", type=float, default=0.1, help="Fraction of calls failing with a transient error")
+    parser.add_argument("--hedge_percentile", type=float, default=95)
+    parser.add_argument("--output", default=None, help="Optional JSON results path")
+    args = parser.parse_args()
+    asyncio.run(bench_gateway(args.calls, args.concurrency, args.latency, args.slow_rate, args.slow_latency,
+                              args.failure_rate, args.hedge_percentile, args.output))
@@ -0,0 +1,48 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Each measurement runs in a fresh interpreter so nothing is already imported or cached
+IMPORT_ONLY = """
+import time
+start = time.perf_counter()
+import app.main
+print(time.perf_counter() - start)
+"""
+
+IMPORT_AND_LOAD = """
+import time
+start = time.perf_counter()
+import app.main
+from app.AI.resources import resources
+resources.load()
+print(time.perf_counter() - start)
+"""
+
+
+def run(snippet, env):
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def bench_startup(repeat):
+    env = {**os.environ, "LLM_PROVIDER": os.getenv("LLM_PROVIDER", "fake")}
+    results = {
+        # Before: importing app.main loaded the model, index and chunks as a side effect
+        "eager_import_and_load_s": min(run(IMPORT_AND_LOAD, {**env, "FAISS_MMAP": "0"}) for _ in range(repeat)),
+        "eager_import_and_load_mmap_s": min(run(IMPORT_AND_LOAD, {**env, "FAISS_MMAP": "1"}) for _ in range(repeat)),
+        # After: importing app.main is cheap; loading happens in the lifespan hook or on first use
+        "lazy_import_s": min(run(IMPORT_ONLY, env) for _ in range(repeat)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare app.main import time with eager vs lazy RAG loading")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+    bench_startup(args.repeat)
@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PDF = os.path.join(APP_DIR, "data", "Python_Programming.pdf")
+DEFAULT_ARTIFACTS = os.path.join(tempfile.gettempdir(), "tutor_bench")
+
+ON_TOPIC = [
+    "What is a list comprehension in Python?",
+    "What is the difference between a list and a tuple?",
+    "How do I define a function with default arguments?",
+    "How does a for loop work?",
+    "What is inheritance in Python classes?",
+    "How do I handle a ZeroDivisionError?",
+    "What does the break statement do?",
+    "How do I read a file line by line?",
+]
+OFF_TOPIC = [
+    "What is the capital of France?",
+    "Can you recommend a good pizza place?",
+    "Who won the football world cup?",
+    "How tall is Mount Everest?",
+]
+
+
+def summarize(latencies):
+    """Latency percentiles in ms from a list of seconds."""
+    ms = np.array(latencies) * 1000
+    return {
+        "n": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def time_each(fn, inputs, rounds, warmup=2):
+    for item in inputs[:warmup]:
+        fn(item)
+    latencies = []
+    for _ in range(rounds):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_artifacts(pdf_path, artifacts_dir, rebuild):
+    """Index the PDF with rag.py into artifacts_dir, unless a previous run already did."""
+    index_path = os.path.join(artifacts_dir, "textbook_index.faiss")
+    if os.path.exists(index_path) and not rebuild:
+        print(f"[♻️] Reusing artifacts in {artifacts_dir} (--rebuild to re-index)")
+        return
+    os.makedirs(artifacts_dir, exist_ok=True)
+    outputs = {
+        "--output_index": index_path,
+        "--output_chunks": os.path.join(artifacts_dir, "text_chunks.bin"),
+        "--output_manifest": os.path.join(artifacts_dir, "manifest.json"),
+        "--output_bm25": os.path.join(artifacts_dir, "bm25_index.npz"),
+        "--output_topics": os.path.join(artifacts_dir, "topic_centroids.npz"),
+    }
+    if rebuild and os.path.exists(outputs["--output_manifest"]):
+        os.remove(outputs["--output_manifest"])  # otherwise rag.py only bumps the version
+    command = [sys.executable, "-m", "app.AI.rag", "--pdf_path", pdf_path]
+    for flag, path in outputs.items():
+        command += [flag, path]
+    print(f"[📐] Indexing {pdf_path} into {artifacts_dir}...")
+    subprocess.run(command, check=True)
+
+
+def bench_micro(pdf_path, rounds):
+    from app.AI import llm
+    from app.AI.rag import build_faiss_index, extract_pdf_paragraph_chunks_with_metadata
+    from app.AI.resources import resources
+
+    results = {}
+    extract_s = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        chunks = extract_pdf_paragraph_chunks_with_metadata(pdf_path)
+        extract_s.append(time.perf_counter() - start)
+    results["extract_pdf_chunks"] = {
+        "chunks": len(chunks),
+        "min_s": round(min(extract_s), 4),
+        "chunks_per_s": round(len(chunks) / min(extract_s), 1),
+    }
+
+    start = time.perf_counter()
+    model = resources.embed_model
+    results["load_embed_model_s"] = round(time.perf_counter() - start, 3)
+    build_s = []
+    for _ in range(max(1, rounds // 2)):
+        start = time.perf_counter()
+        build_faiss_index([dict(chunk) for chunk in chunks], model=model)
+        build_s.append(time.perf_counter() - start)
+    results["build_faiss_index"] = {
+        "chunks": len(chunks),
+        "min_s": round(min(build_s), 4),
+        "chunks_per_s": round(len(chunks) / min(build_s), 1),
+    }
+
+    resources.load()
+    # Both embed the question themselves, as they do when called without q_emb
+    results["retrieve_relevant_context"] = time_each(llm.retrieve_relevant_context, ON_TOPIC, rounds * 5)
+    results["is_python_question"] = time_each(llm.is_python_question, ON_TOPIC + OFF_TOPIC, rounds * 5)
+    for name, row in results.items():
+        print(f"[📊] {name}: {row}")
+    return results
+
+
+async def create_schema():
+    from app.db.database import database
+    from app.db.models import Base
+    async with database.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def run_scenario(client, name, requests, concurrency, make_request):
+    """Issue `requests` calls of make_request(n) with `concurrency` in flight."""
+    latencies = []
+    statuses = {}
+    counter = iter(range(requests))
+
+    async def worker(worker_id):
+        state = {}
+        for n in counter:
+            method, url, kwargs = make_request(n, state)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200 and url == "/tutor/ask":
+                state["chat_session_id"] = response.json()["chat_session_id"]
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    wall = time.perf_counter() - start
+    row = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / wall, 2),
+        **summarize(latencies),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+    print(f"[📊] {name:<16} {row['throughput_rps']:>8.1f} req/s  p50={row['p50_ms']:.1f}ms  "
+          f"p99={row['p99_ms']:.1f}ms  errors={row['errors']}")
+    return row
+
+
+async def bench_load(requests, concurrency, turns_per_session, base_url):
+    import httpx
+    from app.AI.resources import resources
+    from app.db.database import database
+
+    in_process = base_url is None
+    if in_process:
+        from app.main import app
+        await database.connect()
+        await create_schema()
+        resources.load()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+    else:
+        client = httpx.AsyncClient(base_url=base_url, timeout=120)
+
+    try:
+        credentials = {"email": f"bench-{uuid.uuid4().hex[:8]}@example.com", "password": "correct horse"}
+        response = await client.post("/auth/register", json={"name": "bench", **credentials})
+        response.raise_for_status()
+        user_id = response.json()["id"]
+
+        def ask(n, state):
+            # Each worker continues its session for a few turns, then starts a new one
+            payload = {"query": ON_TOPIC[n % len(ON_TOPIC)], "user_id": user_id}
+            if state.get("chat_session_id") and n % turns_per_session:
+                payload["chat_session_id"] = state["chat_session_id"]
+            return "POST", "/tutor/ask", {"json": payload}
+
+        def off_topic(n, state):
+            return "POST", "/tutor/ask", {"json": {"query": OFF_TOPIC[n % len(OFF_TOPIC)], "user_id": user_id}}
+
+        def sessions(n, state):
+            return "GET", f"/tutor/sessions/{user_id}", {"params": {"limit": 20}}
+
+        def history(n, state):
+            return "GET", f"/tutor/history/{user_id}/1", {"params": {"limit": 20}}
+
+        scenarios = {"ask": ask, "ask_off_topic": off_topic, "list_sessions": sessions, "history": history}
+        return {
+            name: await run_scenario(client, name, requests, concurrency, make_request)
+            for name, make_request in scenarios.items()
+        }
+    finally:
+        await client.aclose()
+        if in_process:
+            await database.disconnect()
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline, current, tolerance):
+    """Regressions beyond tolerance in throughput (higher is better) and p99/min times (lower is better)."""
+    old, new = flatten(baseline), flatten(current)
+    regressions = []
+    for key, before in old.items():
+        after = new.get(key)
+        if after is None or not before:
+            continue
+        change = (after - before) / before
+        if key.endswith(("throughput_rps", "chunks_per_s")) and change < -tolerance:
+            regressions.append((key, before, after, change))
+        elif key.endswith(("p99_ms", "min_s")) and change > tolerance:
+            regressions.append((key, before, after, change))
+    for key, before, after, change in regressions:
+        print(f"[⚠️] {key}: {before} -> {after} ({change:+.0%})")
+    if not regressions:
+        print(f"[✅] No regressions beyond {tolerance:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline micro benchmarks and HTTP load test with a fake LLM; results as JSON")
+    parser.add_argument("--suite", choices=["micro", "load", "all"], default="all")
+    parser.add_argument("--pdf_path", default=DEFAULT_PDF, help="PDF to extract, index and retrieve from")
+    parser.add_argument("--artifacts_dir", default=DEFAULT_ARTIFACTS, help="Where the bench index is built (and reused)")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index even if artifacts exist")
+    parser.add_argument("--rounds", type=int, default=3, help="Repetitions of each micro benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per load scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients per load scenario")
+    parser.add_argument("--turns_per_session", type=int, default=4, help="Turns per chat session in the ask scenario")
+    parser.add_argument("--llm_latency", type=float, default=0.2, help="Fake Gemini latency in seconds")
+    parser.add_argument("--llm_failure_rate", type=float, default=0.0, help="Fraction of fake Gemini calls failing with a transient error")
+    parser.add_argument("--llm_slow_rate", type=float, default=0.0, help="Fraction of fake Gemini calls taking --llm_slow_latency")
+    parser.add_argument("--llm_slow_latency", type=float, default=2.0, help="Latency of slow fake Gemini calls in seconds")
+    parser.add_argument("--answer_cache", action="store_true", help="Keep the semantic answer cache on (off by default so every ask reaches the LLM)")
+    parser.add_argument("--query_embed_cache", action="store_true", help="Keep the query embedding cache on (off by default so repeated questions are still encoded)")
+    parser.add_argument("--base_url", default=None, help="Load-test a running server instead of app.main:app in process")
+    parser.add_argument("--output", default=None, help="JSON results path")
+    parser.add_argument("--compare", default=None, help="Baseline JSON from an earlier commit to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression before --compare fails")
+    args = parser.parse_args()
+
+    # Must be set before app modules are imported
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["FAKE_LLM_FAILURE_RATE"] = str(args.llm_failure_rate)
+    os.environ["FAKE_LLM_SLOW_RATE"] = str(args.llm_slow_rate)
+    os.environ["FAKE_LLM_SLOW_LATENCY"] = str(args.llm_slow_latency)
+    os.environ["OUTPUT_DIR"] = args.artifacts_dir
+    if not args.answer_cache:
+        os.environ["SEMANTIC_CACHE_BACKEND"] = "off"
+    if not args.query_embed_cache:
+        os.environ["QUERY_EMBED_CACHE"] = "off"
+    # Without a configured database, a local SQLite file stands in for Postgres
+    os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(args.artifacts_dir, 'bench.db')}")
+
+    build_artifacts(args.pdf_path, args.artifacts_dir, args.rebuild)
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "database": os.environ["DATABASE_URL"].split("://", 1)[0],
+    }
+    if args.suite in ("micro", "all"):
+        results["micro"] = bench_micro(args.pdf_path, args.rounds)
+    if args.suite in ("load", "all"):
+        results["load"] = asyncio.run(bench_load(args.requests, args.concurrency, args.turns_per_session, args.base_url))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[💾] Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import time
+from collections import Counter, defaultdict
+import numpy as np
+from app.AI.embeddings import normalize_query
+from app.db.export import EXPORT_BATCH_SIZE, iter_export_records
+
+# Unanswered questions kept per topic as examples
+EXAMPLES_PER_TOPIC = 5
+
+
+def retrieve_pages(snapshot, queries, raw_emb, top_k):
+    """(doc_id, page) per retrieved chunk for each query, as /tutor/ask would retrieve them.
+
+    One batched search, then fusion per query. Follow-ups are retrieved on their own
+    text here, without the earlier question they were asked with.
+    """
+    from app.AI.llm import candidate_count, fit_to_index, search_index, select_chunks
+    D, I = search_index(fit_to_index(raw_emb, snapshot), candidate_count(top_k, snapshot), snapshot=snapshot)
+    results = []
+    for row, query in enumerate(queries):
+        chunks = [snapshot.text_chunks[i] for i in select_chunks(snapshot, query, D[row:row + 1], I[row:row + 1], top_k)]
+        results.append([(chunk["doc_id"], chunk["page"]) for chunk in chunks])
+    return results
+
+
+def stored_pages(retrieval):
+    """(doc_id, page) per chunk from a chat's saved provenance: exactly what its answer was given."""
+    doc_ids = retrieval.get("doc_ids") or [""] * len(retrieval["pages"])
+    return list(zip(doc_ids, retrieval["pages"]))
+
+
+def analyse(path, batch_size, top_k, hot_questions):
+    """Per-page, per-topic and per-question hit counts over an export from export_chats.py.
+
+    Chats saved with retrieval provenance use their stored pages; older ones (and
+    answers that needed no retrieval) are retrieved again against the current index.
+    """
+    from app.AI.resources import resources
+    snapshot = resources.snapshot
+    classifier = resources.topic_classifier
+
+    pages = Counter()
+    topics = Counter()
+    unanswered = Counter()
+    examples = defaultdict(list)
+    questions = Counter()
+    chats = 0
+    retrieved = 0
+    start = time.perf_counter()
+    for batch in iter_export_records(path, batch_size):
+        queries = [record["query"] for record in batch]
+        raw_emb = np.asarray(resources.embed_model.encode(queries, batch_size=len(queries), convert_to_numpy=True), dtype=np.float32)
+        hits = [stored_pages(record["retrieval"]) if record.get("retrieval") else None for record in batch]
+        missing = [row for row, pages_hit in enumerate(hits) if pages_hit is None]
+        if missing:
+            fresh = retrieve_pages(snapshot, [queries[row] for row in missing], raw_emb[missing], top_k)
+            for row, pages_hit in zip(missing, fresh):
+                hits[row] = pages_hit
+            retrieved += len(missing)
+        for query, pages_hit, q_emb in zip(queries, hits, raw_emb):
+            topic, _ = classifier.classify(q_emb)
+            topics[topic] += 1
+            questions[normalize_query(query)] += 1
+            if not pages_hit:
+                # Nothing in the textbook was close enough to ground an answer
+                unanswered[topic] += 1
+                if len(examples[topic]) < EXAMPLES_PER_TOPIC:
+                    examples[topic].append(query)
+            for doc_page in pages_hit:
+                pages[doc_page] += 1
+        chats += len(batch)
+        print(f"[⏳] {chats} chats analysed ({chats / (time.perf_counter() - start):.0f}/s)", end="\r")
+    print()
+
+    return {
+        "chats": chats,
+        "retrieved_offline": retrieved,
+        "index_version": snapshot.version,
+        "top_k": top_k,
+        "pages": [{"doc_id": doc_id, "page": page, "hits": hits} for (doc_id, page), hits in pages.most_common()],
+        "topics": [
+            {"topic": topic, "questions": count, "unanswered": unanswered[topic], "unanswered_examples": examples[topic]}
+            for topic, count in topics.most_common()
+        ],
+        "hot_questions": [{"query": query, "count": count} for query, count in questions.most_common(hot_questions)],
+    }
+
+
+def warm_answer_cache(hot, limit):
+    """Answer the most frequent questions now, so the semantic answer cache serves them later."""
+    from app.AI.llm import answer_cache, get_tutor_reply_with_rag
+    warmed = 0
+    for entry in hot[:limit]:
+        try:
+            get_tutor_reply_with_rag(entry["query"])
+            warmed += 1
+        except Exception as e:
+            print(f"[⚠️] Could not warm {entry['query']!r}: {e}")
+    print(f"[✅] Warmed the answer cache with {warmed} questions ({answer_cache.stats()})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Page, topic and question hit counts from a chat export, computed offline")
+    parser.add_argument("--input", required=True, help="Export written by export_chats.py (.jsonl.gz or .parquet)")
+    parser.add_argument("--output", default=None, help="JSON report path (default: print a summary only)")
+    parser.add_argument("--batch_size", type=int, default=EXPORT_BATCH_SIZE, help="Questions embedded and searched per batch")
+    parser.add_argument("--top_k", type=int, default=None, help="Chunks per question (default: RETRIEVAL_TOP_K)")
+    parser.add_argument("--hot_questions", type=int, default=100, help="Most frequent questions to report")
+    parser.add_argument("--warm", type=int, default=0,
+                        help="Answer this many hot questions into the answer cache (use with SEMANTIC_CACHE_BACKEND=sqlite)")
+    args = parser.parse_args()
+
+    from app.AI.llm import RETRIEVAL_TOP_K
+    report = analyse(args.input, args.batch_size, args.top_k or RETRIEVAL_TOP_K, args.hot_questions)
+    print(f"[📊] {report['chats']} chats; top pages: "
+          + ", ".join(f"{p['doc_id']} p.{p['page']} ({p['hits']})" for p in report["pages"][:5]))
+    print("[📊] topics: " + ", ".join(f"{t['topic']} {t['questions']} ({t['unanswered']} unanswered)" for t in report["topics"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.warm:
+        warm_answer_cache(report["hot_questions"], args.warm)
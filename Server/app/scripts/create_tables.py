@@ -1,15 +1,14 @@
 import asyncio
-from sqlalchemy.ext.asyncio import create_async_engine
+from app.db.database import database
 from app.db.models import Base
-from app.core.config import settings
 
 async def create_tables():
-    engine = create_async_engine(str(settings.DATABASE_URL), echo=True)
+    await database.connect()
 
-    async with engine.begin() as conn:
+    async with database.engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
-    await engine.dispose()
+    await database.disconnect()
     print("[✅] All tables created successfully.")
 
 if __name__ == "__main__":
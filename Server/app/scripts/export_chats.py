@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+from app.db.database import Database
+from app.db.export import EXPORT_BATCH_SIZE, EXPORT_FORMATS, export_query, iter_chat_batches, write_export
+from app.core.config import settings
+
+
+async def export_chats(output, fmt, database_url, batch_size, after_id, since, until, include_answers):
+    # A read replica keeps the export's long-running cursor off the primary
+    db = Database(database_url)
+    await db.connect()
+    start = time.perf_counter()
+    try:
+        query = export_query(after_id, since, until, include_answers)
+        rows, last_id = await write_export(output, iter_chat_batches(db, query, batch_size), fmt)
+    finally:
+        await db.disconnect()
+    elapsed = time.perf_counter() - start
+    print(f"[✅] Exported {rows} chats to {output} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s, "
+          f"{os.path.getsize(output) / 1e6:.1f} MB); resume with --after_id {last_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the chat table to gzip JSONL or Parquet in constant memory")
+    parser.add_argument("--output", required=True, help="Output path (.jsonl.gz or .parquet)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=None, help="Default: from the output extension")
+    parser.add_argument("--database_url", default=os.getenv("EXPORT_DATABASE_URL", settings.DATABASE_URL),
+                        help="Database to read from, e.g. a read replica (default: EXPORT_DATABASE_URL, then DATABASE_URL)")
+    parser.add_argument("--batch_size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--after_id", type=int, default=None, help="Only chats with a larger id, to resume or export incrementally")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="Only chats created at or after this ISO time")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None, help="Only chats created before this ISO time")
+    parser.add_argument("--no_answers", action="store_true", help="Leave out answer text")
+    args = parser.parse_args()
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    asyncio.run(export_chats(args.output, fmt, args.database_url, args.batch_size, args.after_id,
+                             args.since, args.until, not args.no_answers))
@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import time
+from app.AI.embeddings import ONNX_MODEL_FILES, onnx_model_dir
+from app.AI.resources import EMBED_MODEL_NAME, OUTPUT_DIR
+
+
+def export_onnx(model_name, output_dir, opset):
+    """Export the SentenceTransformer's transformer to ONNX, plus an int8 dynamically quantized copy."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs))).last_hidden_state
+
+    fp32_path = os.path.join(output_dir, ONNX_MODEL_FILES["onnx"])
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in [*input_names, "last_hidden_state"]}
+    start = time.perf_counter()
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStates(), tuple(sample[name] for name in input_names), fp32_path,
+            input_names=input_names, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes, opset_version=opset,
+        )
+    print(f"[✅] Exported {fp32_path} in {time.perf_counter() - start:.1f}s")
+
+    int8_path = os.path.join(output_dir, ONNX_MODEL_FILES["onnx-int8"])
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"[✅] Quantized weights to int8: {int8_path}")
+
+    # Pooling and normalization happen outside the graph, exactly as the SentenceTransformer pipeline does them
+    pooling = model[1]
+    config = {
+        "model": model_name,
+        "dim": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "pad_token_id": tokenizer.pad_token_id,
+        "pooling": "cls" if pooling.pooling_mode_cls_token else "mean",
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+    }
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, "tokenizer.json"))
+    with open(os.path.join(output_dir, "embedder.json"), "w") as f:
+        json.dump(config, f, indent=2)
+    for name in ONNX_MODEL_FILES.values():
+        print(f"    {name}: {os.path.getsize(os.path.join(output_dir, name)) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model for EMBED_BACKEND=onnx / onnx-int8")
+    parser.add_argument("--embed_model", default=EMBED_MODEL_NAME, help="SentenceTransformer model name")
+    parser.add_argument("--output_dir", default=None, help="Export directory (default: <OUTPUT_DIR>/onnx/<model>)")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset version")
+    args = parser.parse_args()
+    export_onnx(args.embed_model, args.output_dir or onnx_model_dir(OUTPUT_DIR, args.embed_model), args.opset)
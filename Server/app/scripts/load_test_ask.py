@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+# Must be set before app.AI.llm is imported
+os.environ.setdefault("LLM_PROVIDER", "fake")
+
+import httpx
+from app.main import app
+from app.db.database import database
+
+
+async def timed(client, method, url, **kwargs):
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def timed_stream(client, url, **kwargs):
+    """Return (time to first token, total time) for an SSE request."""
+    start = time.perf_counter()
+    first_token = None
+    async with client.stream("POST", url, **kwargs) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if first_token is None and line.startswith("data:"):
+                first_token = time.perf_counter() - start
+    return first_token, time.perf_counter() - start
+
+
+async def run_stream_test(concurrency, user_id, base_url):
+    # httpx.ASGITransport buffers whole responses, so TTFB needs a real server
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        payload = {"query": "What is a list comprehension in Python?", "user_id": user_id}
+        results = await asyncio.gather(*[
+            timed_stream(client, "/tutor/ask/stream", json=payload) for _ in range(concurrency)
+        ])
+
+    ttfb = [first for first, _ in results]
+    total = [full for _, full in results]
+    print(f"[📊] {concurrency} concurrent /tutor/ask/stream calls")
+    print(f"     p50 time to first token: {statistics.median(ttfb) * 1000:.0f} ms")
+    print(f"     p50 full answer:         {statistics.median(total) * 1000:.0f} ms")
+
+
+async def run_load_test(concurrency, user_id):
+    await database.connect()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+            payload = {"query": "What is a list comprehension in Python?", "user_id": user_id}
+            start = time.perf_counter()
+            ask_tasks = [
+                asyncio.create_task(timed(client, "POST", "/tutor/ask", json=payload))
+                for _ in range(concurrency)
+            ]
+            # A cheap request issued while the /ask burst is in flight should not queue behind it
+            await asyncio.sleep(0.05)
+            probe_latency = await timed(client, "GET", f"/tutor/sessions/{user_id}")
+            ask_latencies = await asyncio.gather(*ask_tasks)
+            wall = time.perf_counter() - start
+    finally:
+        await database.disconnect()
+
+    serial = sum(ask_latencies)
+    print(f"[📊] {concurrency} concurrent /tutor/ask calls (fake LLM latency {os.getenv('FAKE_LLM_LATENCY', '1.0')}s)")
+    print(f"     wall time:        {wall:.2f}s")
+    print(f"     sum of latencies: {serial:.2f}s")
+    print(f"     overlap factor:   {serial / wall:.1f}x")
+    print(f"     p50 / max /ask:   {statistics.median(ask_latencies):.2f}s / {max(ask_latencies):.2f}s")
+    print(f"     /sessions probe during burst: {probe_latency * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent /tutor/ask load test against a stubbed LLM")
+    parser.add_argument("--concurrency", type=int, default=32, help="Number of simultaneous /ask requests")
+    parser.add_argument("--user_id", type=int, default=1, help="Existing user id to ask as")
+    parser.add_argument("--stream", action="store_true", help="Measure time-to-first-token on /tutor/ask/stream")
+    parser.add_argument("--base_url", default="http://localhost:8000", help="Running server (started with LLM_PROVIDER=fake) for --stream")
+    args = parser.parse_args()
+    if args.stream:
+        asyncio.run(run_stream_test(args.concurrency, args.user_id, args.base_url))
+    else:
+        asyncio.run(run_load_test(args.concurrency, args.user_id))
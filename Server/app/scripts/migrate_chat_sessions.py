@@ -0,0 +1,65 @@
+import asyncio
+from sqlalchemy import text
+from app.db.database import database
+from app.db.models import Base
+
+# Idempotent: safe to run on every deploy after create_tables.py
+STATEMENTS = [
+    'ALTER TABLE "user" ADD COLUMN IF NOT EXISTS chat_session_count INTEGER NOT NULL DEFAULT 0',
+    # One row per existing session, dated by its first chat
+    """
+    INSERT INTO chat_session (user_id, chat_session_id, created_at)
+    SELECT user_id, chat_session_id, min(created_at) FROM chat GROUP BY user_id, chat_session_id
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    UPDATE "user" u SET chat_session_count = s.max_id
+    FROM (SELECT user_id, max(chat_session_id) AS max_id FROM chat_session GROUP BY user_id) s
+    WHERE s.user_id = u.id AND u.chat_session_count < s.max_id
+    """,
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'chat_user_id_chat_session_id_fkey') THEN
+            ALTER TABLE chat ADD CONSTRAINT chat_user_id_chat_session_id_fkey
+                FOREIGN KEY (user_id, chat_session_id) REFERENCES chat_session (user_id, chat_session_id) ON DELETE CASCADE;
+        END IF;
+    END $$
+    """,
+    # Session summary columns, backfilled for sessions that predate them
+    "ALTER TABLE chat_session ADD COLUMN IF NOT EXISTS first_query VARCHAR NOT NULL DEFAULT ''",
+    "ALTER TABLE chat_session ADD COLUMN IF NOT EXISTS last_activity_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()",
+    "ALTER TABLE chat_session ADD COLUMN IF NOT EXISTS turn_count INTEGER NOT NULL DEFAULT 0",
+    """
+    UPDATE chat_session s SET first_query = f.query, last_activity_at = t.last_activity_at, turn_count = t.turn_count
+    FROM (
+        SELECT DISTINCT ON (user_id, chat_session_id) user_id, chat_session_id, query
+        FROM chat ORDER BY user_id, chat_session_id, created_at, id
+    ) f, (
+        SELECT user_id, chat_session_id, max(created_at) AS last_activity_at, count(*) AS turn_count
+        FROM chat GROUP BY user_id, chat_session_id
+    ) t
+    WHERE s.turn_count = 0
+        AND f.user_id = s.user_id AND f.chat_session_id = s.chat_session_id
+        AND t.user_id = s.user_id AND t.chat_session_id = s.chat_session_id
+    """,
+    "DROP INDEX IF EXISTS ix_chat_user_session_id",
+    "CREATE INDEX IF NOT EXISTS ix_chat_user_session_created ON chat (user_id, chat_session_id, created_at)",
+    # Retrieval provenance per answer; older chats keep NULL
+    "ALTER TABLE chat ADD COLUMN IF NOT EXISTS retrieval JSONB",
+]
+
+
+async def migrate():
+    await database.connect()
+
+    async with database.engine.begin() as conn:
+        # Creates chat_session if it is missing; existing tables are left alone
+        await conn.run_sync(Base.metadata.create_all)
+        for statement in STATEMENTS:
+            await conn.execute(text(statement))
+
+    await database.disconnect()
+    print("[✅] Chat sessions migrated successfully.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
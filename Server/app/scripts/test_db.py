@@ -1,29 +1,28 @@
 import asyncio
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import select
-from app.db.models import User, Chat, Base
-from app.core.config import settings
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.db.models import User, Chat, ChatSession, Base
+from app.db.database import database
+from app.core.security import pwd_context
 
 async def insert_test_data():
-    engine = create_async_engine(str(settings.DATABASE_URL), echo=True)
-    AsyncSessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await database.connect()
+    AsyncSessionLocal = sessionmaker(bind=database.engine, class_=AsyncSession, expire_on_commit=False)
 
     try:
-        async with engine.begin() as conn:
+        async with database.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
 
         async with AsyncSessionLocal() as session:
             # 1️⃣ Create user
             hashed_password = pwd_context.hash("1234")
-            user = User(name="Ancy", email="ancy@example.com", password=hashed_password)
+            user = User(name="Ancy", email="ancy@example.com", password=hashed_password, chat_session_count=1)
             session.add(user)
             await session.flush()  # so user.id is available
 
             # 2️⃣ Create chat session (example: session_id = 1)
+            session.add(ChatSession(user_id=user.id, chat_session_id=1, first_query="Hello chatbot!", turn_count=2))
             chat1 = Chat(
                 chat_session_id=1,
                 user_id=user.id,
@@ -49,7 +48,7 @@ async def insert_test_data():
         print(f"[❌] Error: {e}")
         await session.rollback()
     finally:
-        await engine.dispose()
+        await database.disconnect()
 
 if __name__ == "__main__":
     asyncio.run(insert_test_data())
@@ -0,0 +1,31 @@
+import asyncio
+import os
+import sys
+import pytest
+
+# Run from anywhere, offline: the app package is importable and no real model or database is needed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("PRELOAD_RAG", "0")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+
+@pytest.fixture
+def app_session(monkeypatch, tmp_path):
+    """Run `await test(client)` against the app, on a throwaway SQLite database."""
+    import httpx
+    from app.db.database import Base, database
+    from app.main import app
+    monkeypatch.setattr(database, "url", database.url.set(database=str(tmp_path / "app.db")))
+
+    async def session(test):
+        await database.connect()
+        try:
+            async with database.engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await test(client)
+        finally:
+            await database.disconnect()
+
+    return lambda test: asyncio.run(session(test))
@@ -0,0 +1,72 @@
+import asyncio
+import gzip
+import json
+import pytest
+from app.core.config import settings
+from app.db import queries
+
+PROVENANCE = {"index_version": 1, "chunk_ids": [7], "scores": [0.8], "pages": [3], "doc_ids": [""], "search_query": None}
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    return {"Authorization": "Bearer s3cret"}
+
+
+def test_admin_endpoints_are_disabled_without_a_token(app_session, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+
+    async def test(client):
+        return [(await client.get("/admin/export/chats", headers={"Authorization": "Bearer x"})).status_code,
+                (await client.post("/admin/reload-index")).status_code]
+
+    assert app_session(test) == [403, 403]
+
+
+def test_admin_endpoints_need_the_token(app_session, admin_token):
+    async def test(client):
+        return [(await client.get("/admin/export/chats")).status_code,
+                (await client.get("/admin/export/chats", headers={"Authorization": "Bearer wrong"})).status_code]
+
+    assert app_session(test) == [401, 401]
+
+
+def test_export_streams_every_chat(app_session, admin_token):
+    from app.api.tutor import save_chat
+    from app.db.database import database
+
+    async def test(client):
+        user_id = await database.fetch_val(queries.INSERT_USER, {"name": "s", "email": "s@example.com", "password": "x"})
+        await save_chat(None, user_id, "old question", "a")
+        await save_chat(None, user_id, "new question", "a", PROVENANCE)
+        response = await client.get("/admin/export/chats", headers=admin_token)
+        return [json.loads(line) for line in gzip.decompress(response.content).decode().splitlines()]
+
+    records = app_session(test)
+    assert [r["query"] for r in records] == ["old question", "new question"]
+    assert [r["retrieval"] for r in records] == [None, PROVENANCE]
+
+
+def test_an_unsent_export_does_not_keep_its_slot(app_session, admin_token):
+    from app.api import admin
+
+    async def test(client):
+        response = await admin.export_chats()  # the client went away before the body started
+        del response
+        return admin.export_slots.locked()
+
+    assert app_session(test) is False
+
+
+def test_parquet_export_takes_provenance_after_null_batches(tmp_path):
+    from app.db.export import iter_export_records, write_export
+
+    async def batches():
+        yield [{"id": 1, "query": "q", "created_at": "2024-01-01T00:00:00", "retrieval": None}]
+        yield [{"id": 2, "query": "q", "created_at": "2024-01-02T00:00:00", "retrieval": {"pages": [3]}}]
+
+    path = str(tmp_path / "chats.parquet")
+    assert asyncio.run(write_export(path, batches(), "parquet")) == (2, 2)
+    records = [record for batch in iter_export_records(path) for record in batch]
+    assert [r["retrieval"] for r in records] == [None, {"pages": [3]}]
@@ -0,0 +1,50 @@
+import pytest
+from app.core import security
+from app.core.security import SlidingWindowLimiter
+
+
+def test_limiter_blocks_after_the_limit_until_reset():
+    limiter = SlidingWindowLimiter(limit=2, window=60)
+    limiter.hit("a")
+    assert limiter.retry_after("a") == 0
+    limiter.hit("a")
+    assert limiter.retry_after("a") > 0
+    assert limiter.retry_after("b") == 0
+    limiter.reset("a")
+    assert limiter.retry_after("a") == 0
+
+
+@pytest.fixture
+def client(app_session, monkeypatch):
+    """The app with fresh limiters and cheap bcrypt."""
+    from app.api import auth
+    monkeypatch.setattr(auth, "login_failure_limiter", SlidingWindowLimiter(3, 60))
+    monkeypatch.setattr(auth, "login_ip_limiter", SlidingWindowLimiter(10, 60))
+    monkeypatch.setattr(security.password_hasher, "context", security.pwd_context.copy(bcrypt__rounds=4))
+    return app_session
+
+
+def test_a_classroom_behind_one_address_can_log_in(client):
+    async def test(c):
+        statuses = []
+        for n in range(20):
+            credentials = {"email": f"student{n}@example.com", "password": "pw123456"}
+            await c.post("/auth/register", json={"name": f"s{n}", **credentials})
+            statuses.append((await c.post("/auth/login", json=credentials)).status_code)
+        return statuses
+
+    assert set(client(test)) == {200}
+
+
+def test_repeated_failures_lock_out_that_email_only(client):
+    async def test(c):
+        for name in ("victim", "other"):
+            await c.post("/auth/register", json={"name": name, "email": f"{name}@example.com", "password": "pw123456"})
+        wrong = [(await c.post("/auth/login", json={"email": "victim@example.com", "password": "nope"})).status_code
+                 for _ in range(4)]
+        other = await c.post("/auth/login", json={"email": "other@example.com", "password": "pw123456"})
+        return wrong, other.status_code
+
+    wrong, other = client(test)
+    assert wrong == [401, 401, 401, 429]
+    assert other == 200
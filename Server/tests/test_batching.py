@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.AI.batching import MicroBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_results_are_returned_to_their_callers():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], ThreadPoolExecutor(2), max_wait=0.01)
+
+    async def main():
+        return await asyncio.gather(*[batcher.submit(n) for n in range(10)])
+
+    assert run(main()) == [n * 2 for n in range(10)]
+    assert batcher.stats()["items"] == 10
+
+
+def test_next_batch_is_collected_while_one_runs():
+    started = threading.Event()
+    sizes = []
+
+    def slow(items):
+        sizes.append(len(items))
+        started.set()
+        time.sleep(0.1)
+        return items
+
+    batcher = MicroBatcher(slow, ThreadPoolExecutor(2), max_batch=32, max_wait=0.001)
+
+    async def main():
+        first = asyncio.ensure_future(batcher.submit(0))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        # Arrive one by one while the first batch runs: they should all share the next batch
+        rest = []
+        for n in range(1, 9):
+            rest.append(asyncio.ensure_future(batcher.submit(n)))
+            await asyncio.sleep(0.005)
+        return await asyncio.gather(first, *rest)
+
+    assert run(main()) == list(range(9))
+    assert sizes == [1, 8]
+
+
+def test_a_failed_batch_fails_its_callers_only():
+    def flaky(items):
+        if "bad" in items:
+            raise RuntimeError("boom")
+        return items
+
+    batcher = MicroBatcher(flaky, ThreadPoolExecutor(1), max_wait=0)
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await batcher.submit("bad")
+        return await batcher.submit("good")
+
+    assert run(main()) == "good"
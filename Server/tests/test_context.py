@@ -0,0 +1,42 @@
+from app.AI.context import assemble_context, merge_adjacent, trim_to_budget
+
+
+def ranked(*chunks):
+    return [{**chunk, "rank": rank} for rank, chunk in enumerate(chunks)]
+
+
+def test_consecutive_blocks_of_a_page_are_merged():
+    passages = merge_adjacent(ranked(
+        {"id": 11, "text": "second", "page": 2},
+        {"id": 10, "text": "first", "page": 2},
+        {"id": 12, "text": "other page", "page": 3},
+    ))
+    assert [p["text"] for p in passages] == ["first\nsecond", "other page"]
+    assert passages[0]["rank"] == 0
+
+
+def test_legacy_chunks_without_ids_are_kept_unmerged():
+    passages = merge_adjacent(ranked(
+        {"text": "while loops", "page": 4},
+        {"text": "for loops", "page": 4},
+    ))
+    assert [p["text"] for p in passages] == ["while loops", "for loops"]
+
+
+def test_context_stays_within_the_token_budget():
+    long_text = " ".join(f"Sentence number {n} about loops." for n in range(200))
+    context, stats = assemble_context([{"id": 1, "text": long_text, "page": 1}], token_budget=50)
+    assert context.startswith("[Page 1]\nSentence number 0")
+    assert stats["tokens"] <= 50
+
+
+def test_duplicate_chunks_are_dropped():
+    context, stats = assemble_context([
+        {"id": 1, "text": "A for loop repeats.", "page": 1},
+        {"id": 7, "text": "a for  loop repeats.", "page": 5},
+    ], token_budget=100)
+    assert stats["passages"] == 1
+
+
+def test_trim_keeps_whole_sentences():
+    assert trim_to_budget("One. Two words here. Three.", 4) == "One."
@@ -0,0 +1,38 @@
+import numpy as np
+from app.AI.embeddings import QueryEmbeddingCache
+
+
+class CountingModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, convert_to_numpy=True, batch_size=32):
+        self.encoded.extend(texts)
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_repeated_queries_skip_the_model():
+    model = CountingModel()
+    cache = QueryEmbeddingCache("test")
+    first = cache.encode(model, ["What is a loop?", "What is a class?"])
+    again = cache.encode(model, ["what is a  LOOP?"])
+    assert model.encoded == ["What is a loop?", "What is a class?"]
+    np.testing.assert_array_equal(again[0], first[0])
+
+
+def test_persisted_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = QueryEmbeddingCache("test", path=path, commit_every=1000)
+    cache.encode(CountingModel(), ["What is a loop?"])
+    cache.flush()
+    model = CountingModel()
+    QueryEmbeddingCache("test", path=path).encode(model, ["What is a loop?"])
+    assert model.encoded == []
+
+
+def test_namespaces_do_not_share_entries(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    QueryEmbeddingCache("torch:model", path=path, commit_every=1).encode(CountingModel(), ["What is a loop?"])
+    model = CountingModel()
+    QueryEmbeddingCache("onnx:model", path=path).encode(model, ["What is a loop?"])
+    assert model.encoded == ["What is a loop?"]
@@ -0,0 +1,130 @@
+import asyncio
+import pytest
+from app.AI.fake_llm import FakeResponse, ServiceUnavailable
+from app.AI.gateway import CircuitBreaker, LLMGateway, LLMUnavailableError
+
+
+class ScriptedProvider:
+    """Answers after `latency` seconds, failing the calls whose number is in `fail_calls`."""
+
+    def __init__(self, latency=0.0, fail_calls=(), latencies=None):
+        self.latency = latency
+        self.fail_calls = set(fail_calls)
+        self.latencies = latencies or {}
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(self.latencies.get(call, self.latency))
+        if call in self.fail_calls:
+            raise ServiceUnavailable("503")
+        return FakeResponse(f"answer {call}")
+
+
+def gateway(provider, **options):
+    options.setdefault("breaker", CircuitBreaker(threshold=2, cooldown=0.1))
+    return LLMGateway(provider, max_retries=0, hedge_percentile=0, **options)
+
+
+async def open_circuit(llm):
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            await llm.generate("q")
+    assert llm.breaker.state == "open"
+    await asyncio.sleep(0.15)
+    assert llm.breaker.state == "half_open"
+
+
+def test_circuit_opens_and_a_successful_probe_closes_it():
+    async def main():
+        llm = gateway(ScriptedProvider(fail_calls={1, 2}))
+        await open_circuit(llm)
+        assert (await llm.generate("q")).text == "answer 3"
+        assert llm.breaker.state == "closed"
+
+    asyncio.run(main())
+
+
+def test_only_one_probe_is_let_through_while_half_open():
+    async def main():
+        llm = gateway(ScriptedProvider(fail_calls={1, 2}, latencies={3: 0.1}))
+        await open_circuit(llm)
+        probe = asyncio.ensure_future(llm.generate("q"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LLMUnavailableError, match="circuit is open"):
+            await llm.generate("q")
+        await probe
+
+    asyncio.run(main())
+
+
+def test_a_cancelled_probe_lets_the_next_call_probe():
+    async def main():
+        llm = gateway(ScriptedProvider(fail_calls={1, 2}, latencies={3: 10}))
+        await open_circuit(llm)
+        probe = asyncio.ensure_future(llm.generate("q"))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert (await llm.generate("q")).text == "answer 4"
+        assert llm.breaker.state == "closed"
+
+    asyncio.run(main())
+
+
+def test_an_abandoned_streaming_probe_lets_the_next_call_probe():
+    async def main():
+        class Streaming(ScriptedProvider):
+            async def generate_content_async(self, prompt, stream=False, request_options=None):
+                response = await super().generate_content_async(prompt)
+                if not stream:
+                    return response
+
+                async def chunks():
+                    for word in response.text.split():
+                        yield FakeResponse(word)
+                return chunks()
+
+        llm = gateway(Streaming(fail_calls={1, 2}))
+        await open_circuit(llm)
+        stream = llm.stream("q")
+        assert await stream.__anext__() == "answer"
+        await stream.aclose()
+        assert (await llm.generate("q")).text == "answer 4"
+
+    asyncio.run(main())
+
+
+def test_waiting_for_a_local_slot_does_not_trip_the_breaker():
+    async def main():
+        llm = gateway(ScriptedProvider(), max_concurrency=1, timeout=0.02)
+        await llm.semaphore.acquire()  # every slot busy
+        for _ in range(3):
+            with pytest.raises(LLMUnavailableError):
+                await llm.generate("q")
+        assert llm.breaker.failures == 0 and llm.breaker.state == "closed"
+        llm.semaphore.release()
+        assert (await llm.generate("q")).text == "answer 1"
+
+    asyncio.run(main())
+
+
+def test_transient_errors_are_retried():
+    async def main():
+        llm = LLMGateway(ScriptedProvider(fail_calls={1}), max_retries=1, retry_base_delay=0.001, hedge_percentile=0)
+        assert (await llm.generate("q")).text == "answer 2"
+
+    asyncio.run(main())
+
+
+def test_a_slow_call_is_hedged():
+    async def main():
+        provider = ScriptedProvider(latency=0.001, latencies={6: 1.0})
+        llm = LLMGateway(provider, hedge_percentile=90, hedge_min_samples=5)
+        for _ in range(5):
+            await llm.generate("q")
+        assert (await llm.generate("q")).text == "answer 7"
+
+    asyncio.run(main())
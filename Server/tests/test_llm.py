@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from app.AI import llm
+from app.AI.memory import ConversationMemory, SessionMemory
+
+
+@pytest.fixture
+def stub_retrieval(monkeypatch):
+    """prepare_reply without a model or index: every question passes the gate and retrieves one chunk."""
+    q_emb = np.ones((1, 3), dtype=np.float32)
+    monkeypatch.setattr(llm, "embed_batch", lambda queries: q_emb)
+    monkeypatch.setattr(llm, "screen_question", lambda question, raw_emb, use_cache=True: (None, q_emb, None))
+    monkeypatch.setattr(llm, "retrieve_with_provenance", lambda query, **kw: ("context", {"chunk_ids": [1]}))
+    return q_emb
+
+
+def session_with(*turns):
+    memory = SessionMemory()
+    for query, answer in turns:
+        memory.add_turn(query, answer)
+    return memory
+
+
+def test_standalone_answers_are_cacheable(stub_retrieval):
+    reply, q_emb, context, _ = llm.prepare_reply("What is a for loop?")
+    assert reply is None and q_emb is stub_retrieval and context == "context"
+
+
+def test_answers_with_history_in_the_prompt_are_not_cached(stub_retrieval):
+    memory = session_with(("What is a class?", "A class is a blueprint."))
+    _, q_emb, _, _ = llm.prepare_reply("What is a for loop?", memory)
+    assert q_emb is None
+
+
+def test_follow_ups_are_not_cached(stub_retrieval):
+    memory = session_with(("What is a for loop?", "It repeats."))
+    _, q_emb, _, provenance = llm.prepare_reply("can you show another example?", memory)
+    assert q_emb is None
+    assert provenance["search_query"] == "What is a for loop? can you show another example?"
+
+
+def test_only_session_independent_questions_are_coalesced():
+    assert llm.coalescing_key("What is a for loop?") == llm.coalescing_key("what is a  for loop")
+    assert llm.coalescing_key("What is a for loop?", SessionMemory()) is not None
+    assert llm.coalescing_key("What is a for loop?", session_with(("hi", "hello"))) is None
+
+
+def test_session_memory_is_not_kept_in_process_by_default():
+    memory = ConversationMemory()
+    memory.from_rows((1, 1), [("q", "a")])
+    assert memory.get((1, 1)) is None
+    cached = ConversationMemory(enabled=True)
+    cached.from_rows((1, 1), [("q", "a")])
+    assert cached.get((1, 1)).last_query == "q"
+
+
+def snapshot_of(*texts, version=2):
+    return SimpleNamespace(text_chunks=[{"text": text, "page": 1} for text in texts], version=version)
+
+
+def provenance_for(snapshot, chunk_ids):
+    return {
+        "index_version": snapshot.version,
+        "chunk_ids": chunk_ids,
+        "chunk_hashes": [llm.chunk_hash(snapshot.text_chunks[i]) for i in chunk_ids],
+    }
+
+
+def test_stored_context_is_reused_while_the_chunks_are_unchanged():
+    old = snapshot_of("create a list with a for loop", "range() counts", version=1)
+    provenance = provenance_for(old, [1])
+    context = llm.context_from_provenance(snapshot_of("new intro", "range() counts"), provenance)
+    assert "range() counts" in context
+
+
+def test_rebuilt_ids_pointing_at_other_text_are_retrieved_again():
+    old = snapshot_of("create a list with a for loop", version=1)
+    rebuilt = snapshot_of("Create a game where the computer picks a random word")
+    assert llm.context_from_provenance(rebuilt, provenance_for(old, [0])) is None
+    assert llm.context_from_provenance(rebuilt, {**provenance_for(old, [0]), "chunk_ids": [5]}) is None
+
+
+def test_unhashed_provenance_is_only_trusted_on_its_own_index_version():
+    legacy = {"index_version": 1, "chunk_ids": [0]}
+    assert llm.context_from_provenance(snapshot_of("for loops", version=1), legacy) is not None
+    assert llm.context_from_provenance(snapshot_of("for loops", version=2), legacy) is None
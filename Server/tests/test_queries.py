@@ -0,0 +1,79 @@
+import asyncio
+from sqlalchemy.dialects import postgresql
+from app.db import queries
+
+
+def compiled(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_new_session_chat_is_one_statement_on_postgres():
+    sql = compiled(queries.INSERT_CHAT_IN_NEW_SESSION)
+    assert sql.startswith('WITH allocated AS \n(UPDATE "user" SET chat_session_count=("user".chat_session_count + ')
+    assert "new_session AS \n(INSERT INTO chat_session" in sql
+    assert sql.endswith("FROM new_session RETURNING chat.id, chat.chat_session_id, chat.user_id, chat.query, "
+                        "chat.answer, chat.created_at, chat.retrieval")
+
+
+def test_session_chat_only_inserts_into_the_users_own_session():
+    sql = compiled(queries.INSERT_CHAT_IN_SESSION)
+    assert "WHERE chat_session.user_id = %(b_user_id)s AND chat_session.chat_session_id = %(b_chat_session_id)s" in sql
+    assert "FROM touched RETURNING" in sql
+
+
+def test_concurrent_new_sessions_get_distinct_ids(app_session):
+    from app.api.tutor import save_chat
+    from app.db.database import database
+
+    async def test(client):
+        user_id = await database.fetch_val(queries.INSERT_USER, {"name": "s", "email": "s@example.com", "password": "x"})
+        saved = await asyncio.gather(*[save_chat(None, user_id, f"q{n}", "a") for n in range(5)])
+        follow_up = await save_chat(saved[0].chat_session_id, user_id, "again", "a")
+        sessions = await database.fetch_all(queries.SESSIONS_PAGE, {"user_id": user_id, "limit": 10})
+        return saved, follow_up, sessions
+
+    saved, follow_up, sessions = app_session(test)
+    assert sorted(chat.chat_session_id for chat in saved) == [1, 2, 3, 4, 5]
+    assert follow_up.chat_session_id == saved[0].chat_session_id
+    assert {s.chat_session_id: s.turn_count for s in sessions}[saved[0].chat_session_id] == 2
+
+
+def test_saving_into_another_users_session_is_rejected(app_session):
+    import pytest
+    from fastapi import HTTPException
+    from app.api.tutor import save_chat
+    from app.db.database import database
+
+    async def test(client):
+        owner = await database.fetch_val(queries.INSERT_USER, {"name": "o", "email": "o@example.com", "password": "x"})
+        other = await database.fetch_val(queries.INSERT_USER, {"name": "x", "email": "x@example.com", "password": "x"})
+        session = await save_chat(None, owner, "q", "a")
+        with pytest.raises(HTTPException) as error:
+            await save_chat(session.chat_session_id, other, "q", "a")
+        return error.value.status_code
+
+    assert app_session(test) == 400
+
+
+def test_history_cursor_skips_chats_already_returned(app_session):
+    from sqlalchemy import text
+    from app.api.tutor import save_chat
+    from app.db.database import database
+
+    async def test(client):
+        user_id = await database.fetch_val(queries.INSERT_USER, {"name": "h", "email": "h@example.com", "password": "x"})
+        session = await save_chat(None, user_id, "q1", "a")
+        for n in (2, 3):
+            await save_chat(session.chat_session_id, user_id, f"q{n}", "a")
+        async with database.engine.begin() as conn:
+            # Same second, stored the way SQLite's CURRENT_TIMESTAMP writes it
+            await conn.execute(text("UPDATE chat SET created_at = '2024-01-01 10:00:00'"))
+        values = {"user_id": user_id, "chat_session_id": session.chat_session_id, "limit": 1}
+        pages = [await database.fetch_all(queries.HISTORY_PAGE, values)]
+        while pages[-1] and len(pages) <= 3:
+            last = pages[-1][-1]
+            before = {"before_created_at": last.created_at, "before_id": last.id}
+            pages.append(await database.fetch_all(queries.HISTORY_PAGE_BEFORE, {**values, **before}))
+        return [chat.query for page in pages for chat in page]
+
+    assert app_session(test) == ["q3", "q2", "q1"]
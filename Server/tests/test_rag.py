@@ -0,0 +1,31 @@
+import pytest
+from app.AI.rag import document_id, iter_pdf_documents
+
+
+def make_pdfs(tmp_path, *names):
+    for name in names:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+
+def test_document_id_of_a_single_file_is_its_name():
+    assert document_id("data/Python_Programming.pdf") == "Python_Programming"
+
+
+def test_same_named_pdfs_in_subdirectories_get_distinct_ids(tmp_path):
+    make_pdfs(tmp_path, "a/intro.pdf", "b/intro.pdf", "book.pdf")
+    documents = dict(iter_pdf_documents([str(tmp_path)]))
+    assert sorted(documents) == ["a/intro", "b/intro", "book"]
+
+
+def test_glob_ids_are_relative_to_the_pattern_root(tmp_path):
+    make_pdfs(tmp_path, "a/intro.pdf", "b/intro.pdf")
+    documents = dict(iter_pdf_documents([str(tmp_path / "*" / "intro.pdf")]))
+    assert sorted(documents) == ["a/intro", "b/intro"]
+
+
+def test_colliding_files_are_rejected(tmp_path):
+    make_pdfs(tmp_path, "a/intro.pdf", "b/intro.pdf")
+    with pytest.raises(ValueError):
+        list(iter_pdf_documents([str(tmp_path / "a" / "intro.pdf"), str(tmp_path / "b" / "intro.pdf")]))
@@ -0,0 +1,31 @@
+import pickle
+import pytest
+from app.AI import resources
+from app.AI.chunk_store import convert_pickle
+
+
+@pytest.fixture
+def legacy_pickle(tmp_path):
+    path = tmp_path / "text_chunks.pkl"
+    with open(path, "wb") as f:
+        pickle.dump([{"text": "for loops", "page": 3}, {"text": "while loops", "page": 4}], f)
+    return str(path)
+
+
+def test_legacy_chunks_get_positional_ids(legacy_pickle, monkeypatch):
+    monkeypatch.setattr(resources, "ALLOW_PICKLE_CHUNKS", True)
+    chunks = resources.load_text_chunks(legacy_pickle)
+    assert [chunks[i]["id"] for i in (0, 1)] == [0, 1]
+
+
+def test_legacy_chunks_are_not_unpickled_by_default(legacy_pickle, monkeypatch):
+    monkeypatch.setattr(resources, "ALLOW_PICKLE_CHUNKS", False)
+    with pytest.raises(ValueError):
+        resources.load_text_chunks(legacy_pickle)
+
+
+def test_converted_chunk_store_keeps_positional_ids(legacy_pickle, tmp_path):
+    store_path = str(tmp_path / "text_chunks.bin")
+    convert_pickle(legacy_pickle, store_path)
+    chunks = resources.load_text_chunks(store_path)
+    assert chunks[1] == {"id": 1, "text": "while loops", "page": 4, "doc_id": ""}
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from app.AI.singleflight import FlightCancelled, SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    calls = []
+
+    async def produce(flight):
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        flight.publish("answer")
+        return {"pages": [3]}
+
+    async def main():
+        flights = SingleFlight()
+        joined = [flights.join("q", produce) for _ in range(5)]
+        results = await asyncio.gather(*[flight.wait() for flight, _ in joined])
+        return joined, results, flights
+
+    joined, results, flights = asyncio.run(main())
+    assert calls == [1]
+    assert [started for _, started in joined] == [True, False, False, False, False]
+    assert results == [{"pages": [3]}] * 5 and joined[4][0].text == "answer"
+    assert len(flights) == 0  # finished runs are forgotten
+
+
+def test_a_late_follower_gets_every_chunk():
+    async def produce(flight):
+        for chunk in ("a ", "for ", "loop"):
+            flight.publish(chunk)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        flights = SingleFlight()
+        flights.join("q", produce)
+        await asyncio.sleep(0.015)
+        flight, started = flights.join("q", produce)
+        return started, [chunk async for chunk in flight.stream()]
+
+    assert asyncio.run(main()) == (False, ["a ", "for ", "loop"])
+
+
+def test_errors_reach_every_follower():
+    async def produce(flight):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("down")
+
+    async def main():
+        flights = SingleFlight()
+        joined = [flights.join("q", produce)[0] for _ in range(3)]
+        return await asyncio.gather(*[flight.wait() for flight in joined], return_exceptions=True)
+
+    assert [type(e) for e in asyncio.run(main())] == [RuntimeError] * 3
+
+
+def test_a_cancelled_producer_fails_its_followers():
+    async def produce(flight):
+        flight.publish("partial")
+        await asyncio.sleep(10)
+
+    async def main():
+        flights = SingleFlight()
+        flight, _ = flights.join("q", produce)
+        follower = asyncio.ensure_future(flight.wait())
+        streamed = []
+
+        async def stream():
+            async for chunk in flight.stream():
+                streamed.append(chunk)
+
+        reader = asyncio.ensure_future(stream())
+        await asyncio.sleep(0.01)
+        flight.task.cancel()
+        with pytest.raises(FlightCancelled):
+            await follower
+        with pytest.raises(FlightCancelled):
+            await reader
+        return streamed, len(flights)
+
+    assert asyncio.run(main()) == (["partial"], 0)
+
+
+def test_a_caller_giving_up_does_not_cancel_the_run():
+    async def produce(flight):
+        await asyncio.sleep(0.02)
+        flight.publish("answer")
+
+    async def main():
+        flights = SingleFlight()
+        leader, _ = flights.join("q", produce)
+        waiting = asyncio.ensure_future(leader.wait())
+        await asyncio.sleep(0.005)
+        waiting.cancel()
+        follower, started = flights.join("q", produce)
+        await follower.wait()
+        return started, follower.text
+
+    assert asyncio.run(main()) == (False, "answer")